@@ -0,0 +1,277 @@
+"""Applying a list of changes to the items of a case in one transaction."""
+
+from collections import defaultdict
+from typing import Any, Optional, Type
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.http import JsonResponse
+
+from .identifiers import SiblingIdentifierUpdate
+from .model_utils import deferring_revision_bumps
+from .models import (
+    AssuranceCase,
+    CaseItem,
+    PropertyClaim,
+    Strategy,
+    TopLevelNormativeGoal,
+)
+from .serializers import TYPE_DICT
+from .view_utils import SandboxUtils
+
+
+class CaseBatchError(Exception):
+    """An operation of a batch cannot be applied, which cancels the whole batch."""
+
+    def __init__(self, message: str, errors: Optional[dict] = None):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors
+        # Position of the failed operation, or None if the batch itself is invalid.
+        self.index: Optional[int] = None
+
+    def as_response(self) -> JsonResponse:
+        content: dict[str, Any] = {"error_message": self.message}
+        if self.index is not None:
+            content["error_message"] = f"Operation {self.index}: {self.message}"
+            content["operation"] = self.index
+        if self.errors is not None:
+            content["errors"] = self.errors
+        return JsonResponse(content, status=400)
+
+
+class CaseBatch:
+    """Applies an ordered list of changes to the items of a case, in one transaction.
+
+    Each operation has an "op" of create, update, delete, attach or detach, and a
+    "type" of goal, context, strategy, property_claim or evidence. All but creations
+    have the "id" of the item they change. Creations and updates have the "data" sent
+    to the endpoints of each item type, and attachments and detachments have the
+    "parent" sent to theirs. Wherever an item id is expected, later operations can use
+    the "temp_id" given to the creation of an item instead.
+
+    Items are renumbered as by the endpoints of each operation, but the revision of
+    the case is bumped only once, at the end. Results describe the items as they are
+    after the whole batch.
+    """
+
+    OPERATIONS: tuple[str, ...] = ("create", "update", "delete", "attach", "detach")
+    ITEM_TYPES: tuple[str, ...] = (
+        "goal",
+        "context",
+        "strategy",
+        "property_claim",
+        "evidence",
+    )
+    # The fields of which new items need at least one, besides goals.
+    PARENT_FIELDS: dict[str, tuple[str, ...]] = {
+        "context": ("goal_id",),
+        "strategy": ("goal_id",),
+        "property_claim": ("goal_id", "strategy_id", "property_claim_id"),
+        "evidence": ("property_claim_id",),
+    }
+    PARENT_MODELS: dict[str, Type[CaseItem]] = {
+        "goal_id": TopLevelNormativeGoal,
+        "strategy_id": Strategy,
+        "property_claim_id": PropertyClaim,
+    }
+    MAX_OPERATIONS: int = 1000
+
+    def __init__(self, assurance_case: AssuranceCase) -> None:
+        self.assurance_case = assurance_case
+        # Ids of the items created by the batch, by their temporary id.
+        self.temp_ids: dict[str, int] = {}
+
+    def apply(self, operations: Any) -> list[dict[str, Any]]:
+        """Applies the operations, or none of them if one fails.
+
+        Raises:
+            CaseBatchError: If an operation is invalid or cannot be applied.
+        """
+        if not isinstance(operations, list):
+            msg = "Operations must be a list."
+            raise CaseBatchError(msg)
+        if len(operations) > self.MAX_OPERATIONS:
+            msg = f"A batch is limited to {self.MAX_OPERATIONS} operations."
+            raise CaseBatchError(msg)
+
+        with transaction.atomic(), deferring_revision_bumps():
+            results: list[dict[str, Any]] = []
+            for index, operation in enumerate(operations):
+                try:
+                    results.append(self._apply(operation))
+                except CaseBatchError as error:
+                    error.index = index
+                    raise
+                except (ObjectDoesNotExist, ValueError) as error:
+                    batch_error = CaseBatchError(str(error))
+                    batch_error.index = index
+                    raise batch_error from error
+
+            self._add_item_data(results)
+        return results
+
+    def _apply(self, operation: Any) -> dict[str, Any]:
+        if not isinstance(operation, dict):
+            msg = "Operations must be objects."
+            raise CaseBatchError(msg)
+        op: Any = operation.get("op")
+        item_type: Any = operation.get("type")
+        if op not in self.OPERATIONS:
+            msg = f"Unknown operation {op}."
+            raise CaseBatchError(msg)
+        if item_type not in self.ITEM_TYPES:
+            msg = f"Unknown item type {item_type}."
+            raise CaseBatchError(msg)
+
+        result: dict[str, Any] = {"op": op, "type": item_type}
+        if op == "create":
+            case_item: CaseItem = self._create(item_type, operation)
+            temp_id: Any = operation.get("temp_id")
+            if temp_id is not None:
+                if not isinstance(temp_id, str) or temp_id in self.temp_ids:
+                    msg = f"Temporary id {temp_id} must be a new string."
+                    raise CaseBatchError(msg)
+                self.temp_ids[temp_id] = case_item.pk
+                result["temp_id"] = temp_id
+            result["id"] = case_item.pk
+            return result
+
+        case_item = self._get_item(item_type, self._resolve_id(operation.get("id")))
+        result["id"] = case_item.pk
+        if op == "update":
+            self._update(item_type, case_item, operation)
+        elif op == "delete":
+            with SiblingIdentifierUpdate(case_item):
+                case_item.delete()
+            result["deleted"] = True
+        else:
+            self._move(op, item_type, case_item, operation)
+        return result
+
+    def _create(self, item_type: str, operation: dict) -> CaseItem:
+        data: dict[str, Any] = self._resolve_parents(operation.get("data"))
+        if item_type == "goal":
+            data["assurance_case_id"] = self.assurance_case.pk
+        elif not any(data.get(field) for field in self.PARENT_FIELDS[item_type]):
+            msg = f"New {item_type} items need a parent in the case."
+            raise CaseBatchError(msg)
+
+        serializer = TYPE_DICT[item_type]["serializer"](data=data)
+        if not serializer.is_valid():
+            msg = "Invalid item."
+            raise CaseBatchError(msg, serializer.errors)
+        with SiblingIdentifierUpdate() as identifier_update:
+            case_item: CaseItem = serializer.save()
+            identifier_update.track(case_item)
+
+        if case_item.assurance_case_id != self.assurance_case.pk:
+            msg = f"New {item_type} items need a parent in the case."
+            raise CaseBatchError(msg)
+        return case_item
+
+    def _update(self, item_type: str, case_item: CaseItem, operation: dict) -> None:
+        data: dict[str, Any] = self._resolve_parents(operation.get("data"))
+        if item_type == "goal":
+            data["assurance_case_id"] = self.assurance_case.pk
+
+        serializer = TYPE_DICT[item_type]["serializer"](
+            case_item, data=data, partial=True
+        )
+        if not serializer.is_valid():
+            msg = "Invalid item."
+            raise CaseBatchError(msg, serializer.errors)
+        with SiblingIdentifierUpdate(case_item):
+            serializer.save()
+
+    def _move(
+        self, op: str, item_type: str, case_item: CaseItem, operation: dict
+    ) -> None:
+        parent: dict[str, Any] = self._resolve_parents(operation.get("parent"))
+        if item_type == "goal":
+            msg = f"Goals cannot be {op}ed."
+            raise CaseBatchError(msg)
+
+        if item_type == "context":
+            if op == "attach":
+                SandboxUtils.attach_context(case_item.pk, parent.get("goal_id"))  # type: ignore[arg-type]
+            else:
+                SandboxUtils.detach_context(case_item.pk)
+        elif item_type == "strategy":
+            if op == "attach":
+                SandboxUtils.attach_strategy(case_item.pk, parent)
+            else:
+                SandboxUtils.detach_strategy(case_item.pk)
+        elif item_type == "property_claim":
+            if op == "attach":
+                SandboxUtils.attach_property_claim(case_item.pk, parent)
+            else:
+                SandboxUtils.detach_property_claim(case_item.pk, parent)
+        elif op == "attach":
+            SandboxUtils.attach_evidence(case_item.pk, parent.get("property_claim_id"))  # type: ignore[arg-type]
+        else:
+            SandboxUtils.detach_evidence(case_item.pk, parent.get("property_claim_id"))  # type: ignore[arg-type]
+
+    def _get_item(self, item_type: str, item_id: int) -> CaseItem:
+        model: Type[CaseItem] = TYPE_DICT[item_type]["model"]
+        case_item: Optional[CaseItem] = model.objects.filter(
+            pk=item_id, assurance_case_id=self.assurance_case.pk
+        ).first()
+        if case_item is None:
+            msg = f"There is no {item_type} {item_id} in the case."
+            raise CaseBatchError(msg)
+        return case_item
+
+    def _resolve_id(self, item_id: Any) -> int:
+        if isinstance(item_id, str) and item_id in self.temp_ids:
+            return self.temp_ids[item_id]
+        if isinstance(item_id, int) and not isinstance(item_id, bool):
+            return item_id
+        if isinstance(item_id, str) and item_id.isdigit():
+            return int(item_id)
+        msg = f"Unknown item id {item_id}."
+        raise CaseBatchError(msg)
+
+    def _resolve_parents(self, fields: Any) -> dict[str, Any]:
+        """Replaces temporary ids of parents, which must be items of the case."""
+        if fields is None:
+            return {}
+        if not isinstance(fields, dict):
+            msg = "Item data must be an object."
+            raise CaseBatchError(msg)
+
+        fields = dict(fields)
+        for field, model in self.PARENT_MODELS.items():
+            value: Any = fields.get(field)
+            if value is None:
+                continue
+            parent_ids: list[int] = [
+                self._resolve_id(parent_id)
+                for parent_id in (value if isinstance(value, list) else [value])
+            ]
+            in_case: int = model.objects.filter(
+                pk__in=parent_ids, assurance_case_id=self.assurance_case.pk
+            ).count()
+            if in_case != len(set(parent_ids)):
+                msg = f"Parents in {field} must be items of the case."
+                raise CaseBatchError(msg)
+            fields[field] = parent_ids if isinstance(value, list) else parent_ids[0]
+        return fields
+
+    def _add_item_data(self, results: list[dict[str, Any]]) -> None:
+        item_ids: dict[str, set[int]] = defaultdict(set)
+        for result in results:
+            if not result.get("deleted"):
+                item_ids[result["type"]].add(result["id"])
+
+        items: dict[tuple[str, int], CaseItem] = {}
+        for item_type, ids in item_ids.items():
+            for case_item in TYPE_DICT[item_type]["model"].objects.filter(pk__in=ids):
+                items[(item_type, case_item.pk)] = case_item
+
+        for result in results:
+            case_item = items.get((result["type"], result["id"]))
+            if case_item is not None:
+                result["data"] = TYPE_DICT[result["type"]]["serializer"](case_item).data
+            else:
+                result["deleted"] = True
@@ -0,0 +1,139 @@
+"""Caching serialized case trees, and answering polling clients with 304s."""
+
+import hashlib
+from typing import Any, Callable, Optional, cast
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .case_export import load_json_tree
+from .models import AssuranceCase, AssuranceCaseRevision, CaseItem
+from .serializers import AssuranceCaseSerializer, get_item_case_id
+from .view_utils import SandboxUtils
+
+
+class CaseTreeCache:
+    """Serialized case trees and sandboxes, cached per case revision.
+
+    Any change to a case bumps its revision (see signals.py), so entries never need
+    explicit invalidation: they stop being requested and are eventually evicted.
+    """
+
+    CACHE_ALIAS: str = "case_trees"
+
+    @staticmethod
+    def get_case_tree(assurance_case: AssuranceCase) -> dict:
+        """Returns the full nested JSON of a case, as served by case_detail."""
+
+        def serialise_case_tree() -> dict:
+            case_data = cast(dict, AssuranceCaseSerializer(assurance_case).data)
+            case_data["goals"] = load_json_tree(case_data["goals"], "goals")
+            return case_data
+
+        return CaseTreeCache._get_or_set(assurance_case, "tree", serialise_case_tree)
+
+    @staticmethod
+    def get_sandbox(assurance_case: AssuranceCase) -> dict:
+        """Returns the serialised sandbox of a case, as served by case_sandbox."""
+        return CaseTreeCache._get_or_set(
+            assurance_case,
+            "sandbox",
+            lambda: SandboxUtils.serialise_sandbox(assurance_case),
+        )
+
+    @staticmethod
+    def get_revision(assurance_case: AssuranceCase) -> Optional[int]:
+        """Revision of a case, read from select_related("revision") when available."""
+        try:
+            return assurance_case.revision.number  # type: ignore[attr-defined]
+        except AssuranceCaseRevision.DoesNotExist:
+            return None
+
+    @staticmethod
+    def _get_or_set(
+        assurance_case: AssuranceCase, kind: str, serialise: Callable[[], dict]
+    ) -> dict:
+        revision: Optional[int] = CaseTreeCache.get_revision(assurance_case)
+        if revision is None:
+            return serialise()
+
+        cache_key: str = CaseTreeCache._make_key(assurance_case, kind, revision)
+        case_cache = caches[CaseTreeCache.CACHE_ALIAS]
+
+        serialised: Optional[dict] = case_cache.get(cache_key)
+        if serialised is None:
+            serialised = serialise()
+            case_cache.set(cache_key, serialised)
+
+        return serialised
+
+    @staticmethod
+    def get_etag(
+        assurance_case: AssuranceCase, kind: str, *variants: Any
+    ) -> Optional[str]:
+        """Strong ETag for a resource that only changes with the revision of its case.
+
+        Anything else the response depends on, like the permissions of the requesting
+        user, should be passed as variants.
+        """
+        revision: Optional[int] = CaseTreeCache.get_revision(assurance_case)
+        if revision is None:
+            return None
+
+        etag_key: str = CaseTreeCache._make_key(
+            assurance_case, kind, revision, *variants
+        )
+        return quote_etag(hashlib.sha1(etag_key.encode()).hexdigest())
+
+    @staticmethod
+    def _make_key(assurance_case: AssuranceCase, kind: str, *parts: Any) -> str:
+        # Case ids can be reused after a deletion, hence the creation date in the key.
+        return ":".join(
+            str(part)
+            for part in (
+                kind,
+                assurance_case.pk,
+                assurance_case.created_date.timestamp(),
+                *parts,
+            )
+        )
+
+
+class ConditionalGetUtils:
+    """Helpers for answering polling clients with 304 Not Modified."""
+
+    @staticmethod
+    def get_item_etag(item: CaseItem, item_type: str) -> Optional[str]:
+        """ETag for a detail view of a case item, or None if it has no case."""
+        case_id: Optional[int] = get_item_case_id(item)
+        if case_id is None:
+            return None
+
+        assurance_case: Optional[AssuranceCase] = (
+            AssuranceCase.objects.select_related("revision").filter(pk=case_id).first()
+        )
+        if assurance_case is None:
+            return None
+
+        return CaseTreeCache.get_etag(assurance_case, item_type, item.pk)
+
+    @staticmethod
+    def get_not_modified(request: Any, etag: Optional[str]) -> Optional[HttpResponse]:
+        """Returns a 304 response if the client already has this version."""
+        if etag is None:
+            return None
+
+        response: Optional[HttpResponse] = get_conditional_response(request, etag=etag)
+        if response is not None:
+            ConditionalGetUtils.tag_response(response, etag)
+        return response
+
+    @staticmethod
+    def tag_response(response: HttpResponse, etag: Optional[str]) -> HttpResponse:
+        if etag is not None:
+            response["ETag"] = etag
+            # Responses depend on the user, and clients should revalidate every time.
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
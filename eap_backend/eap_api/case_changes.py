@@ -0,0 +1,145 @@
+"""Changes to cases, served to clients and sent to the websocket group of each case."""
+
+import logging
+from collections import defaultdict
+from typing import Any, Iterable, Optional, Type, cast
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import models
+from django.forms.models import model_to_dict
+from django.utils import timezone
+from eap_websockets.presence import presence_store
+
+from .model_utils import CaseChangeEntry
+from .models import AssuranceCase, AssuranceCaseRevision, CaseChange, Comment
+from .serializers import TYPE_DICT, CommentSerializer
+
+
+class CaseChangeFeed:
+    """What changed in a case since a revision, for clients to catch up without a reload.
+
+    Changes are read from the journal of the case, and each changed item is returned
+    once, as it is now. Clients are asked to reload the whole case when the journal no
+    longer goes back to their revision, or when too much has changed since.
+
+    The changes of each revision are also sent to the websocket group of the case,
+    as AssuranceCaseConsumer messages, once they are committed.
+    """
+
+    MAX_CHANGED_ITEMS: int = 500
+
+    @staticmethod
+    def get_changes(assurance_case: AssuranceCase, since: int) -> dict[str, Any]:
+        """Returns the items changed after the given revision of a case.
+
+        Args:
+            assurance_case: The case, with select_related("revision").
+
+        Returns:
+            The current revision of the case as `sequence`, and either `reload` or the
+            list of `changes`, each with the type, id and last action on an item, and
+            its serialized `data` or `deleted` if it no longer exists.
+        """
+        revision: Optional[AssuranceCaseRevision] = getattr(
+            assurance_case, "revision", None
+        )
+        sequence: int = 0 if revision is None else revision.number
+        if revision is None or not revision.compacted_number <= since <= sequence:
+            return {"sequence": sequence, "reload": True}
+
+        return CaseChangeFeed._describe_changes(
+            sequence,
+            CaseChange.objects.filter(
+                assurance_case_id=assurance_case.pk, sequence__gt=since
+            )
+            .order_by("sequence", "pk")
+            .values_list("action", "item_type", "item_id"),
+        )
+
+    @staticmethod
+    def send_patch(
+        case_id: int, sequence: int, changes: Iterable[CaseChangeEntry]
+    ) -> None:
+        """Sends the changes of a revision to the editors connected to the case.
+
+        Patches are only worked out if someone is connected, and are never allowed to
+        fail the change they describe, which is committed by then.
+        """
+        case_group_name: str = f"assurance_case_{case_id}"
+        try:
+            if not presence_store.has_connections(case_group_name):
+                return
+
+            async_to_sync(get_channel_layer().group_send)(  # type: ignore  # noqa: PGH003
+                case_group_name,
+                {
+                    "type": "case_message",
+                    "content": {
+                        "patch": CaseChangeFeed._describe_changes(sequence, changes)
+                    },
+                    "datetime": timezone.now().isoformat(),
+                },
+            )
+        except Exception as error:  # noqa: BLE001
+            logging.warning(
+                "Cannot send case patch. Context: %s",
+                {"case_id": case_id, "sequence": sequence, "error": error},
+            )
+
+    @staticmethod
+    def _describe_changes(
+        sequence: int, changes: Iterable[CaseChangeEntry]
+    ) -> dict[str, Any]:
+        # Changes to each item, in the order of the last one.
+        actions: dict[tuple[str, int], list[str]] = {}
+        for action, item_type, item_id in changes:
+            item_actions: list[str] = actions.pop((item_type, item_id), [])
+            actions[item_type, item_id] = [*item_actions, str(action)]
+            if len(actions) > CaseChangeFeed.MAX_CHANGED_ITEMS:
+                return {"sequence": sequence, "reload": True}
+
+        item_ids: dict[str, set[int]] = defaultdict(set)
+        for item_type, item_id in actions:
+            item_ids[item_type].add(item_id)
+        items: dict[tuple[str, int], Any] = {
+            (item_type, item.pk): item
+            for item_type, ids in item_ids.items()
+            for item in CaseChangeFeed._get_model(item_type).objects.filter(pk__in=ids)
+        }
+
+        described_changes: list[dict[str, Any]] = []
+        for (item_type, item_id), item_actions in actions.items():
+            change: dict[str, Any] = {"type": item_type, "id": item_id}
+            item: Any = items.get((item_type, item_id))
+            if item is None:
+                change.update(action=CaseChange.Action.DELETE, deleted=True)
+            else:
+                change["action"] = (
+                    CaseChange.Action.CREATE
+                    if CaseChange.Action.CREATE in item_actions
+                    else item_actions[-1]
+                )
+                change["data"] = CaseChangeFeed._serialise(item_type, item)
+            described_changes.append(change)
+
+        return {"sequence": sequence, "reload": False, "changes": described_changes}
+
+    @staticmethod
+    def _get_model(item_type: str) -> Type[models.Model]:
+        if item_type == "comment":
+            return Comment
+        return TYPE_DICT[item_type]["model"]
+
+    @staticmethod
+    def _serialise(item_type: str, item: Any) -> dict[str, Any]:
+        if item_type == "comment":
+            return cast(dict, CommentSerializer(item).data)
+        if item_type == "assurance_case":
+            # Without the goals and comments of the full case, which have their own
+            # changes.
+            return {
+                "id": item.pk,
+                **model_to_dict(item, fields=TYPE_DICT[item_type]["fields"]),
+            }
+        return cast(dict, TYPE_DICT[item_type]["serializer"](item).data)
@@ -0,0 +1,408 @@
+"""Reading whole case trees, to serve them or export them as in examples/."""
+
+import json
+import tempfile
+import zipfile
+from collections import defaultdict
+from typing import IO, Any, Callable, Iterable, Iterator, Optional, Type, cast
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse
+from django.utils.text import get_valid_filename
+
+from .model_utils import get_property_claim_subtrees
+from .models import AssuranceCase, Context, Evidence, PropertyClaim, Strategy
+from .serializers import TYPE_DICT, AssuranceCaseSerializer
+
+
+class CaseTreeLoader:
+    """Builds the same nested JSON as `get_json_tree`, with a bounded number of queries.
+
+    Instead of fetching and serializing every node on its own, the items reachable
+    from the requested roots are loaded one item type at a time, prefetching the
+    children of a whole batch of items in a single query per relation. Property claims
+    are loaded with all the claims below them in one query, so the number of queries
+    depends neither on the number of items in the case nor on how deep claims nest.
+    """
+
+    # Item types in the order they are loaded: parents always come before children.
+    LOAD_ORDER: tuple[str, ...] = (
+        "goal",
+        "strategy",
+        "property_claim",
+        "context",
+        "evidence",
+    )
+
+    # Relations that are serialized but are not part of the tree.
+    EXTRA_PREFETCH: dict[str, tuple[str, ...]] = {"evidence": ("property_claim",)}
+
+    def __init__(self) -> None:
+        self._type_by_model: dict[Type[models.Model], str] = {
+            TYPE_DICT[item_type]["model"]: item_type for item_type in self.LOAD_ORDER
+        }
+        self._serialized_items: dict[str, dict[int, dict]] = {
+            item_type: {} for item_type in self.LOAD_ORDER
+        }
+
+    def load(self, roots: dict[str, list]) -> "CaseTreeLoader":
+        """Fetches and serializes the subtrees starting at the given items.
+
+        Args:
+            roots: Lists of object ids, keyed by type (also a key of 'TYPE_DICT').
+
+        Returns:
+            The loader itself, ready to produce JSON trees via `get_json_tree`.
+        """
+        pending: dict[str, dict[int, models.Model]] = {
+            item_type: {} for item_type in self.LOAD_ORDER
+        }
+        for obj_type, id_list in roots.items():
+            item_type: str = self._get_item_type(obj_type)
+            pending[item_type].update(
+                TYPE_DICT[item_type]["model"].objects.in_bulk(id_list)
+            )
+
+        loaded: dict[str, dict[int, models.Model]] = {
+            item_type: {} for item_type in self.LOAD_ORDER
+        }
+        for item_type in self.LOAD_ORDER:
+            while pending[item_type]:
+                batch: list[models.Model] = list(pending[item_type].values())
+                pending[item_type] = {}
+                self._load_batch(item_type, batch, loaded, pending)
+
+        for item_type, instances in loaded.items():
+            serializer = TYPE_DICT[item_type]["serializer"](
+                list(instances.values()), many=True
+            )
+            self._serialized_items[item_type].update(
+                {item_data["id"]: item_data for item_data in serializer.data}
+            )
+
+        return self
+
+    def get_json_tree(self, id_list: list, obj_type: str) -> list:
+        """In-memory equivalent of `get_json_tree`, for items previously loaded."""
+        item_type: str = self._get_item_type(obj_type)
+        objs = []
+
+        for obj_id in id_list:
+            obj_data = self._serialized_items[item_type][obj_id].copy()
+            for child_type in TYPE_DICT[obj_type]["children"]:
+                child_list = sorted(obj_data[child_type])
+                obj_data[child_type] = self.get_json_tree(child_list, child_type)
+            objs.append(obj_data)
+
+        return objs
+
+    def _load_batch(
+        self,
+        item_type: str,
+        batch: list[models.Model],
+        loaded: dict[str, dict[int, models.Model]],
+        pending: dict[str, dict[int, models.Model]],
+    ) -> None:
+        """Prefetches the relations of a batch of items, queueing unseen children."""
+        if item_type == "property_claim":
+            # The claims below them come along, so no child claim is left to queue.
+            batch = list(
+                {
+                    claim.pk: claim
+                    for claim in get_property_claim_subtrees(
+                        [claim.pk for claim in batch]
+                    )
+                    if claim.pk not in loaded[item_type]
+                }.values()
+            )
+
+        children: list[str] = TYPE_DICT[item_type]["children"]
+        relations: tuple[str, ...] = tuple(children) + self.EXTRA_PREFETCH.get(
+            item_type, ()
+        )
+        if relations:
+            prefetch_related_objects(batch, *relations)
+
+        for instance in batch:
+            loaded[item_type][instance.pk] = instance
+
+        for instance in batch:
+            for child_relation in children:
+                child_type: str = self._get_item_type(child_relation)
+                for child in getattr(instance, child_relation).all():
+                    if child.pk not in loaded[child_type]:
+                        pending[child_type].setdefault(child.pk, child)
+
+    def _get_item_type(self, obj_type: str) -> str:
+        return self._type_by_model[TYPE_DICT[obj_type]["model"]]
+
+
+def load_json_tree(id_list: list, obj_type: str) -> list:
+    """
+    Bulk counterpart of get_json_tree, returning exactly the same JSON while
+    issuing a number of queries that does not grow with the size or depth of the
+    tree.
+
+    Params
+    ======
+    id_list: list of object_ids from the parent serializer
+    obj_type: key of the json object (also a key of 'TYPE_DICT')
+
+    Returns
+    =======
+    objs: list of json objects
+    """
+    return CaseTreeLoader().load({obj_type: id_list}).get_json_tree(id_list, obj_type)
+
+
+class CaseTreeExporter:
+    """Writes the JSON of a whole case a few items at a time, in the format of examples/.
+
+    That is the JSON of case_detail without the ids of the case and its items, which
+    only mean something to this database, as the frontend exports it. Only the ids of
+    the items are loaded up front, to know the order in which they are written, and
+    the items are then fetched and serialized CHUNK_SIZE at a time, in that order.
+    """
+
+    CHUNK_SIZE: int = 500
+    WRITE_SIZE: int = 64 * 1024
+    CASES_CHUNK_SIZE: int = 100
+    # Exports are only kept in memory up to this size, and on disk beyond it.
+    SPOOL_SIZE: int = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        assurance_case: AssuranceCase,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        """
+        Args:
+            assurance_case: Case to export.
+            on_progress: Called with the percentage of items written so far.
+        """
+        self.assurance_case = assurance_case
+        self.on_progress = on_progress
+        self._type_by_model: dict[Type[models.Model], str] = {
+            TYPE_DICT[item_type]["model"]: item_type
+            for item_type in CaseTreeLoader.LOAD_ORDER
+        }
+        self._order: list[tuple[str, int]] = []
+        self._positions: dict[tuple[str, int], int] = {}
+        self._serialized_items: dict[tuple[str, int], dict] = {}
+        self._chunk_start: int = 0
+
+    def iter_json(self) -> Iterator[str]:
+        """Yields the JSON of the case in parts, as they are ready."""
+        case_data = cast(dict, AssuranceCaseSerializer(self.assurance_case).data)
+        self._order = self._get_write_order(case_data["goals"])
+        self._positions = {}
+        for position, key in enumerate(self._order):
+            self._positions.setdefault(key, position)
+
+        yield from self._iter_item_json(case_data, "assurance_case")
+
+    def write(self, output: IO[bytes]) -> None:
+        """Writes the JSON of the case to a binary file."""
+        parts: list[str] = []
+        size: int = 0
+        for part in self.iter_json():
+            parts.append(part)
+            size += len(part)
+            if size >= self.WRITE_SIZE:
+                output.write("".join(parts).encode())
+                parts = []
+                size = 0
+        output.write("".join(parts).encode())
+
+    @staticmethod
+    def get_file_name(assurance_case: AssuranceCase) -> str:
+        return get_valid_filename(f"{assurance_case.name}-{assurance_case.pk}.json")
+
+    @staticmethod
+    def iter_cases(case_ids: Iterable[int]) -> Iterator[AssuranceCase]:
+        """Fetches the given cases CASES_CHUNK_SIZE at a time, skipping deleted ones."""
+        case_ids = list(case_ids)
+        chunk_size: int = CaseTreeExporter.CASES_CHUNK_SIZE
+        for start in range(0, len(case_ids), chunk_size):
+            chunk_ids: list[int] = case_ids[start : start + chunk_size]
+            cases: dict[int, AssuranceCase] = AssuranceCase.objects.in_bulk(chunk_ids)
+            yield from (cases[case_id] for case_id in chunk_ids if case_id in cases)
+
+    @staticmethod
+    def write_ndjson(case_ids: Iterable[int], output: IO[bytes]) -> int:
+        """Writes the given cases as newline-delimited JSON, one case per line.
+
+        Returns:
+            The number of cases written.
+        """
+        case_count: int = 0
+        for assurance_case in CaseTreeExporter.iter_cases(case_ids):
+            CaseTreeExporter(assurance_case).write(output)
+            output.write(b"\n")
+            case_count += 1
+        return case_count
+
+    @staticmethod
+    def write_zip(case_ids: Iterable[int], output: IO[bytes]) -> int:
+        """Writes the given cases as a zip archive, with a JSON file per case.
+
+        Returns:
+            The number of cases written.
+        """
+        case_count: int = 0
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            for assurance_case in CaseTreeExporter.iter_cases(case_ids):
+                file_name: str = CaseTreeExporter.get_file_name(assurance_case)
+                with archive.open(file_name, "w") as case_file:
+                    CaseTreeExporter(assurance_case).write(case_file)
+                case_count += 1
+        return case_count
+
+    @staticmethod
+    def make_response(
+        write: Callable[[IO[bytes]], Any], file_name: str, content_type: str
+    ) -> FileResponse:
+        """Streams an export to the client as a file download.
+
+        The export is written in full before the response starts, as Django runs the
+        iterator of a streaming response in the event loop when served over ASGI,
+        where the database cannot be queried.
+        """
+        output = tempfile.SpooledTemporaryFile(  # noqa: SIM115
+            max_size=CaseTreeExporter.SPOOL_SIZE
+        )
+        write(output)
+        size: int = output.tell()
+        output.seek(0)
+
+        response = FileResponse(
+            output, as_attachment=True, filename=file_name, content_type=content_type
+        )
+        response["Content-Length"] = size
+        return response
+
+    def _iter_item_json(self, item_data: dict, item_type: str) -> Iterator[str]:
+        children: list[str] = TYPE_DICT[item_type]["children"]
+        separator: str = "{"
+        for key, value in item_data.items():
+            if key == "id":
+                continue
+
+            key_json: str = json.dumps(key)
+            if key not in children:
+                yield f"{separator}{key_json}: {json.dumps(value, cls=DjangoJSONEncoder)}"
+                separator = ", "
+                continue
+
+            yield f"{separator}{key_json}: ["
+            separator = ", "
+            child_type: str = self._get_item_type(key)
+            # Like get_json_tree, which case_detail starts from the goals of the case.
+            child_ids: list = value if item_type == "assurance_case" else sorted(value)
+            for index, child_id in enumerate(child_ids):
+                if index:
+                    yield ", "
+                yield from self._iter_item_json(
+                    self._get_serialized_item(child_type, child_id), child_type
+                )
+            yield "]"
+
+        yield "}" if separator == ", " else "{}"
+
+    def _get_write_order(self, goal_ids: list[int]) -> list[tuple[str, int]]:
+        """Lists the items of the case in the order they are written.
+
+        This only decides which items are fetched together, so it relies on the
+        assurance_case column of items, and items missing from it are fetched when
+        they are written.
+        """
+        case_id: int = self.assurance_case.pk
+        tree: dict[tuple[str, int], dict[str, list[int]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for context_id, goal_id in Context.objects.filter(
+            assurance_case_id=case_id, goal_id__isnull=False
+        ).values_list("pk", "goal_id"):
+            tree["goal", goal_id]["context"].append(context_id)
+        for strategy_id, goal_id in Strategy.objects.filter(
+            assurance_case_id=case_id, goal_id__isnull=False
+        ).values_list("pk", "goal_id"):
+            tree["goal", goal_id]["strategies"].append(strategy_id)
+        for claim_id, goal_id, strategy_id, parent_id in PropertyClaim.objects.filter(
+            assurance_case_id=case_id
+        ).values_list("pk", "goal_id", "strategy_id", "property_claim_id"):
+            for parent_type, parent_item_id in (
+                ("goal", goal_id),
+                ("strategy", strategy_id),
+                ("property_claim", parent_id),
+            ):
+                if parent_item_id is not None:
+                    tree[parent_type, parent_item_id]["property_claims"].append(
+                        claim_id
+                    )
+        for claim_id, evidence_id in Evidence.property_claim.through.objects.filter(
+            propertyclaim__assurance_case_id=case_id
+        ).values_list("propertyclaim_id", "evidence_id"):
+            tree["property_claim", claim_id]["evidence"].append(evidence_id)
+
+        order: list[tuple[str, int]] = []
+        visited: set[tuple[str, int]] = set()
+        stack: list[tuple[str, int]] = [("goal", goal_id) for goal_id in goal_ids]
+        stack.reverse()
+        while stack:
+            key: tuple[str, int] = stack.pop()
+            if key in visited:
+                continue
+            visited.add(key)
+            order.append(key)
+
+            item_type: str = key[0]
+            for relation in reversed(TYPE_DICT[item_type]["children"]):
+                child_type: str = self._get_item_type(relation)
+                stack.extend(
+                    (child_type, child_id)
+                    for child_id in sorted(tree[key][relation], reverse=True)
+                )
+
+        return order
+
+    def _get_serialized_item(self, item_type: str, item_id: int) -> dict:
+        key: tuple[str, int] = (item_type, item_id)
+        if key not in self._serialized_items:
+            self._load_chunk(key)
+        return self._serialized_items[key]
+
+    def _load_chunk(self, key: tuple[str, int]) -> None:
+        """Fetches and serializes the next CHUNK_SIZE items, starting with `key`."""
+        position: Optional[int] = self._positions.get(key)
+        if position is None or position < self._chunk_start:
+            # Evidence of several claims, or an item missing from the write order.
+            chunk: list[tuple[str, int]] = [key]
+        else:
+            chunk = self._order[position : position + self.CHUNK_SIZE]
+            self._chunk_start = position
+            self._serialized_items = {}
+            if self.on_progress is not None:
+                self.on_progress(position * 100 // len(self._order))
+
+        ids_by_type: dict[str, list[int]] = defaultdict(list)
+        for item_type, item_id in chunk:
+            ids_by_type[item_type].append(item_id)
+
+        for item_type, id_list in ids_by_type.items():
+            items: list[models.Model] = list(
+                TYPE_DICT[item_type]["model"].objects.filter(pk__in=id_list)
+            )
+            relations: tuple[str, ...] = tuple(
+                TYPE_DICT[item_type]["children"]
+            ) + CaseTreeLoader.EXTRA_PREFETCH.get(item_type, ())
+            prefetch_related_objects(items, *relations)
+
+            serializer = TYPE_DICT[item_type]["serializer"](items, many=True)
+            for item_data in serializer.data:
+                self._serialized_items[item_type, item_data["id"]] = item_data
+
+    def _get_item_type(self, obj_type: str) -> str:
+        return self._type_by_model[TYPE_DICT[obj_type]["model"]]
@@ -0,0 +1,708 @@
+"""Creating cases from the JSON of an export, or as copies of other cases."""
+
+import io
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Optional, Type, Union, cast
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from rest_framework.request import Request
+
+from .json_stream import (
+    JSONEventReader,
+    JSONStreamError,
+    JSONStreamTooLargeError,
+    read_value,
+    skip_value,
+)
+from .model_utils import bump_case_revision
+from .models import (
+    AssuranceCase,
+    Comment,
+    EAPUser,
+    Evidence,
+    PropertyClaim,
+    PropertyClaimClosure,
+)
+from .serializers import COMMENT_TARGETS, TYPE_DICT
+
+
+def bulk_create_with_ids(
+    model: Type[models.Model], instances: list[models.Model], **created_filter: Any
+) -> None:
+    """Inserts new instances of a model, in bulk, and sets their primary keys.
+
+    Some databases, like SQLite, do not return the primary keys of bulk inserts, so
+    they are read back as those of the latest instances that match `created_filter`,
+    which must only match instances created since by this transaction.
+    """
+    model.objects.bulk_create(instances)
+    if not instances or instances[0].pk is not None:
+        return
+
+    created_ids: list[int] = list(
+        model.objects.filter(**created_filter)
+        .order_by("-pk")
+        .values_list("pk", flat=True)[: len(instances)]
+    )
+    if len(created_ids) != len(instances):
+        msg = f"Could not find the {len(instances)} {model.__name__} just created."
+        raise RuntimeError(msg)
+    for instance, created_id in zip(instances, reversed(created_ids), strict=True):
+        instance.pk = created_id
+
+
+class _ImportNode:
+    """An item of a case being imported, with what its children need to know of it."""
+
+    __slots__ = ("item", "item_type", "parent", "claim_ancestors", "name_counts")
+
+    def __init__(
+        self, item: Any, item_type: str, parent: Optional["_ImportNode"]
+    ) -> None:
+        self.item = item
+        self.item_type: str = item_type
+        self.parent: Optional[_ImportNode] = parent
+        # Property claims above a property claim, nearest first, for its closure rows.
+        self.claim_ancestors: list[PropertyClaim] = []
+        if parent is not None and parent.item_type == "property_claim":
+            self.claim_ancestors = [parent.item, *parent.claim_ancestors]
+        # Number of children named so far, by type.
+        self.name_counts: dict[str, int] = {}
+
+
+class _StreamedItem:
+    """An item whose JSON object is being read by CaseTreeImporter.import_events."""
+
+    __slots__ = ("item_type", "parent", "fields", "key", "node")
+
+    def __init__(
+        self, item_type: str, parent: Optional[_ImportNode], fields: dict
+    ) -> None:
+        self.item_type: str = item_type
+        self.parent: Optional[_ImportNode] = parent
+        self.fields: dict = fields
+        self.key: Optional[str] = None
+        self.node: Optional[_ImportNode] = None
+
+
+class _StreamedList:
+    """A list of child items being read by CaseTreeImporter.import_events."""
+
+    __slots__ = ("item_type", "parent")
+
+    def __init__(self, item_type: str, parent: Optional[_ImportNode]) -> None:
+        self.item_type: str = item_type
+        self.parent: Optional[_ImportNode] = parent
+
+
+class CaseTreeImporter:
+    """Creates a new assurance case from nested JSON, like the one served by case_detail.
+
+    Items are validated one at a time, and named in memory following the same rules
+    as the item serializers. They are inserted one item type at a time with
+    `bulk_create` (property claims one level at a time), so the number of queries
+    depends on the depth of the property claim hierarchy rather than on the number
+    of items.
+
+    `import_events` reads the case from a stream of JSON events, so that payloads too
+    large to hold in memory can be imported, and writes items in batches.
+
+    Bulk inserts bypass `save` and the signals in signals.py, so the importer also
+    fills in the case of every item, the property claim index and the case revision.
+    """
+
+    ITEM_TYPES: tuple[str, ...] = (
+        "goal",
+        "context",
+        "strategy",
+        "property_claim",
+        "evidence",
+    )
+
+    # Number of buffered items that triggers a write, when reading from a stream.
+    FLUSH_SIZE: int = 1000
+
+    def __init__(self) -> None:
+        self.assurance_case: Optional[AssuranceCase] = None
+        self.errors: dict = {}
+        self._case_node: Optional[_ImportNode] = None
+        self._buffered_items: dict[str, list[_ImportNode]] = {
+            item_type: [] for item_type in self.ITEM_TYPES
+        }
+        self._buffered_claims_by_level: dict[int, list[_ImportNode]] = {}
+        self._buffered_count: int = 0
+
+    def import_events(
+        self,
+        events: Iterable[tuple[str, Any]],
+        case_overrides: Optional[dict] = None,
+    ) -> Optional[AssuranceCase]:
+        """Imports a case from the events of a JSONEventReader, in bounded memory.
+
+        Each item is validated and buffered as soon as its own fields are read, that
+        is when its first list of child items starts, and the buffer is written every
+        FLUSH_SIZE items. Fields of an item must therefore come before its children,
+        as they do in case_detail, except for the fields of the case itself, which
+        are only validated at the end.
+
+        This must run inside a transaction, which the caller should roll back if the
+        import fails.
+
+        Args:
+            events: Events of the JSON document of a case.
+            case_overrides: Fields of the case that take precedence over the document.
+
+        Returns:
+            The new case, or None if an item is invalid, leaving its errors in `errors`.
+        """
+        case_overrides = case_overrides or {}
+        events = iter(events)
+        frames: list[Union[_StreamedItem, _StreamedList]] = []
+
+        for event, value in events:
+            frame: Optional[Union[_StreamedItem, _StreamedList]] = (
+                frames[-1] if frames else None
+            )
+            if isinstance(frame, _StreamedItem):
+                if event == "map_key":
+                    frame.key = value
+                elif event == "end_map":
+                    frames.pop()
+                    if frame.node is None and not self._add_streamed_item(
+                        frame, case_overrides
+                    ):
+                        return None
+                    if frame.item_type == "assurance_case":
+                        # The reader rejects anything after the end of the case.
+                        next(events, None)
+                        return self.finish(frame.fields | case_overrides)
+                    if self._buffered_count >= self.FLUSH_SIZE:
+                        self.flush()
+                elif event == "start_array" and frame.key in (
+                    TYPE_DICT[frame.item_type]["children"]
+                ):
+                    if frame.node is None and not self._add_streamed_item(
+                        frame, case_overrides
+                    ):
+                        return None
+                    frames.append(
+                        _StreamedList(self._get_item_type(frame.key), frame.node)
+                    )
+                elif not self._set_streamed_field(frame, events, event, value):
+                    return None
+            elif event == "start_map":
+                frames.append(
+                    _StreamedItem("assurance_case", None, {})
+                    if frame is None
+                    else _StreamedItem(frame.item_type, frame.parent, {})
+                )
+            elif event == "end_array" and frame is not None:
+                frames.pop()
+            else:
+                item_type: str = frame.item_type if frame else "assurance_case"
+                self.errors = {
+                    "non_field_errors": [f"Expected an object for {item_type}."]
+                }
+                return None
+
+        return None
+
+    def add_case(self, case_data: Any, partial: bool = False) -> Optional[_ImportNode]:
+        """Validates the fields of the case, which is saved with the first items.
+
+        Args:
+            case_data: JSON of the case, whose child items are ignored.
+            partial: If True, missing fields are not an error yet, as they will be
+                passed to `finish`.
+        """
+        validated_data: Optional[dict] = self._validate_item(
+            case_data, "assurance_case", partial
+        )
+        if validated_data is None:
+            return None
+
+        self.assurance_case = AssuranceCase(**validated_data)
+        self._case_node = _ImportNode(self.assurance_case, "assurance_case", None)
+        return self._case_node
+
+    def add_item(
+        self, item_data: Any, item_type: str, parent: _ImportNode
+    ) -> Optional[_ImportNode]:
+        """Validates and names an item, and buffers it to be written by `flush`.
+
+        Args:
+            item_data: JSON of the item, whose child items are ignored.
+            item_type: Singular key of 'TYPE_DICT'.
+            parent: The case, or the item this one hangs from.
+        """
+        validated_data: Optional[dict] = self._validate_item(item_data, item_type)
+        if validated_data is None:
+            return None
+
+        node = _ImportNode(
+            TYPE_DICT[item_type]["model"](**validated_data), item_type, parent
+        )
+        self._name_item(node)
+        if item_type == "property_claim":
+            self._buffered_claims_by_level.setdefault(node.item.level, []).append(node)
+        else:
+            self._buffered_items[item_type].append(node)
+        self._buffered_count += 1
+        return node
+
+    def flush(self) -> None:
+        """Writes the case, if it is new, and the buffered items."""
+        assurance_case: AssuranceCase = cast(AssuranceCase, self.assurance_case)
+        if assurance_case.pk is None:
+            assurance_case.save()
+
+        for item_type in ("goal", "context", "strategy"):
+            self._bulk_create(item_type, self._buffered_items[item_type])
+
+        closure_links: list[PropertyClaimClosure] = []
+        for level in sorted(self._buffered_claims_by_level):
+            claims: list[_ImportNode] = self._buffered_claims_by_level[level]
+            self._bulk_create("property_claim", claims, level=level)
+            for node in claims:
+                closure_links.append(
+                    PropertyClaimClosure(
+                        ancestor_id=node.item.pk, descendant_id=node.item.pk, depth=0
+                    )
+                )
+                closure_links.extend(
+                    PropertyClaimClosure(
+                        ancestor_id=ancestor.pk,
+                        descendant_id=node.item.pk,
+                        depth=depth,
+                    )
+                    for depth, ancestor in enumerate(node.claim_ancestors, start=1)
+                )
+        PropertyClaimClosure.objects.bulk_create(closure_links)
+
+        evidence: list[_ImportNode] = self._buffered_items["evidence"]
+        self._bulk_create("evidence", evidence)
+        evidence_link_model: Type[models.Model] = Evidence.property_claim.through
+        evidence_link_model.objects.bulk_create(
+            [
+                evidence_link_model(
+                    evidence_id=node.item.pk,
+                    propertyclaim_id=cast(_ImportNode, node.parent).item.pk,
+                )
+                for node in evidence
+            ]
+        )
+
+        for buffered_items in self._buffered_items.values():
+            buffered_items.clear()
+        self._buffered_claims_by_level.clear()
+        self._buffered_count = 0
+
+    def finish(self, case_data: Optional[dict] = None) -> Optional[AssuranceCase]:
+        """Writes the items still buffered, and marks the case as changed.
+
+        Args:
+            case_data: All the fields of the case, if `add_case` was partial.
+
+        Returns:
+            The new case, or None if `case_data` is invalid.
+        """
+        assurance_case: AssuranceCase = cast(AssuranceCase, self.assurance_case)
+        if case_data is not None:
+            validated_data: Optional[dict] = self._validate_item(
+                case_data, "assurance_case"
+            )
+            if validated_data is None:
+                return None
+
+            # Fields read after the first items were written need another save.
+            needs_update: bool = assurance_case.pk is not None
+            for field, value in validated_data.items():
+                setattr(assurance_case, field, value)
+            if needs_update:
+                assurance_case.save()
+
+        self.flush()
+        bump_case_revision(assurance_case.pk)
+        return assurance_case
+
+    def _validate_item(
+        self, item_data: Any, item_type: str, partial: bool = False
+    ) -> Optional[dict]:
+        """Validates the fields of one item with its serializer, but not its parents."""
+        if not isinstance(item_data, dict):
+            self.errors = {"non_field_errors": [f"Expected an object for {item_type}."]}
+            return None
+
+        fields: tuple[str, ...] = TYPE_DICT[item_type]["fields"]
+        missing_fields: list[str] = [
+            field for field in fields if field not in item_data
+        ]
+        if missing_fields and not partial:
+            self.errors = {
+                field: ["This field is required."] for field in missing_fields
+            }
+            return None
+
+        # Only include some of the fields from the data, so that e.g. the new item
+        # gets a unique ID even if the data specifies an ID. Parents are set on insert.
+        serializer = TYPE_DICT[item_type]["serializer"](
+            data={field: item_data[field] for field in fields if field in item_data},
+            partial=True,
+        )
+        if not serializer.is_valid():
+            self.errors = serializer.errors
+            return None
+
+        return dict(serializer.validated_data)
+
+    def _add_streamed_item(self, frame: _StreamedItem, case_overrides: dict) -> bool:
+        if frame.item_type == "assurance_case":
+            frame.node = self.add_case(frame.fields | case_overrides, partial=True)
+            return frame.node is not None
+
+        if frame.key in TYPE_DICT[frame.item_type]["children"]:
+            missing_fields: list[str] = [
+                field
+                for field in TYPE_DICT[frame.item_type]["fields"]
+                if field not in frame.fields
+            ]
+            if missing_fields:
+                self.errors = {
+                    field: ["Must come before the lists of child items."]
+                    for field in missing_fields
+                }
+                return False
+
+        frame.node = self.add_item(
+            frame.fields, frame.item_type, cast(_ImportNode, frame.parent)
+        )
+        return frame.node is not None
+
+    def _set_streamed_field(
+        self,
+        frame: _StreamedItem,
+        events: Iterator[tuple[str, Any]],
+        event: str,
+        value: Any,
+    ) -> bool:
+        if frame.key not in TYPE_DICT[frame.item_type]["fields"]:
+            skip_value(events, event)
+            return True
+
+        if frame.node is not None and frame.item_type != "assurance_case":
+            self.errors = {frame.key: ["Must come before the lists of child items."]}
+            return False
+
+        frame.fields[frame.key] = read_value(events, event, value)
+        return True
+
+    def _name_item(self, node: _ImportNode) -> None:
+        """Names a new item like its serializer would."""
+        parent: _ImportNode = cast(_ImportNode, node.parent)
+        case_node: _ImportNode = cast(_ImportNode, self._case_node)
+        if node.item_type == "goal":
+            node.item.name = self._get_unique_name(case_node, "goal", "G")
+        elif node.item_type == "context":
+            node.item.name = self._get_unique_name(parent, "context", "C")
+        elif node.item_type == "strategy":
+            node.item.name = self._get_unique_name(parent, "strategy", "S")
+        elif node.item_type == "evidence":
+            node.item.name = self._get_unique_name(case_node, "evidence", "E")
+        elif parent.item_type == "property_claim":
+            node.item.name = self._get_unique_name(
+                parent, "property_claim", f"{parent.item.name}."
+            )
+            node.item.level = parent.item.level + 1
+        else:
+            node.item.name = self._get_unique_name(case_node, "property_claim", "P")
+            node.item.level = 1
+
+    @staticmethod
+    def _get_unique_name(scope: _ImportNode, item_type: str, name_prefix: str) -> str:
+        # Nothing else shares the names of a new case, so numbering is sequential.
+        scope.name_counts[item_type] = scope.name_counts.get(item_type, 0) + 1
+        return f"{name_prefix}{scope.name_counts[item_type]}"
+
+    def _bulk_create(
+        self, item_type: str, nodes: list[_ImportNode], **created_filter: Any
+    ) -> None:
+        """Inserts items whose parents are already saved, and sets their ids."""
+        model: Type[models.Model] = TYPE_DICT[item_type]["model"]
+        instances: list[models.Model] = []
+        for node in nodes:
+            node.item.assurance_case = self.assurance_case
+            if item_type != "evidence":
+                # Assigning the parent again picks up its primary key.
+                parent: _ImportNode = cast(_ImportNode, node.parent)
+                setattr(node.item, parent.item_type, parent.item)
+            instances.append(node.item)
+
+        # The case is new, so its latest items of this type are the ones just created.
+        bulk_create_with_ids(
+            model, instances, assurance_case=self.assurance_case, **created_filter
+        )
+
+    @classmethod
+    def _get_item_type(cls, obj_type: str) -> str:
+        """Singular item type of a key of 'TYPE_DICT'."""
+        model: Type[models.Model] = TYPE_DICT[obj_type]["model"]
+        return next(
+            item_type
+            for item_type in cls.ITEM_TYPES
+            if TYPE_DICT[item_type]["model"] is model
+        )
+
+
+class CaseCloner:
+    """Copies a case with all its items, their links and their comments.
+
+    Each kind of row is copied with one bulk insert, or one per level of the
+    property claim hierarchy, mapping the ids of the original rows to those of their
+    copies as it goes. Items are found by their assurance_case column, so items in
+    the sandbox of the case are copied too. Sharing with groups is not copied.
+    """
+
+    ITEM_TYPES: tuple[str, ...] = ("goal", "context", "strategy")
+
+    def __init__(self, assurance_case: AssuranceCase) -> None:
+        self.assurance_case = assurance_case
+        self.copy: Optional[AssuranceCase] = None
+        # Ids of the copies of items, by type and id of the original item.
+        self._copy_ids: dict[str, dict[int, int]] = {}
+
+    @transaction.atomic
+    def clone(self, owner: EAPUser, name: str) -> AssuranceCase:
+        """Creates the copy of the case, owned by the given user."""
+        self.copy = AssuranceCase.objects.create(
+            name=name,
+            description=self.assurance_case.description,
+            owner=owner,
+            color_profile=self.assurance_case.color_profile,
+        )
+
+        for item_type in self.ITEM_TYPES:
+            self._copy_items(item_type, self._get_case_items(item_type))
+        self._copy_property_claims()
+        self._copy_evidence()
+        self._copy_comments()
+
+        bump_case_revision(self.copy.pk)
+        return self.copy
+
+    def _get_case_items(self, item_type: str) -> list[models.Model]:
+        model: Type[models.Model] = TYPE_DICT[item_type]["model"]
+        return list(
+            model.objects.filter(assurance_case=self.assurance_case).order_by("pk")
+        )
+
+    def _copy_items(
+        self, item_type: str, items: list[models.Model], **created_filter: Any
+    ) -> None:
+        """Inserts copies of items whose parents are already copied."""
+        original_ids: list[int] = []
+        for item in items:
+            original_ids.append(item.pk)
+            item.pk = None
+            item.assurance_case = self.copy
+            for parent_type in ("goal", "strategy", "property_claim"):
+                if hasattr(item, f"{parent_type}_id"):
+                    setattr(
+                        item, f"{parent_type}_id", self._get_copy_id(item, parent_type)
+                    )
+
+        bulk_create_with_ids(
+            TYPE_DICT[item_type]["model"],
+            items,
+            assurance_case=self.copy,
+            **created_filter,
+        )
+        self._copy_ids.setdefault(item_type, {}).update(
+            zip(original_ids, (item.pk for item in items), strict=True)
+        )
+
+    def _get_copy_id(self, item: models.Model, parent_type: str) -> Optional[int]:
+        parent_id: Optional[int] = getattr(item, f"{parent_type}_id")
+        if parent_id is None:
+            return None
+        return self._copy_ids.get(parent_type, {}).get(parent_id)
+
+    def _copy_property_claims(self) -> None:
+        claims: list[models.Model] = self._get_case_items("property_claim")
+        claim_ids: set[int] = {claim.pk for claim in claims}
+        self._copy_ids["property_claim"] = {}
+
+        # Claims are copied after the claim they hang from, one level at a time.
+        while claims:
+            copied_ids: dict[int, int] = self._copy_ids["property_claim"]
+            ready: list[models.Model] = [
+                claim
+                for claim in claims
+                if claim.property_claim_id not in claim_ids
+                or claim.property_claim_id in copied_ids
+            ]
+            if not ready:
+                msg = "The property claims of the case have a cycle."
+                raise ValueError(msg)
+
+            ready_ids: set[int] = {claim.pk for claim in ready}
+            claims = [claim for claim in claims if claim.pk not in ready_ids]
+            self._copy_items("property_claim", ready)
+
+        copied_ids = self._copy_ids["property_claim"]
+        PropertyClaimClosure.objects.bulk_create(
+            [
+                PropertyClaimClosure(
+                    ancestor_id=copied_ids[ancestor_id],
+                    descendant_id=copied_ids[descendant_id],
+                    depth=depth,
+                )
+                for ancestor_id, descendant_id, depth in (
+                    PropertyClaimClosure.objects.filter(
+                        descendant__assurance_case=self.assurance_case
+                    ).values_list("ancestor_id", "descendant_id", "depth")
+                )
+                if ancestor_id in copied_ids and descendant_id in copied_ids
+            ]
+        )
+
+    def _copy_evidence(self) -> None:
+        self._copy_items("evidence", self._get_case_items("evidence"))
+
+        evidence_ids: dict[int, int] = self._copy_ids["evidence"]
+        claim_ids: dict[int, int] = self._copy_ids["property_claim"]
+        evidence_link_model: Type[models.Model] = Evidence.property_claim.through
+        evidence_link_model.objects.bulk_create(
+            [
+                evidence_link_model(
+                    evidence_id=evidence_ids[evidence_id],
+                    propertyclaim_id=claim_ids[claim_id],
+                )
+                for evidence_id, claim_id in evidence_link_model.objects.filter(
+                    evidence__assurance_case=self.assurance_case
+                ).values_list("evidence_id", "propertyclaim_id")
+                if evidence_id in evidence_ids and claim_id in claim_ids
+            ]
+        )
+
+    def _copy_comments(self) -> None:
+        comments: list[Comment] = list(
+            Comment.objects.filter(self._get_comment_filter(self.assurance_case))
+        )
+        created_dates: list[datetime] = [comment.created_at for comment in comments]
+        for comment in comments:
+            comment.pk = None
+            if comment.assurance_case_id is not None:
+                comment.assurance_case = self.copy
+            for target in COMMENT_TARGETS:
+                target_id: Optional[int] = getattr(comment, f"{target}_id")
+                if target_id is not None:
+                    setattr(
+                        comment,
+                        f"{target}_id",
+                        self._copy_ids[target].get(target_id),
+                    )
+        bulk_create_with_ids(
+            Comment,
+            comments,
+            pk__in=Comment.objects.filter(self._get_comment_filter(self.copy)).values(
+                "pk"
+            ),
+        )
+
+        # Inserts set created_at to the current time, which the copies must not.
+        for comment, created_at in zip(comments, created_dates, strict=True):
+            comment.created_at = created_at
+        Comment.objects.bulk_update(comments, ["created_at"])
+
+    @staticmethod
+    def _get_comment_filter(assurance_case: AssuranceCase) -> Q:
+        """Matches the comments on a case and on its items."""
+        comment_filter: Q = Q(assurance_case=assurance_case)
+        for target in COMMENT_TARGETS:
+            comment_filter |= Q(
+                pk__in=Comment.objects.filter(
+                    **{f"{target}__assurance_case": assurance_case}
+                ).values("pk")
+            )
+        return comment_filter
+
+
+def import_case_stream(request: Request, case_overrides: dict) -> JsonResponse:
+    """
+    Create a new assurance case like the one described by the request body,
+    including all its items, in a single transaction. The JSON of the case is read
+    as it arrives, instead of parsing it all first.
+
+    Params
+    ======
+    request: Request whose body is the JSON of the assurance case and its items.
+    case_overrides: fields of the case that take precedence over the body.
+
+    Returns
+    =======
+    JsonResponse with the name and id of the new case. Bodies larger than the
+    CASE_UPLOAD_MAX_SIZE setting get a 413 response, and malformed or invalid ones
+    a 400 response.
+    """
+    size_error: Optional[JsonResponse] = check_case_upload_size(request)
+    if size_error is not None:
+        return size_error
+
+    importer = CaseTreeImporter()
+    events = JSONEventReader(
+        request.stream or io.BytesIO(), settings.CASE_UPLOAD_MAX_SIZE
+    )
+    try:
+        with transaction.atomic():
+            assurance_case: Optional[AssuranceCase] = importer.import_events(
+                events, case_overrides
+            )
+            if assurance_case is None:
+                transaction.set_rollback(True)
+    except JSONStreamTooLargeError:
+        return case_upload_too_large()
+    except JSONStreamError as error:
+        return JsonResponse({"error_message": f"Invalid JSON: {error}"}, status=400)
+
+    if assurance_case is None:
+        return JsonResponse(importer.errors, status=400)
+
+    summary = {"name": assurance_case.name, "id": assurance_case.pk}
+    return JsonResponse(summary, status=201)
+
+
+def check_case_upload_size(request: Request) -> Optional[JsonResponse]:
+    """
+    Check the Content-Length header of a case upload before reading its body.
+
+    Params
+    ======
+    request: Request whose body is the JSON of an assurance case.
+
+    Returns
+    =======
+    None if the body may be read, else a 400 response to a malformed header, or a
+    413 response to a body larger than the CASE_UPLOAD_MAX_SIZE setting. Bodies
+    without the header are limited while they are read instead.
+    """
+    try:
+        content_length: int = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse(
+            {"error_message": "Invalid Content-Length header."}, status=400
+        )
+
+    if content_length > settings.CASE_UPLOAD_MAX_SIZE:
+        return case_upload_too_large()
+    return None
+
+
+def case_upload_too_large() -> JsonResponse:
+    """Response to a case upload larger than the CASE_UPLOAD_MAX_SIZE setting."""
+    error_message: str = (
+        f"Cases are limited to {settings.CASE_UPLOAD_MAX_SIZE} bytes of JSON."
+    )
+    return JsonResponse({"error_message": error_message}, status=413)
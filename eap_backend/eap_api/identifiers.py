@@ -0,0 +1,552 @@
+"""Names of case items, like "P1.2", and keeping them in sequence as items change.
+
+Items are numbered within groups of siblings of the same kind, and property claims
+are also named after the claims they hang from.
+"""
+
+from collections import defaultdict
+from typing import Iterable, Optional, Type
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+from .model_utils import (
+    CaseChangeEntry,
+    bump_case_revision,
+    get_property_claim_subtrees,
+)
+from .models import (
+    CaseChange,
+    CaseItem,
+    CaseItemSequence,
+    Context,
+    Evidence,
+    PropertyClaim,
+    Strategy,
+    TopLevelNormativeGoal,
+)
+from .serializers import get_case_id, get_item_type
+
+# A group of case items numbered together, as a kind and the id of what holds them.
+IdentifierGroup = tuple[str, int]
+
+
+class _CaseItemRenamer:
+    """Collects new names for case items, to write back only those that changed."""
+
+    NAME_FIELDS: tuple[str, ...] = ("name", "assurance_case_id")
+    BATCH_SIZE: int = 500
+
+    def __init__(self):
+        self.renamed: dict[Type[CaseItem], dict[int, CaseItem]] = defaultdict(dict)
+        # Size of each group numbered, by the case, prefix and parent of its sequence.
+        self.group_sizes: dict[tuple[int, str, int], int] = {}
+        # Id and last number of the sequences, as read before numbering their groups.
+        self.sequences: dict[tuple[int, str, int], tuple[int, int]] = {}
+        self._sequence_case_ids: set[int] = set()
+        self._goal_case_ids: dict[int, Optional[int]] = {}
+
+    def get_name(self, case_item: CaseItem) -> str:
+        """Returns the name of an item, including a new one not yet saved."""
+        renamed_item: Optional[CaseItem] = self.renamed[type(case_item)].get(
+            case_item.pk
+        )
+        return case_item.name if renamed_item is None else renamed_item.name
+
+    def rename(self, case_item: CaseItem, name: str) -> bool:
+        """Gives an item a new name, and returns whether it is different."""
+        if self.get_name(case_item) == name:
+            return False
+        case_item.name = name
+        self.renamed[type(case_item)][case_item.pk] = case_item
+        return True
+
+    def count_group(
+        self, case_id: Optional[int], prefix: str, parent_id: int, size: int
+    ) -> None:
+        """Records the size of a group once numbered, see allocate_item_number."""
+        if case_id is not None:
+            self.group_sizes[(case_id, prefix, parent_id)] = size
+
+    def read_sequences(self, case_id: Optional[int]) -> None:
+        """Reads the sequences of a case, before the items of its groups are read."""
+        if case_id is None or case_id in self._sequence_case_ids:
+            return
+        self._sequence_case_ids.add(case_id)
+        for (
+            sequence_id,
+            prefix,
+            parent_id,
+            last_number,
+        ) in CaseItemSequence.objects.filter(assurance_case_id=case_id).values_list(
+            "pk", "prefix", "parent_id", "last_number"
+        ):
+            self.sequences[(case_id, prefix, parent_id)] = (sequence_id, last_number)
+
+    def get_goal_case_id(self, goal_id: int) -> Optional[int]:
+        if goal_id not in self._goal_case_ids:
+            self._goal_case_ids[goal_id] = (
+                TopLevelNormativeGoal.objects.filter(pk=goal_id)
+                .values_list("assurance_case_id", flat=True)
+                .first()
+            )
+        return self._goal_case_ids[goal_id]
+
+    def save(self) -> int:
+        """Writes the new names, with a bulk update per model, and returns how many."""
+        renamed_items: dict[Type[CaseItem], list[CaseItem]] = {
+            model: list(case_items.values())
+            for model, case_items in self.renamed.items()
+            if case_items
+        }
+        stale_sequences: dict[int, Q] = self._get_stale_sequences()
+        if not renamed_items and not stale_sequences:
+            return 0
+
+        with transaction.atomic():
+            for size, sequences in stale_sequences.items():
+                CaseItemSequence.objects.filter(sequences).update(last_number=size)
+            for model, case_items in renamed_items.items():
+                model.objects.bulk_update(
+                    case_items, ["name"], batch_size=self.BATCH_SIZE
+                )
+            # Bulk updates send no signals, so case revisions are bumped here.
+            changes_by_case: dict[int, list[CaseChangeEntry]] = defaultdict(list)
+            for case_items in renamed_items.values():
+                for case_item in case_items:
+                    if case_item.assurance_case_id is not None:
+                        changes_by_case[case_item.assurance_case_id].append(
+                            (
+                                CaseChange.Action.UPDATE,
+                                get_item_type(case_item),
+                                case_item.pk,
+                            )
+                        )
+            for case_id, changes in changes_by_case.items():
+                bump_case_revision(case_id, changes)
+
+        return sum(len(case_items) for case_items in renamed_items.values())
+
+    def _get_stale_sequences(self) -> dict[int, Q]:
+        """Returns the sequences to set back to the size of their group, by size.
+
+        Sequences only count up, so that a group that lost items would otherwise name
+        its next item after a number it no longer has. Each is only set back if its
+        last number is still the one read before its group, as a number allocated
+        since may belong to an item the numbering did not see.
+        """
+        stale_sequences: dict[int, Q] = defaultdict(Q)
+        for key, size in self.group_sizes.items():
+            sequence: Optional[tuple[int, int]] = self.sequences.get(key)
+            if sequence is not None and sequence[1] != size:
+                sequence_id, last_number = sequence
+                stale_sequences[size] |= Q(pk=sequence_id, last_number=last_number)
+        return stale_sequences
+
+
+class UpdateIdentifierUtils:
+    # Groups are numbered in this order, so that claims are named after their parents.
+    GROUP_KINDS: tuple[str, ...] = (
+        "goals",
+        "contexts",
+        "strategies",
+        "property_claims",
+        "child_claims",
+        "evidence",
+    )
+
+    @staticmethod
+    def update_identifiers(
+        case_id: Optional[int] = None, model_instance: Optional[CaseItem] = None
+    ) -> int:
+        """Traverses the case and ensures the identifiers follow a sequence
+
+        The new names are worked out on a snapshot of the case, read with one query per
+        model, and only the items whose name changes are written back, with a bulk
+        update per model. Renumbering a case that is already in sequence writes nothing.
+
+        Args:
+            case_id: Identifier of the case where we perform the update.
+            model_instance: The case element that triggered this method.
+
+        Returns:
+            The number of case items renamed.
+        """
+
+        error_message: str = "Assurance Case ID not provided."
+        if case_id is None and model_instance is not None:
+            case_id = get_case_id(model_instance)
+
+        if case_id is None:
+            raise ValueError(error_message)
+
+        try:
+            goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.only(
+                *_CaseItemRenamer.NAME_FIELDS
+            ).get(assurance_case_id=case_id)
+        except TopLevelNormativeGoal.DoesNotExist:
+            return 0
+
+        renamer = _CaseItemRenamer()
+        renamer.rename(goal, "G1")
+        for kind in ("contexts", "strategies", "property_claims", "evidence"):
+            UpdateIdentifierUtils.number_group(
+                (kind, goal.pk), renamer, all_sub_claims=True
+            )
+        renamed_count: int = renamer.save()
+
+        if model_instance is not None:
+            model_instance.refresh_from_db()
+
+        return renamed_count
+
+    @staticmethod
+    def get_identifier_groups(case_item: CaseItem) -> set[IdentifierGroup]:
+        """Returns the groups numbered together that an item currently belongs to.
+
+        Items in the sandbox, without a parent, belong to none.
+        """
+        goal_id: Optional[int] = None
+        if isinstance(case_item, TopLevelNormativeGoal):
+            if case_item.assurance_case_id is None:
+                return set()
+            return {("goals", case_item.assurance_case_id)}
+        if isinstance(case_item, Context):
+            return {("contexts", case_item.goal_id)} if case_item.goal_id else set()
+        if isinstance(case_item, Strategy):
+            goal_id = case_item.goal_id
+            if goal_id is None:
+                return set()
+            return {
+                ("strategies", goal_id),
+                ("property_claims", goal_id),
+                ("evidence", goal_id),
+            }
+        if isinstance(case_item, PropertyClaim):
+            if case_item.property_claim_id is not None:
+                return {
+                    ("child_claims", case_item.property_claim_id)
+                } | UpdateIdentifierUtils._get_evidence_groups(case_item)
+            goal_id = case_item.goal_id
+            if goal_id is None and case_item.strategy_id is not None:
+                goal_id = (
+                    Strategy.objects.filter(pk=case_item.strategy_id)
+                    .values_list("goal_id", flat=True)
+                    .first()
+                )
+            if goal_id is None:
+                return set()
+            return {("property_claims", goal_id), ("evidence", goal_id)}
+        if isinstance(case_item, Evidence) and case_item.property_claim.exists():
+            return UpdateIdentifierUtils._get_evidence_groups(case_item)
+        return set()
+
+    @staticmethod
+    def get_selection_groups(
+        case_id: int, item_ids: dict[str, set[int]]
+    ) -> set[IdentifierGroup]:
+        """Returns the groups that a selection of items of a case currently belong to.
+
+        It works as get_identifier_groups, with a query per kind of item rather than
+        per item. The selection lists item ids by kind, as in {"contexts": {1, 2}}.
+        """
+        goal_ids: list[int] = list(
+            TopLevelNormativeGoal.objects.filter(assurance_case_id=case_id).values_list(
+                "pk", flat=True
+            )
+        )
+        evidence_groups: set[IdentifierGroup] = {
+            ("evidence", goal_id) for goal_id in goal_ids
+        }
+
+        groups: set[IdentifierGroup] = set()
+        for goal_id in Context.objects.filter(
+            pk__in=item_ids.get("contexts", ()), goal_id__isnull=False
+        ).values_list("goal_id", flat=True):
+            groups.add(("contexts", goal_id))
+        for goal_id in Strategy.objects.filter(
+            pk__in=item_ids.get("strategies", ()), goal_id__isnull=False
+        ).values_list("goal_id", flat=True):
+            groups |= {
+                ("strategies", goal_id),
+                ("property_claims", goal_id),
+                ("evidence", goal_id),
+            }
+        for (
+            claim_goal_id,
+            strategy_goal_id,
+            parent_claim_id,
+        ) in PropertyClaim.objects.filter(
+            pk__in=item_ids.get("property_claims", ())
+        ).values_list(
+            "goal_id", "strategy__goal_id", "property_claim_id"
+        ):
+            goal_id = claim_goal_id or strategy_goal_id
+            if parent_claim_id is not None:
+                groups |= {("child_claims", parent_claim_id)} | evidence_groups
+            elif goal_id is not None:
+                groups |= {("property_claims", goal_id), ("evidence", goal_id)}
+        if item_ids.get("evidence"):
+            groups |= evidence_groups
+
+        return groups
+
+    @staticmethod
+    def _get_evidence_groups(case_item: CaseItem) -> set[IdentifierGroup]:
+        return {
+            ("evidence", goal_id)
+            for goal_id in TopLevelNormativeGoal.objects.filter(
+                assurance_case_id=case_item.assurance_case_id
+            ).values_list("pk", flat=True)
+        }
+
+    @staticmethod
+    def number_groups(
+        groups: set[IdentifierGroup], renamer: Optional[_CaseItemRenamer] = None
+    ) -> int:
+        """Names the items of several groups in sequence, and returns how many changed.
+
+        Groups are numbered in the order of GROUP_KINDS, and the new names saved at once.
+        """
+        if renamer is None:
+            renamer = _CaseItemRenamer()
+        for group in sorted(
+            groups,
+            key=lambda group: (
+                UpdateIdentifierUtils.GROUP_KINDS.index(group[0]),
+                group,
+            ),
+        ):
+            UpdateIdentifierUtils.number_group(group, renamer)
+        return renamer.save()
+
+    @staticmethod
+    def number_group(
+        group: IdentifierGroup, renamer: _CaseItemRenamer, all_sub_claims: bool = False
+    ) -> None:
+        """Names the items of a group in sequence, along with the claims below them.
+
+        Args:
+            group: The kind of items and the id of what holds them: the case for goals,
+                the parent claim for child claims, and the goal for everything else.
+            renamer: Collects the new names, to be saved at once.
+            all_sub_claims: Whether to check the names of the claims below every claim
+                in the group, or only below those renamed.
+        """
+        kind, parent_id = group
+        name_fields: tuple[str, ...] = _CaseItemRenamer.NAME_FIELDS
+        top_level_claims: QuerySet = PropertyClaim.objects.filter(
+            Q(goal_id=parent_id) | Q(strategy__goal_id=parent_id)
+        )
+        parent_claim: Optional[PropertyClaim] = None
+        case_id: Optional[int] = None
+        if kind == "goals":
+            case_id = parent_id
+        elif kind == "child_claims":
+            parent_claim = (
+                PropertyClaim.objects.only(*name_fields).filter(pk=parent_id).first()
+            )
+            case_id = parent_claim.assurance_case_id if parent_claim else None
+        else:
+            case_id = renamer.get_goal_case_id(parent_id)
+        renamer.read_sequences(case_id)
+
+        if kind == "goals":
+            UpdateIdentifierUtils._number_in_order(
+                TopLevelNormativeGoal.objects.filter(assurance_case_id=parent_id)
+                .only(*name_fields)
+                .order_by("pk"),
+                "G",
+                renamer,
+                case_id,
+            )
+        elif kind == "contexts":
+            UpdateIdentifierUtils._number_in_order(
+                Context.objects.filter(goal_id=parent_id)
+                .only(*name_fields)
+                .order_by("pk"),
+                "C",
+                renamer,
+                case_id,
+                parent_id,
+            )
+        elif kind == "strategies":
+            UpdateIdentifierUtils._number_in_order(
+                Strategy.objects.filter(goal_id=parent_id)
+                .only(*name_fields)
+                .order_by("pk"),
+                "S",
+                renamer,
+                case_id,
+                parent_id,
+            )
+        elif kind == "property_claims":
+            # Claims under the goal come first, then those under each strategy in turn.
+            claims: list[PropertyClaim] = sorted(
+                top_level_claims.only(*name_fields, "strategy_id").order_by("pk"),
+                key=lambda claim: (
+                    claim.strategy_id is not None,
+                    claim.strategy_id or 0,
+                ),
+            )
+            renamed_claims: list[CaseItem] = UpdateIdentifierUtils._number_in_order(
+                claims, "P", renamer, case_id
+            )
+            UpdateIdentifierUtils._number_sub_claims(
+                claims if all_sub_claims else renamed_claims, renamer
+            )
+        elif kind == "child_claims":
+            if parent_claim is not None:
+                UpdateIdentifierUtils._number_sub_claims([parent_claim], renamer)
+        elif kind == "evidence":
+            UpdateIdentifierUtils._number_in_order(
+                Evidence.objects.filter(
+                    property_claim__ancestor_links__ancestor__in=top_level_claims
+                )
+                .only(*name_fields)
+                .distinct()
+                .order_by("pk"),
+                "E",
+                renamer,
+                case_id,
+            )
+        else:
+            error_message: str = f"Unknown identifier group {kind}"
+            raise ValueError(error_message)
+
+    @staticmethod
+    def _number_in_order(
+        case_items: Iterable[CaseItem],
+        prefix: str,
+        renamer: _CaseItemRenamer,
+        case_id: Optional[int],
+        parent_id: int = 0,
+    ) -> list[CaseItem]:
+        """Names items by their order, and returns those renamed.
+
+        The case and parent id are those of the sequence new items of the group are
+        named from, where 0 stands for the case itself.
+        """
+        case_items = list(case_items)
+        renamer.count_group(case_id, prefix, parent_id, len(case_items))
+        return [
+            case_item
+            for index, case_item in enumerate(case_items)
+            if renamer.rename(case_item, f"{prefix}{index + 1}")
+        ]
+
+    @staticmethod
+    def _number_sub_claims(
+        parent_claims: list[PropertyClaim], renamer: _CaseItemRenamer
+    ) -> None:
+        """Names the claims below others after their parent, as in P1.1 and P1.2.
+
+        The parent claims must not be below one another.
+        """
+        if not parent_claims:
+            return
+
+        names: dict[int, str] = {
+            claim.pk: renamer.get_name(claim) for claim in parent_claims
+        }
+        child_counts: dict[int, int] = defaultdict(int)
+        claims: list[PropertyClaim] = get_property_claim_subtrees(list(names))
+        # Claims come by depth, so parents are named before their children.
+        for claim in claims:
+            if claim.depth == 0:
+                continue
+            child_counts[claim.property_claim_id] += 1
+            renamer.rename(
+                claim,
+                f"{names[claim.property_claim_id]}."
+                f"{child_counts[claim.property_claim_id]}",
+            )
+            names[claim.pk] = renamer.get_name(claim)
+
+        for claim in claims:
+            renamer.count_group(
+                claim.assurance_case_id, "P", claim.pk, child_counts[claim.pk]
+            )
+
+
+class SiblingIdentifierUpdate:
+    """Keeps identifiers in sequence around the creation, deletion or move of an item.
+
+    The change runs in a transaction, at the end of which only the groups the item left
+    or joined are renumbered, along with the names of the claims below any claim that
+    was renamed. Nothing is renumbered if the item kept the same parents.
+
+        with SiblingIdentifierUpdate(claim):
+            claim.delete()
+
+    Items created in the block are passed to `track` once saved.
+    """
+
+    # The fields that place each kind of item within its case.
+    PARENT_FIELDS: dict[Type[CaseItem], tuple[str, ...]] = {
+        TopLevelNormativeGoal: ("assurance_case_id",),
+        Context: ("goal_id",),
+        Strategy: ("goal_id",),
+        PropertyClaim: ("goal_id", "strategy_id", "property_claim_id"),
+    }
+
+    def __init__(self, case_item: Optional[CaseItem] = None):
+        self.case_item = case_item
+        self.renamed_count: int = 0
+        self._transaction = transaction.atomic()
+        self._parents_before: Optional[tuple] = None
+        self._groups_before: set[IdentifierGroup] = set()
+
+    def track(self, case_item: CaseItem) -> None:
+        """Sets the item to renumber around, after it has been created."""
+        self.case_item = case_item
+
+    def __enter__(self) -> "SiblingIdentifierUpdate":
+        self._transaction.__enter__()
+        if self.case_item is not None and self.case_item.pk is not None:
+            self._parents_before = self._get_parents(self.case_item)
+            self._groups_before = UpdateIdentifierUtils.get_identifier_groups(
+                self.case_item
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            try:
+                self._update_identifiers()
+            except BaseException as error:
+                self._transaction.__exit__(type(error), error, error.__traceback__)
+                raise
+        self._transaction.__exit__(exc_type, exc_value, traceback)
+
+    def _update_identifiers(self) -> None:
+        if self.case_item is None:
+            return
+
+        # Deleted items no longer have a primary key.
+        parents_after: Optional[tuple] = None
+        groups_after: set[IdentifierGroup] = set()
+        if self.case_item.pk is not None:
+            parents_after = self._get_parents(self.case_item)
+            groups_after = UpdateIdentifierUtils.get_identifier_groups(self.case_item)
+
+        if parents_after == self._parents_before:
+            return
+
+        renamer = _CaseItemRenamer()
+        self.renamed_count = UpdateIdentifierUtils.number_groups(
+            self._groups_before | groups_after, renamer
+        )
+
+        if self.case_item.pk is not None:
+            self.case_item.name = renamer.get_name(self.case_item)
+
+    def _get_parents(self, case_item: CaseItem) -> tuple:
+        if isinstance(case_item, Evidence):
+            return tuple(
+                case_item.property_claim.order_by("pk").values_list("pk", flat=True)
+            )
+        return tuple(
+            getattr(case_item, field) for field in self.PARENT_FIELDS[type(case_item)]
+        )
@@ -0,0 +1,375 @@
+"""Background jobs for the slow operations on whole assurance cases.
+
+Jobs are queued as CaseJob rows, without any broker, and run by the run_case_jobs
+command. Their progress is saved on the job, for clients polling the jobs endpoint,
+and sent to the websocket group of the case, as AssuranceCaseConsumer messages.
+
+Workers send heartbeats for the jobs they run, and jobs left running without one for
+settings.CASE_JOB_LEASE seconds are failed, as their worker must have died.
+"""
+
+import logging
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import IO, Any, Callable, Iterator, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .case_export import CaseTreeExporter
+from .case_import import CaseTreeImporter
+from .identifiers import UpdateIdentifierUtils
+from .json_stream import JSONEventReader, JSONStreamError, JSONStreamTooLargeError
+from .models import AssuranceCase, CaseJob, EAPUser
+from .serializers import CaseJobSerializer
+
+
+class CaseJobError(Exception):
+    """A job cannot complete, for reasons that are saved as its result."""
+
+    def __init__(self, result: dict):
+        super().__init__(result)
+        self.result = result
+
+
+class JobProgress:
+    """Reports the progress of a running job, at most every PROGRESS_INTERVAL seconds.
+
+    Progress made inside a transaction is only sent to the websocket group, as
+    saving it on the job would not be seen by anyone until the transaction ends.
+    """
+
+    PROGRESS_INTERVAL: float = 0.5
+
+    def __init__(self, job: CaseJob):
+        self.job = job
+        self._reported_at: float = 0.0
+
+    def update(self, progress: int, case_id: Optional[int] = None) -> None:
+        """Reports a percentage of the job as done, on the job's case or `case_id`."""
+        progress = max(0, min(progress, 99))
+        now: float = time.monotonic()
+        if progress <= self.job.progress or (
+            now - self._reported_at < self.PROGRESS_INTERVAL
+        ):
+            return
+
+        self._reported_at = now
+        self.job.progress = progress
+        if not transaction.get_connection().in_atomic_block:
+            CaseJob.objects.filter(pk=self.job.pk).update(progress=progress)
+        send_job_message(self.job, case_id)
+
+
+def submit_case_job(
+    owner: EAPUser,
+    kind: str,
+    assurance_case: Optional[AssuranceCase] = None,
+    input_file: Optional[File] = None,
+) -> CaseJob:
+    """Queues a job for the run_case_jobs command.
+
+    Args:
+        owner: User who submits the job, and owns the case of an import.
+        kind: One of CaseJob.Kind.
+        assurance_case: Case to export or renumber.
+        input_file: JSON of the case to import.
+    """
+    job = CaseJob(kind=kind, owner=owner, assurance_case=assurance_case)
+    if input_file is not None:
+        job.input_file.save("case.json", input_file, save=False)
+    job.save()
+    return job
+
+
+def read_job_input(
+    stream: IO[bytes], max_size: int, chunk_size: int = 64 * 1024
+) -> File:
+    """Copies an upload to a temporary file, as it arrives, to be saved on a job.
+
+    Raises:
+        JSONStreamTooLargeError: If the upload is longer than `max_size` bytes.
+    """
+    input_file = tempfile.TemporaryFile()  # noqa: SIM115
+    size: int = 0
+    while chunk := stream.read(chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            input_file.close()
+            msg = f"The document is larger than {max_size} bytes"
+            raise JSONStreamTooLargeError(msg)
+        input_file.write(chunk)
+
+    input_file.seek(0)
+    return File(input_file)
+
+
+def claim_next_job(worker: str) -> Optional[int]:
+    """Marks the oldest pending job as running, and returns its id.
+
+    Jobs are claimed with a conditional update, so each job goes to only one worker
+    even when several poll the queue at once.
+
+    Returns:
+        The id of the job, or None if no job is pending.
+    """
+    while True:
+        job_id: Optional[int] = (
+            CaseJob.objects.filter(status=CaseJob.Status.PENDING)
+            .order_by("created_date", "pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        claimed: int = CaseJob.objects.filter(
+            pk=job_id, status=CaseJob.Status.PENDING
+        ).update(
+            status=CaseJob.Status.RUNNING,
+            worker=worker,
+            started_date=timezone.now(),
+            heartbeat_date=timezone.now(),
+        )
+        if claimed:
+            return job_id
+
+
+def requeue_case_job(job_id: int, worker: str) -> bool:
+    """Puts back in the queue a job claimed by `worker`, which it could not start.
+
+    Returns:
+        Whether the job was still running on the worker, and is pending again.
+    """
+    return bool(
+        CaseJob.objects.filter(
+            pk=job_id, status=CaseJob.Status.RUNNING, worker=worker
+        ).update(
+            status=CaseJob.Status.PENDING,
+            worker="",
+            started_date=None,
+            heartbeat_date=None,
+        )
+    )
+
+
+def fail_expired_jobs() -> list[int]:
+    """Fails the running jobs without a heartbeat for settings.CASE_JOB_LEASE seconds.
+
+    Imports and renumberings are rolled back when their worker dies, and exports only
+    save their result at the end, so nothing is left to clean up but the input.
+
+    Returns:
+        The ids of the jobs failed.
+    """
+    expired_date = timezone.now() - timedelta(seconds=settings.CASE_JOB_LEASE)
+    failed_ids: list[int] = []
+    for job in CaseJob.objects.filter(
+        status=CaseJob.Status.RUNNING, heartbeat_date__lt=expired_date
+    ):
+        # Unless its worker sent a heartbeat or finished it meanwhile.
+        if finish_case_job(
+            job,
+            CaseJob.Status.FAILED,
+            {"error_message": "The worker running the job stopped."},
+            heartbeat_date__lt=expired_date,
+        ):
+            logging.warning("Case job %s expired on worker %s", job.pk, job.worker)
+            failed_ids.append(job.pk)
+    return failed_ids
+
+
+class JobHeartbeat:
+    """Sends heartbeats for the jobs a worker runs, from a thread of its own.
+
+    Heartbeats are sent every fifth of settings.CASE_JOB_LEASE, so that a few can be
+    missed, as happens on SQLite while a job holds the write lock.
+
+        with JobHeartbeat() as heartbeat:
+            heartbeat.job_ids.add(job_id)
+    """
+
+    def __init__(self) -> None:
+        self.job_ids: set[int] = set()
+        self.interval: float = settings.CASE_JOB_LEASE / 5
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "JobHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def beat(self) -> None:
+        """Extends the lease of the running jobs."""
+        job_ids: list[int] = list(self.job_ids)
+        if not job_ids:
+            return
+        try:
+            CaseJob.objects.filter(
+                pk__in=job_ids, status=CaseJob.Status.RUNNING
+            ).update(heartbeat_date=timezone.now())
+        except DatabaseError:
+            logging.warning("Could not send the heartbeat of case jobs %s", job_ids)
+
+    def _run(self) -> None:
+        try:
+            while not self._stopped.wait(self.interval):
+                self.beat()
+        finally:
+            # Database connections belong to the thread that opened them.
+            connection.close()
+
+
+def run_case_job(job_id: int) -> None:
+    """Runs a job claimed by `claim_next_job`, and saves its outcome."""
+    job: CaseJob = CaseJob.objects.select_related("assurance_case").get(pk=job_id)
+    send_job_message(job)
+
+    try:
+        result: dict = JOB_RUNNERS[job.kind](job, JobProgress(job))
+    except CaseJobError as error:
+        finish_case_job(job, CaseJob.Status.FAILED, error.result)
+    except Exception as error:
+        logging.exception("Case job %s failed", job.pk)
+        finish_case_job(job, CaseJob.Status.FAILED, {"error_message": str(error)})
+    else:
+        finish_case_job(job, CaseJob.Status.SUCCEEDED, result)
+
+
+def finish_case_job(
+    job: CaseJob, job_status: str, result: dict, **conditions: Any
+) -> bool:
+    """Saves the outcome of a job, and deletes its input, which is no longer needed.
+
+    The outcome is saved with a conditional update, only if the job is still running
+    on `job.worker` and matches `conditions`, as it may have expired meanwhile.
+
+    Returns:
+        Whether the outcome was saved. Nothing is changed otherwise.
+    """
+    job.status = job_status
+    job.result = result
+    job.finished_date = timezone.now()
+    if job_status == CaseJob.Status.SUCCEEDED:
+        job.progress = 100
+    finished: int = CaseJob.objects.filter(
+        pk=job.pk, status=CaseJob.Status.RUNNING, worker=job.worker, **conditions
+    ).update(
+        status=job.status,
+        result=job.result,
+        finished_date=job.finished_date,
+        progress=job.progress,
+        assurance_case=job.assurance_case_id,
+        result_file=job.result_file.name or "",
+        input_file="",
+    )
+    if not finished:
+        # The job was failed without this outcome, which no one will download.
+        if job.result_file:
+            job.result_file.delete(save=False)
+        return False
+
+    if job.input_file:
+        job.input_file.delete(save=False)
+    send_job_message(job)
+    return True
+
+
+def send_job_message(job: CaseJob, case_id: Optional[int] = None) -> None:
+    """Sends the state of a job to the websocket group of its case, if it has one.
+
+    Messages are never allowed to fail the job, as clients can poll its state too.
+    """
+    case_id = case_id or job.assurance_case_id
+    if case_id is None:
+        return
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(  # type: ignore  # noqa: PGH003
+            f"assurance_case_{case_id}",
+            {
+                "type": "case_message",
+                "content": {"job": CaseJobSerializer(job).data},
+                "datetime": timezone.now().isoformat(),
+            },
+        )
+    except Exception as error:  # noqa: BLE001
+        logging.warning(
+            "Cannot send case job message. Context: %s",
+            {"job_id": job.pk, "case_id": case_id, "error": error},
+        )
+
+
+def _get_job_case(job: CaseJob) -> AssuranceCase:
+    if job.assurance_case is None:
+        raise CaseJobError({"error_message": "The case no longer exists."})
+    return job.assurance_case
+
+
+def _run_import(job: CaseJob, progress: JobProgress) -> dict:
+    importer = CaseTreeImporter()
+    input_size: int = max(job.input_file.size, 1)
+
+    with job.input_file.open("rb") as input_file:
+        reader = JSONEventReader(input_file, settings.CASE_UPLOAD_MAX_SIZE)
+
+        def report_progress(events: Iterator[tuple[str, Any]]):
+            bytes_read: int = 0
+            for event in events:
+                if reader.bytes_read != bytes_read:
+                    bytes_read = reader.bytes_read
+                    case: Optional[AssuranceCase] = importer.assurance_case
+                    progress.update(
+                        bytes_read * 100 // input_size,
+                        case.pk if case is not None else None,
+                    )
+                yield event
+
+        try:
+            with transaction.atomic():
+                assurance_case: Optional[AssuranceCase] = importer.import_events(
+                    report_progress(iter(reader)), {"owner": job.owner_id}
+                )
+                if assurance_case is None:
+                    transaction.set_rollback(True)
+        except JSONStreamError as error:
+            raise CaseJobError({"error_message": f"Invalid JSON: {error}"}) from error
+
+    if assurance_case is None:
+        raise CaseJobError(importer.errors)
+
+    job.assurance_case = assurance_case
+    return {"name": assurance_case.name, "id": assurance_case.pk}
+
+
+def _run_export(job: CaseJob, progress: JobProgress) -> dict:
+    assurance_case: AssuranceCase = _get_job_case(job)
+    with tempfile.TemporaryFile() as output:
+        CaseTreeExporter(assurance_case, progress.update).write(output)
+        job.result_file.save(
+            CaseTreeExporter.get_file_name(assurance_case), File(output), save=False
+        )
+    return {"name": assurance_case.name, "id": assurance_case.pk}
+
+
+def _run_update_identifiers(job: CaseJob, _: JobProgress) -> dict:
+    assurance_case: AssuranceCase = _get_job_case(job)
+    UpdateIdentifierUtils.update_identifiers(case_id=assurance_case.pk)
+    return {"name": assurance_case.name, "id": assurance_case.pk}
+
+
+JOB_RUNNERS: dict[str, Callable[[CaseJob, JobProgress], dict]] = {
+    CaseJob.Kind.IMPORT: _run_import,
+    CaseJob.Kind.EXPORT: _run_export,
+    CaseJob.Kind.UPDATE_IDENTIFIERS: _run_update_identifiers,
+}
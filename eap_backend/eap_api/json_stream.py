@@ -0,0 +1,231 @@
+"""Incremental JSON parsing, for request bodies too large to load all at once.
+
+JSONEventReader reads a stream in chunks and produces a flat sequence of events,
+like SAX does for XML, so that callers can act on each part of a document as soon
+as it is read and keep only what they need.
+"""
+
+import codecs
+import re
+from json.decoder import scanstring
+from typing import IO, Any, Iterator
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+NUMBER_CHARACTERS = re.compile(r"[-+.eE0-9]*")
+NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+LITERALS: dict[str, Any] = {"true": True, "false": False, "null": None}
+
+
+class JSONStreamError(ValueError):
+    """The stream is not a valid JSON document."""
+
+
+class JSONStreamTooLargeError(JSONStreamError):
+    """The stream is longer than the reader accepts."""
+
+
+class JSONEventReader:
+    """Parses a JSON document from a byte stream into a sequence of events.
+
+    Iterating over the reader yields `(event, value)` pairs, where the event is one
+    of "start_map", "map_key", "end_map", "start_array", "end_array" or "value". Map
+    keys and scalar values come with their value, and the other events with None.
+
+    Only one chunk of the stream is held in memory at a time, besides the token being
+    read. The stream is rejected as soon as it is malformed, or as soon as more than
+    `max_size` bytes have been read.
+    """
+
+    def __init__(self, stream: IO[bytes], max_size: int, chunk_size: int = 64 * 1024):
+        self.stream = stream
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.bytes_read: int = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer: str = ""
+        self._buffer_offset: int = 0
+        self._position: int = 0
+        self._at_end: bool = False
+
+    def __iter__(self) -> Iterator[tuple[str, Any]]:
+        containers: list[str] = []
+        state: str = "value"
+
+        while True:
+            character: str = self._peek()
+            if state == "done":
+                if character:
+                    self._fail("Extra data after the end of the document")
+                return
+            if not character:
+                self._fail("Unexpected end of the document")
+
+            if state in ("key", "key_or_end"):
+                if character == "}" and state == "key_or_end":
+                    self._position += 1
+                    containers.pop()
+                    yield "end_map", None
+                elif character == '"':
+                    yield "map_key", self._read_string()
+                    state = "colon"
+                    continue
+                else:
+                    self._fail("Expected a property name")
+            elif state == "colon":
+                if character != ":":
+                    self._fail("Expected ':'")
+                self._position += 1
+                state = "value"
+                continue
+            elif state == "comma_or_end":
+                end_character: str = "}" if containers[-1] == "map" else "]"
+                if character == ",":
+                    self._position += 1
+                    state = "key" if containers[-1] == "map" else "value"
+                    continue
+                if character != end_character:
+                    self._fail(f"Expected ',' or '{end_character}'")
+                self._position += 1
+                yield f"end_{containers.pop()}", None
+            elif character == "]" and state == "value_or_end":
+                self._position += 1
+                containers.pop()
+                yield "end_array", None
+            elif character in "{[":
+                self._position += 1
+                container: str = "map" if character == "{" else "array"
+                containers.append(container)
+                yield f"start_{container}", None
+                state = "key_or_end" if container == "map" else "value_or_end"
+                continue
+            elif character == '"':
+                yield "value", self._read_string()
+            elif character == "-" or character.isdigit():
+                yield "value", self._read_number()
+            else:
+                yield "value", self._read_literal()
+
+            # A value, or a whole container, has just been read.
+            state = "comma_or_end" if containers else "done"
+
+    def _peek(self) -> str:
+        """Skips whitespace, and returns the next character or "" at the end."""
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()  # type: ignore[union-attr]
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if self._at_end:
+                return ""
+            self._read_chunk()
+
+    def _read_chunk(self) -> None:
+        chunk: bytes = self.stream.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_size:
+            msg = f"The document is larger than {self.max_size} bytes"
+            raise JSONStreamTooLargeError(msg)
+
+        try:
+            text: str = self._decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as error:
+            msg = "The document is not valid UTF-8"
+            raise JSONStreamError(msg) from error
+
+        # Drop what has been read already, so the buffer only holds one token.
+        self._buffer_offset += self._position
+        self._buffer = self._buffer[self._position :] + text
+        self._position = 0
+        self._at_end = not chunk
+
+    def _read_string(self) -> str:
+        # Strings longer than a chunk are only matched again once a quote comes in.
+        search_start: int = self._position + 1
+        while True:
+            if self._buffer.find('"', search_start) != -1 and STRING.match(
+                self._buffer, self._position
+            ):
+                try:
+                    value, self._position = scanstring(self._buffer, self._position + 1)
+                except ValueError as error:
+                    raise JSONStreamError(str(error)) from error
+                return value
+            if self._at_end:
+                self._fail("Unterminated string")
+            # The buffer is shifted to the start of the string by the next read.
+            search_start = len(self._buffer) - self._position
+            self._read_chunk()
+
+    def _read_number(self) -> float | int:
+        while True:
+            end: int = NUMBER_CHARACTERS.match(self._buffer, self._position).end()  # type: ignore[union-attr]
+            if end < len(self._buffer) or self._at_end:
+                break
+            self._read_chunk()
+
+        match = NUMBER.fullmatch(self._buffer, self._position, end)
+        if match is None:
+            self._fail("Invalid number")
+        self._position = end
+        is_integer: bool = match.group(1) is None and match.group(2) is None  # type: ignore[union-attr]
+        return int(match.group()) if is_integer else float(match.group())  # type: ignore[union-attr]
+
+    def _read_literal(self) -> Any:
+        longest: int = max(len(literal) for literal in LITERALS)
+        while len(self._buffer) - self._position < longest and not self._at_end:
+            self._read_chunk()
+
+        for literal, value in LITERALS.items():
+            if self._buffer.startswith(literal, self._position):
+                self._position += len(literal)
+                return value
+        self._fail("Expected a value")
+        return None
+
+    def _fail(self, message: str) -> None:
+        msg = f"{message} at character {self._buffer_offset + self._position}."
+        raise JSONStreamError(msg)
+
+
+def read_value(events: Iterator[tuple[str, Any]], event: str, value: Any) -> Any:
+    """Builds the value that starts with the given event, consuming its other events."""
+    if event == "value":
+        return value
+
+    containers: list[Any] = [{} if event == "start_map" else []]
+    keys: list[Any] = [None]
+    for event, value in events:  # noqa: B020
+        if event == "map_key":
+            keys[-1] = value
+            continue
+        if event in ("start_map", "start_array"):
+            containers.append({} if event == "start_map" else [])
+            keys.append(None)
+            continue
+
+        if event == "value":
+            item: Any = value
+        else:
+            item = containers.pop()
+            keys.pop()
+            if not containers:
+                return item
+
+        if isinstance(containers[-1], list):
+            containers[-1].append(item)
+        else:
+            containers[-1][keys[-1]] = item
+
+    msg = "Unexpected end of the document"
+    raise JSONStreamError(msg)
+
+
+def skip_value(events: Iterator[tuple[str, Any]], event: str) -> None:
+    """Consumes the events of the value that starts with the given event."""
+    depth: int = 1 if event in ("start_map", "start_array") else 0
+    while depth:
+        event, _ = next(events)
+        if event in ("start_map", "start_array"):
+            depth += 1
+        elif event in ("end_map", "end_array"):
+            depth -= 1
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_case_revisions(apps, _):
+    AssuranceCase = apps.get_model("eap_api", "AssuranceCase")
+    AssuranceCaseRevision = apps.get_model("eap_api", "AssuranceCaseRevision")
+
+    AssuranceCaseRevision.objects.bulk_create(
+        [
+            AssuranceCaseRevision(assurance_case_id=case_id, number=1)
+            for case_id in AssuranceCase.objects.values_list("pk", flat=True)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0025_alter_assurancecaseimage_assurance_case"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssuranceCaseRevision",
+            fields=[
+                (
+                    "assurance_case",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="revision",
+                        serialize=False,
+                        to="eap_api.assurancecase",
+                    ),
+                ),
+                ("number", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_case_revisions, migrations.RunPython.noop),
+    ]
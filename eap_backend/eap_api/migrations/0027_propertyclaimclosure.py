@@ -0,0 +1,86 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_property_claim_closure(apps, _):
+    # A copy of model_utils.rebuild_property_claim_closure at the time of this
+    # migration, which must not change with the code.
+    PropertyClaim = apps.get_model("eap_api", "PropertyClaim")
+    PropertyClaimClosure = apps.get_model("eap_api", "PropertyClaimClosure")
+    parent_ids = dict(PropertyClaim.objects.values_list("pk", "property_claim_id"))
+
+    links = []
+    levels = {}
+    for claim_id in parent_ids:
+        ancestor_id = claim_id
+        path = set()
+        while ancestor_id is not None and ancestor_id not in path:
+            links.append(
+                PropertyClaimClosure(
+                    ancestor_id=ancestor_id, descendant_id=claim_id, depth=len(path)
+                )
+            )
+            path.add(ancestor_id)
+            ancestor_id = parent_ids.get(ancestor_id)
+        levels[claim_id] = len(path)
+
+    PropertyClaimClosure.objects.bulk_create(links, batch_size=1000)
+    PropertyClaim.objects.bulk_update(
+        [
+            PropertyClaim(pk=claim_id, level=levels[claim_id])
+            for claim_id, level in PropertyClaim.objects.values_list("pk", "level")
+            if level != levels[claim_id]
+        ],
+        ["level"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0026_assurancecaserevision"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PropertyClaimClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="eap_api.propertyclaim",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="eap_api.propertyclaim",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="propertyclaimclosure",
+            constraint=models.UniqueConstraint(
+                fields=("ancestor", "descendant"), name="unique_claim_closure_link"
+            ),
+        ),
+        migrations.RunPython(build_property_claim_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:31
+
+from django.db import migrations
+
+
+def backfill_item_case_ids(apps, _):
+    """Copies the case of every item's parent into its assurance_case column.
+
+    Items without a parent, like those in the sandbox, keep the case they have.
+    """
+    TopLevelNormativeGoal = apps.get_model("eap_api", "TopLevelNormativeGoal")
+    Context = apps.get_model("eap_api", "Context")
+    Strategy = apps.get_model("eap_api", "Strategy")
+    PropertyClaim = apps.get_model("eap_api", "PropertyClaim")
+    Evidence = apps.get_model("eap_api", "Evidence")
+
+    goal_case_ids: dict = dict(
+        TopLevelNormativeGoal.objects.values_list("pk", "assurance_case_id")
+    )
+
+    def update_case_ids(model, case_ids: dict) -> None:
+        model.objects.bulk_update(
+            [
+                model(pk=item_id, assurance_case_id=case_ids[item_id])
+                for item_id, case_id in model.objects.values_list(
+                    "pk", "assurance_case_id"
+                )
+                if case_ids.get(item_id) is not None and case_ids[item_id] != case_id
+            ],
+            ["assurance_case_id"],
+            batch_size=1000,
+        )
+
+    context_case_ids: dict = {
+        context_id: goal_case_ids.get(goal_id)
+        for context_id, goal_id in Context.objects.values_list("pk", "goal_id")
+    }
+    update_case_ids(Context, context_case_ids)
+
+    strategy_case_ids: dict = {
+        strategy_id: goal_case_ids.get(goal_id)
+        for strategy_id, goal_id in Strategy.objects.values_list("pk", "goal_id")
+    }
+    update_case_ids(Strategy, strategy_case_ids)
+
+    claims: dict = {
+        claim_id: (goal_id, strategy_id, parent_id, case_id)
+        for claim_id, goal_id, strategy_id, parent_id, case_id in (
+            PropertyClaim.objects.values_list(
+                "pk", "goal_id", "strategy_id", "property_claim_id", "assurance_case_id"
+            )
+        )
+    }
+    claim_case_ids: dict = {}
+    for claim_id in claims:
+        path: list = []
+        current_id = claim_id
+        while current_id in claims and current_id not in claim_case_ids:
+            if current_id in path:
+                break
+            path.append(current_id)
+            goal_id, strategy_id, parent_id, case_id = claims[current_id]
+            if goal_id is not None:
+                claim_case_ids[current_id] = goal_case_ids.get(goal_id)
+            elif strategy_id is not None:
+                claim_case_ids[current_id] = strategy_case_ids.get(strategy_id)
+            elif parent_id is None:
+                claim_case_ids[current_id] = case_id
+            else:
+                current_id = parent_id
+
+        top_case_id = claim_case_ids.get(current_id)
+        for path_id in path:
+            claim_case_ids[path_id] = top_case_id
+    update_case_ids(PropertyClaim, claim_case_ids)
+
+    evidence_case_ids: dict = {}
+    for evidence_id, claim_id in Evidence.property_claim.through.objects.values_list(
+        "evidence_id", "propertyclaim_id"
+    ).order_by("pk"):
+        if evidence_case_ids.get(evidence_id) is None:
+            evidence_case_ids[evidence_id] = claim_case_ids.get(claim_id)
+    update_case_ids(Evidence, evidence_case_ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0027_propertyclaimclosure"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_item_case_ids, migrations.RunPython.noop),
+    ]
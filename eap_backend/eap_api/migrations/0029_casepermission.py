@@ -0,0 +1,98 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_case_permissions(apps, _):
+    # A copy of model_utils.refresh_case_permissions at the time of this migration,
+    # which must not change with the code. Owners manage their cases, and group
+    # members get the highest permission of their groups.
+    AssuranceCase = apps.get_model("eap_api", "AssuranceCase")
+    CasePermission = apps.get_model("eap_api", "CasePermission")
+
+    permissions = {}
+    for group_relation, permission in (
+        (AssuranceCase.view_groups, "view"),
+        (AssuranceCase.review_groups, "review"),
+        (AssuranceCase.edit_groups, "edit"),
+    ):
+        for case_id, user_id in group_relation.through.objects.filter(
+            eapgroup__member__isnull=False
+        ).values_list("assurancecase_id", "eapgroup__member"):
+            permissions[(user_id, case_id)] = permission
+
+    for case_id, owner_id in AssuranceCase.objects.filter(
+        owner__isnull=False
+    ).values_list("pk", "owner_id"):
+        permissions[(owner_id, case_id)] = "manage"
+
+    CasePermission.objects.bulk_create(
+        [
+            CasePermission(
+                user_id=user_id, assurance_case_id=case_id, permission=permission
+            )
+            for (user_id, case_id), permission in permissions.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0028_backfill_item_case_ids"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CasePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.CharField(
+                        choices=[
+                            ("manage", "Manage"),
+                            ("edit", "Edit"),
+                            ("review", "Review"),
+                            ("view", "View"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "assurance_case",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="user_permissions",
+                        to="eap_api.assurancecase",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="case_permissions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="casepermission",
+            constraint=models.UniqueConstraint(
+                fields=("user", "assurance_case"), name="unique_case_permission"
+            ),
+        ),
+        migrations.RunPython(build_case_permissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:56
+
+import django.core.files.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0029_casepermission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CaseJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("import", "Import"),
+                            ("export", "Export"),
+                            ("update_identifiers", "Update Identifiers"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                (
+                    "input_file",
+                    models.FileField(
+                        blank=True,
+                        storage=django.core.files.storage.FileSystemStorage(),
+                        upload_to="jobs/input/",
+                    ),
+                ),
+                (
+                    "result_file",
+                    models.FileField(
+                        blank=True,
+                        storage=django.core.files.storage.FileSystemStorage(),
+                        upload_to="jobs/result/",
+                    ),
+                ),
+                ("result", models.JSONField(blank=True, default=dict)),
+                ("progress", models.PositiveSmallIntegerField(default=0)),
+                ("worker", models.CharField(blank=True, max_length=200)),
+                ("created_date", models.DateTimeField(auto_now_add=True)),
+                ("started_date", models.DateTimeField(blank=True, null=True)),
+                ("finished_date", models.DateTimeField(blank=True, null=True)),
+                (
+                    "assurance_case",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to="eap_api.assurancecase",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="case_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="casejob",
+            index=models.Index(
+                fields=["status", "created_date"], name="eap_api_cas_status_8bbdad_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.8 on 2026-10-18 21:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0030_casejob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CaseItemSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefix", models.CharField(max_length=8)),
+                ("parent_id", models.PositiveIntegerField(default=0)),
+                ("last_number", models.PositiveIntegerField(default=0)),
+                (
+                    "assurance_case",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="item_sequences",
+                        to="eap_api.assurancecase",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="caseitemsequence",
+            constraint=models.UniqueConstraint(
+                fields=("assurance_case", "prefix", "parent_id"),
+                name="unique_case_item_sequence",
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.8 on 2026-10-18 21:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_change_journals(apps, _):
+    # Past revisions of existing cases were not journaled.
+    AssuranceCaseRevision = apps.get_model("eap_api", "AssuranceCaseRevision")
+    AssuranceCaseRevision.objects.update(compacted_number=F("number"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0031_caseitemsequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assurancecaserevision",
+            name="compacted_number",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="CaseChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveBigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("create", "Create"),
+                            ("update", "Update"),
+                            ("delete", "Delete"),
+                            ("attach", "Attach"),
+                            ("detach", "Detach"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("item_type", models.CharField(max_length=32)),
+                ("item_id", models.PositiveIntegerField()),
+                ("created_date", models.DateTimeField(auto_now_add=True)),
+                (
+                    "assurance_case",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="changes",
+                        to="eap_api.assurancecase",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="casechange",
+            index=models.Index(
+                fields=["assurance_case", "sequence"],
+                name="eap_api_cas_assuran_664dcf_idx",
+            ),
+        ),
+        migrations.RunPython(start_change_journals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.8 on 2026-10-18 21:59
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_heartbeats(apps, _):
+    # Jobs running already expire a lease after they started.
+    CaseJob = apps.get_model("eap_api", "CaseJob")
+    CaseJob.objects.filter(status="running").update(heartbeat_date=F("started_date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_api", "0032_casechange"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="casejob",
+            name="heartbeat_date",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
@@ -1,34 +1,319 @@
-from typing import Callable
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Iterator, Optional, cast
 
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import F, Q
 from django.db.models.query import QuerySet
+from django.dispatch import Signal
 
 from .models import (
+    AssuranceCase,
+    AssuranceCaseRevision,
+    CaseChange,
+    CaseItemSequence,
+    CasePermission,
     PropertyClaim,
-    Strategy,
+    PropertyClaimClosure,
     TopLevelNormativeGoal,
 )
 
 
-def get_property_claims_by_case_id(case_id: int | None) -> tuple[list[int], list[int]]:
-    if case_id is None:
-        error_message: str = "Please provide an assurance case id."
-        raise ValueError(error_message)
+def get_case_revision(case_id: int) -> int:
+    """Returns the current revision of an assurance case, or 0 if it has none."""
+    revision: Optional[int] = (
+        AssuranceCaseRevision.objects.filter(assurance_case_id=case_id)
+        .values_list("number", flat=True)
+        .first()
+    )
+
+    return 0 if revision is None else revision
+
+
+# A change journaled for a case, as an action, an item type and an item id.
+CaseChangeEntry = tuple[str, str, int]
+
+# Changes made inside deferring_revision_bumps, by case, to be journaled when it ends.
+_deferred_case_changes: ContextVar[Optional[dict[int, list[CaseChangeEntry]]]] = (
+    ContextVar("deferred_case_changes", default=None)
+)
+
+
+# Sent with the case_id, sequence and changes of every new revision of a case, before
+# its transaction commits.
+case_revised: Signal = Signal()
+
+
+def bump_case_revision(case_id: int, changes: Iterable[CaseChangeEntry] = ()) -> None:
+    """Increases the revision of an assurance case, signalling its content changed.
+
+    The changes are recorded in the journal of the case, with the new revision as
+    their sequence. Without any, the case itself is recorded as updated. Receivers of
+    case_revised are then told about the new revision.
+
+    Args:
+        case_id: The case that changed.
+        changes: What changed, as in ("update", "context", 3).
+    """
+    case_changes: list[CaseChangeEntry] = list(changes) or [
+        (CaseChange.Action.UPDATE, "assurance_case", case_id)
+    ]
 
-    current_case_goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(
-        assurance_case_id=case_id
+    deferred_changes: Optional[dict[int, list[CaseChangeEntry]]] = (
+        _deferred_case_changes.get()
     )
+    if deferred_changes is not None:
+        deferred_changes.setdefault(case_id, []).extend(case_changes)
+        return
+
+    table: str = connection.ops.quote_name(AssuranceCaseRevision._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # RETURNING needs PostgreSQL, or SQLite 3.35+.
+        cursor.execute(
+            f"""
+            UPDATE {table} SET number = number + 1
+            WHERE assurance_case_id = %s
+            RETURNING number
+            """,
+            [case_id],
+        )
+        row: Optional[tuple[int]] = cursor.fetchone()
+        # Cases being deleted have lost their revision already, see signals.py.
+        if row is None:
+            return
+
+        journaled_changes: list[CaseChangeEntry] = list(
+            dict.fromkeys(
+                (str(action), item_type, item_id)
+                for action, item_type, item_id in case_changes
+            )
+        )
+        CaseChange.objects.bulk_create(
+            [
+                CaseChange(
+                    assurance_case_id=case_id,
+                    sequence=row[0],
+                    action=action,
+                    item_type=item_type,
+                    item_id=item_id,
+                )
+                for action, item_type, item_id in journaled_changes
+            ]
+        )
+        case_revised.send(
+            sender=AssuranceCaseRevision,
+            case_id=case_id,
+            sequence=row[0],
+            changes=journaled_changes,
+        )
+
+
+@contextmanager
+def deferring_revision_bumps() -> Iterator[None]:
+    """Bumps the revision of each case changed in the block once, when it ends.
+
+    All the changes made to a case in the block are journaled under that revision.
+    Nothing is bumped if the block raises, as its changes are expected to be rolled
+    back. Nested blocks leave the bumps to the outermost one.
+    """
+    if _deferred_case_changes.get() is not None:
+        yield
+        return
+
+    deferred_changes: dict[int, list[CaseChangeEntry]] = {}
+    token = _deferred_case_changes.set(deferred_changes)
+    try:
+        yield
+    finally:
+        _deferred_case_changes.reset(token)
+
+    for case_id in sorted(deferred_changes):
+        bump_case_revision(case_id, deferred_changes[case_id])
+
+
+def compact_case_changes(keep: int) -> int:
+    """Removes all but the latest entries of the change journal of every case.
+
+    Clients that last synchronised before the remaining entries have to reload the
+    whole case.
+
+    Args:
+        keep: How many of the latest revisions of each case to keep changes for.
+
+    Returns:
+        The number of journal entries removed.
+    """
+    with transaction.atomic():
+        AssuranceCaseRevision.objects.filter(
+            compacted_number__lt=F("number") - keep
+        ).update(compacted_number=F("number") - keep)
+        deleted_count, _ = CaseChange.objects.filter(
+            sequence__lte=F("assurance_case__revision__compacted_number")
+        ).delete()
+
+    return deleted_count
+
+
+def allocate_item_number(
+    case_id: Optional[int],
+    prefix: str,
+    parent_id: int,
+    count_existing: Callable[[], int],
+) -> int:
+    """Returns the number for a new item of a case, such as 3 for a new claim P3.
+
+    Numbers come from a CaseItemSequence row, incremented and read in a single
+    statement. The row stays locked until the transaction ends, so items added to the
+    same group at once get different numbers. The first number of a group follows the
+    items it already has, which are only counted then, and renumbering the group sets
+    its row back to how many it has, unless a number was given meanwhile, see
+    UpdateIdentifierUtils.number_group.
+
+    Args:
+        case_id: Case of the new item. Items without one are numbered from the count.
+        prefix: Prefix of the item names, as in "P".
+        parent_id: Id of the item holding the group, or 0 for the case itself.
+        count_existing: Counts the items already in the group.
+    """
+    if case_id is None:
+        return count_existing() + 1
+
+    table: str = connection.ops.quote_name(CaseItemSequence._meta.db_table)
+    key: list[Any] = [case_id, prefix, parent_id]
+
+    # RETURNING needs PostgreSQL, or SQLite 3.35+.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET last_number = last_number + 1
+            WHERE assurance_case_id = %s AND prefix = %s AND parent_id = %s
+            RETURNING last_number
+            """,
+            key,
+        )
+        row: Optional[tuple[int]] = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (assurance_case_id, prefix, parent_id, last_number)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (assurance_case_id, prefix, parent_id)
+                DO UPDATE SET last_number = {table}.last_number + 1
+                RETURNING last_number
+                """,
+                [*key, count_existing() + 1],
+            )
+            row = cursor.fetchone()
+
+    return cast(tuple[int], row)[0]
+
+
+def compute_case_permissions(case_ids: Iterable[int]) -> dict[tuple[int, int], str]:
+    """Works out the effective permission of every user on the given cases.
+
+    Owners manage their cases, and group members get the highest permission among
+    edit, review and view.
+
+    Returns:
+        The permission of each (user id, case id) pair with access to a case.
+    """
+    case_ids = list(case_ids)
+    permissions: dict[tuple[int, int], str] = {}
+
+    for group_relation, permission in (
+        (AssuranceCase.view_groups, CasePermission.Level.VIEW),
+        (AssuranceCase.review_groups, CasePermission.Level.REVIEW),
+        (AssuranceCase.edit_groups, CasePermission.Level.EDIT),
+    ):
+        for case_id, user_id in group_relation.through.objects.filter(
+            assurancecase_id__in=case_ids, eapgroup__member__isnull=False
+        ).values_list("assurancecase_id", "eapgroup__member"):
+            permissions[(user_id, case_id)] = permission
+
+    for case_id, owner_id in AssuranceCase.objects.filter(
+        pk__in=case_ids, owner__isnull=False
+    ).values_list("pk", "owner_id"):
+        permissions[(owner_id, case_id)] = CasePermission.Level.MANAGE
+
+    return {key: str(permission) for key, permission in permissions.items()}
 
-    current_case_strategies: QuerySet = Strategy.objects.filter(
-        goal_id=current_case_goal.pk
+
+def refresh_case_permissions(case_ids: Iterable[int]) -> None:
+    """Brings the permission index of the given cases in line with their groups."""
+    case_ids = list(case_ids)
+    if not case_ids:
+        return
+
+    expected: dict[tuple[int, int], str] = compute_case_permissions(case_ids)
+
+    with transaction.atomic():
+        indexed: dict[tuple[int, int], tuple[int, str]] = {
+            (user_id, case_id): (row_id, permission)
+            for row_id, user_id, case_id, permission in (
+                CasePermission.objects.filter(
+                    assurance_case_id__in=case_ids
+                ).values_list("pk", "user_id", "assurance_case_id", "permission")
+            )
+        }
+
+        CasePermission.objects.filter(
+            pk__in=[
+                row_id for key, (row_id, _) in indexed.items() if key not in expected
+            ]
+        ).delete()
+        CasePermission.objects.bulk_update(
+            [
+                CasePermission(pk=indexed[key][0], permission=permission)
+                for key, permission in expected.items()
+                if key in indexed and indexed[key][1] != permission
+            ],
+            ["permission"],
+        )
+        CasePermission.objects.bulk_create(
+            [
+                CasePermission(
+                    user_id=user_id, assurance_case_id=case_id, permission=permission
+                )
+                for (user_id, case_id), permission in expected.items()
+                if (user_id, case_id) not in indexed
+            ]
+        )
+
+
+def find_case_permission_errors() -> list[str]:
+    """Compares the permission index with case ownership and groups.
+
+    Returns:
+        A description of every missing, outdated or spurious index entry.
+    """
+    expected: dict[tuple[int, int], str] = compute_case_permissions(
+        AssuranceCase.objects.values_list("pk", flat=True)
     )
+    indexed: dict[tuple[int, int], str] = {
+        (user_id, case_id): permission
+        for user_id, case_id, permission in CasePermission.objects.values_list(
+            "user_id", "assurance_case_id", "permission"
+        )
+    }
 
-    (
-        top_level_claim_ids,
-        child_claim_ids,
-    ) = get_case_property_claims(current_case_goal, current_case_strategies)
+    errors: list[str] = []
+    for (user_id, case_id), permission in expected.items():
+        if (user_id, case_id) not in indexed:
+            errors.append(f"User {user_id} should {permission} case {case_id}.")
+        elif indexed[(user_id, case_id)] != permission:
+            errors.append(
+                f"User {user_id} should {permission} case {case_id}, "
+                f"but the index says {indexed[(user_id, case_id)]}."
+            )
+    for (user_id, case_id), permission in indexed.items():
+        if (user_id, case_id) not in expected:
+            errors.append(
+                f"User {user_id} should not {permission} case {case_id}, "
+                "but the index says so."
+            )
 
-    return top_level_claim_ids, child_claim_ids
+    return errors
 
 
 def get_case_property_claims(
@@ -51,37 +336,164 @@ def get_case_property_claims(
 
     top_level_claim_ids: list[int] = [claim.pk for claim in top_level_claims]
 
-    child_claim_ids: list[int] = []
-    for parent_claim_id in top_level_claim_ids:
-        traverse_child_property_claims(
-            lambda _, child, parent: child_claim_ids.append(child.pk),  # noqa: ARG005
-            parent_claim_id,
+    child_claim_ids: list[int] = list(
+        PropertyClaim.objects.filter(
+            ancestor_links__ancestor_id__in=top_level_claim_ids,
+            ancestor_links__depth__gt=0,
         )
+        .values_list("pk", flat=True)
+        .distinct()
+    )
 
     return top_level_claim_ids, sorted(child_claim_ids)
 
 
+def get_descendant_property_claims(claim_id: int) -> QuerySet:
+    """Retrieves all the descendants of a property claim, using the closure table.
+
+    Args:
+        claim_id: The id of the claim whose descendants we want.
+
+    Returns:
+        The descendants, sorted by depth and then primary key.
+    """
+    return PropertyClaim.objects.filter(
+        ancestor_links__ancestor_id=claim_id, ancestor_links__depth__gt=0
+    ).order_by("ancestor_links__depth", "pk")
+
+
+def get_property_claim_path(claim_id: int) -> QuerySet:
+    """Retrieves the path from the top-level claim to a claim, using the closure table.
+
+    Args:
+        claim_id: The id of the claim at the end of the path.
+
+    Returns:
+        The claim and all its ancestors, starting from the top-level claim.
+    """
+    return PropertyClaim.objects.filter(
+        descendant_links__descendant_id=claim_id
+    ).order_by("-descendant_links__depth")
+
+
+def rebuild_property_claim_closure(batch_size: int = 1000) -> int:
+    """Regenerates the closure table, and the claim levels, from the parent links.
+
+    Returns:
+        The number of rows in the new closure table.
+    """
+    parent_ids: dict[int, Optional[int]] = dict(
+        PropertyClaim.objects.values_list("pk", "property_claim_id")
+    )
+
+    links: list[PropertyClaimClosure] = []
+    levels: dict[int, int] = {}
+    for claim_id in parent_ids:
+        ancestor_id: Optional[int] = claim_id
+        path: set[int] = set()
+        while ancestor_id is not None and ancestor_id not in path:
+            links.append(
+                PropertyClaimClosure(
+                    ancestor_id=ancestor_id, descendant_id=claim_id, depth=len(path)
+                )
+            )
+            path.add(ancestor_id)
+            ancestor_id = parent_ids.get(ancestor_id)
+        levels[claim_id] = len(path)
+
+    with transaction.atomic():
+        PropertyClaimClosure.objects.all().delete()
+        PropertyClaimClosure.objects.bulk_create(links, batch_size=batch_size)
+        PropertyClaim.objects.bulk_update(
+            [
+                PropertyClaim(pk=claim_id, level=levels[claim_id])
+                for claim_id, level in PropertyClaim.objects.values_list("pk", "level")
+                if level != levels[claim_id]
+            ],
+            ["level"],
+            batch_size=batch_size,
+        )
+
+    return len(links)
+
+
+def get_property_claim_subtrees(root_claim_ids: list[int]) -> list[PropertyClaim]:
+    """Retrieves property claims and all their descendants in a single query.
+
+    Args:
+        root_claim_ids: The ids of the claims at the top of each subtree.
+
+    Returns:
+        The root claims and their descendants, sorted by depth and then primary key.
+        Every claim has a depth attribute, which is 0 for the roots.
+    """
+    if not root_claim_ids:
+        return []
+
+    table: str = connection.ops.quote_name(PropertyClaim._meta.db_table)
+    root_placeholders: str = ", ".join(["%s"] * len(root_claim_ids))
+
+    # Supported by both SQLite (3.8.3+) and PostgreSQL.
+    query: str = f"""
+        WITH RECURSIVE claim_tree (id, depth) AS (
+            SELECT id, 0 FROM {table} WHERE id IN ({root_placeholders})
+            UNION ALL
+            SELECT child.id, claim_tree.depth + 1
+            FROM {table} AS child
+            INNER JOIN claim_tree ON child.property_claim_id = claim_tree.id
+        )
+        SELECT claim.*, claim_tree.depth
+        FROM {table} AS claim
+        INNER JOIN claim_tree ON claim.id = claim_tree.id
+        ORDER BY claim_tree.depth, claim.id
+    """
+
+    return list(PropertyClaim.objects.raw(query, root_claim_ids))
+
+
 def traverse_child_property_claims(
     on_child_claim: Callable[[int, PropertyClaim, PropertyClaim], None],
     parent_claim_id: int,
 ):
     """Applies a function to all the children of a Property Claim.
 
+    The whole subtree is fetched in one query before traversal starts, and claims are
+    visited depth-first, siblings in primary key order. Each claim is passed as the
+    parent of its children after on_child_claim has been applied to it, so changes made
+    by the function are visible further down the tree.
+
     Args:
         on_child_claim: The function to call on each child claim.
         parent_claim_id: The id of the claim we will traverse.
     """
-    child_property_claims = PropertyClaim.objects.filter(
-        property_claim_id=parent_claim_id
-    ).order_by("id")
+    children_by_parent: dict[int, list[PropertyClaim]] = defaultdict(list)
+    parent_claim: Optional[PropertyClaim] = None
+    for claim in get_property_claim_subtrees([parent_claim_id]):
+        if claim.depth == 0:
+            parent_claim = claim
+        else:
+            children_by_parent[claim.property_claim_id].append(claim)
 
-    if len(child_property_claims) == 0:
+    if parent_claim is None:
         return
-    else:
-        for index, child_property_claim in enumerate(child_property_claims):
-            on_child_claim(
-                index,
-                child_property_claim,
-                PropertyClaim.objects.get(pk=parent_claim_id),
+
+    pending_claims: list[tuple[int, PropertyClaim, PropertyClaim]] = [
+        (index, child_claim, parent_claim)
+        for index, child_claim in enumerate(children_by_parent[parent_claim.pk])
+    ]
+    pending_claims.reverse()
+
+    while pending_claims:
+        index, child_claim, parent_claim = pending_claims.pop()
+        on_child_claim(index, child_claim, parent_claim)
+
+        pending_claims.extend(
+            reversed(
+                [
+                    (child_index, grandchild_claim, child_claim)
+                    for child_index, grandchild_claim in enumerate(
+                        children_by_parent[child_claim.pk]
+                    )
+                ]
             )
-            traverse_child_property_claims(on_child_claim, child_property_claim.pk)
+        )
@@ -2,7 +2,8 @@ import datetime
 from enum import Enum
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.utils import timezone
 
 # Classes representing tables in the database for EAP app.
@@ -71,6 +72,42 @@ class CaseItem(models.Model):
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        # Items always belong to the case of their parent. Items without one, like
+        # those in the sandbox, keep the case they were given.
+        parent_item: CaseItem | None = self.get_parent_item()
+        if parent_item is not None:
+            self.assurance_case_id = parent_item.assurance_case_id
+
+        case_changed: bool = (
+            not self._state.adding
+            and getattr(self, "_saved_case_id", None) != self.assurance_case_id
+        )
+
+        super().save(*args, **kwargs)
+
+        if case_changed:
+            self.update_descendant_case_ids()
+        self._saved_case_id = self.assurance_case_id
+        self._saved_in_sandbox = self.in_sandbox
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "assurance_case_id" in instance.__dict__:
+            instance._saved_case_id = instance.assurance_case_id
+        # Lets signals.py journal moves in and out of the sandbox as such.
+        if "in_sandbox" in instance.__dict__:
+            instance._saved_in_sandbox = instance.in_sandbox
+        return instance
+
+    def get_parent_item(self) -> "CaseItem | None":
+        """Returns the item this one hangs from, if it is not a top-level goal."""
+        return None
+
+    def update_descendant_case_ids(self) -> None:
+        """Moves the items below this one to its assurance case."""
+
 
 class AssuranceCase(models.Model):
     name = models.CharField(max_length=200)
@@ -99,6 +136,127 @@ class AssuranceCase(models.Model):
     def was_published_recently(self):
         return self.created_date >= timezone.now() - datetime.timedelta(days=1)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets signals.py notice owner changes, which affect the permission index.
+        if "owner_id" in instance.__dict__:
+            instance._saved_owner_id = instance.owner_id
+        return instance
+
+
+class CasePermission(models.Model):
+    """Effective permission of a user on an assurance case, as an index for lookups.
+
+    It is derived from case ownership and the edit, review and view groups of the
+    case, and kept up to date by signals.py. Cases without an owner have no rows, as
+    anyone can manage them.
+    """
+
+    class Level(models.TextChoices):
+        MANAGE = "manage"
+        EDIT = "edit"
+        REVIEW = "review"
+        VIEW = "view"
+
+    user = models.ForeignKey(
+        EAPUser, related_name="case_permissions", on_delete=models.CASCADE
+    )
+    assurance_case = models.ForeignKey(
+        AssuranceCase, related_name="user_permissions", on_delete=models.CASCADE
+    )
+    permission = models.CharField(max_length=16, choices=Level.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "assurance_case"], name="unique_case_permission"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} can {self.permission} {self.assurance_case}"
+
+
+class AssuranceCaseRevision(models.Model):
+    """Counter that increases every time an assurance case, or one of its items, changes.
+
+    It is kept apart from the AssuranceCase table, so saving a stale case instance
+    cannot overwrite a more recent revision.
+    """
+
+    assurance_case = models.OneToOneField(
+        AssuranceCase,
+        related_name="revision",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    number = models.PositiveBigIntegerField(default=0)
+    # Changes up to this revision are no longer in the change journal of the case.
+    compacted_number = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Revision {self.number} of {self.assurance_case}"
+
+
+class CaseChange(models.Model):
+    """Entry of the change journal of an assurance case, read by clients to catch up.
+
+    Every revision of a case records what changed in it, with the revision number as
+    sequence. Changes that are not to a single item, like those to the case itself or
+    to its permissions, are recorded as updates of the case. Old entries are removed by
+    the compact_case_changes command.
+    """
+
+    class Action(models.TextChoices):
+        CREATE = "create"
+        UPDATE = "update"
+        DELETE = "delete"
+        ATTACH = "attach"
+        DETACH = "detach"
+
+    assurance_case = models.ForeignKey(
+        AssuranceCase, related_name="changes", on_delete=models.CASCADE
+    )
+    sequence = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=16, choices=Action.choices)
+    item_type = models.CharField(max_length=32)
+    item_id = models.PositiveIntegerField()
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["assurance_case", "sequence"])]
+
+    def __str__(self):
+        return f"{self.action} {self.item_type} {self.item_id} at {self.sequence}"
+
+
+class CaseItemSequence(models.Model):
+    """Last number given to a new item of a case, for each prefix and parent.
+
+    Parents are the goal of contexts and strategies, and the parent claim of child
+    claims. Goals, top-level claims and evidence are numbered across the whole case,
+    with a parent_id of 0. See model_utils.allocate_item_number.
+    """
+
+    assurance_case = models.ForeignKey(
+        AssuranceCase, related_name="item_sequences", on_delete=models.CASCADE
+    )
+    prefix = models.CharField(max_length=8)
+    parent_id = models.PositiveIntegerField(default=0)
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["assurance_case", "prefix", "parent_id"],
+                name="unique_case_item_sequence",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_number} under {self.parent_id} in {self.assurance_case}"
+
 
 class TopLevelNormativeGoal(CaseItem):
     keywords = models.CharField(max_length=3000)
@@ -110,6 +268,20 @@ class TopLevelNormativeGoal(CaseItem):
     def __str__(self):
         return self.name
 
+    def update_descendant_case_ids(self) -> None:
+        Context.objects.filter(goal_id=self.pk).update(
+            assurance_case_id=self.assurance_case_id
+        )
+        Strategy.objects.filter(goal_id=self.pk).update(
+            assurance_case_id=self.assurance_case_id
+        )
+        _update_claim_subtree_case_ids(
+            PropertyClaim.objects.filter(
+                models.Q(goal_id=self.pk) | models.Q(strategy__goal_id=self.pk)
+            ),
+            self.assurance_case_id,
+        )
+
 
 class Context(CaseItem):
     shape = Shape.ROUNDED_RECTANGLE
@@ -128,6 +300,9 @@ class Context(CaseItem):
         null=True,
     )
 
+    def get_parent_item(self) -> CaseItem | None:
+        return self.goal
+
 
 class Strategy(CaseItem):
     shape = Shape.ROUNDED_RECTANGLE
@@ -150,6 +325,14 @@ class Strategy(CaseItem):
     def __str__(self):
         return self.name
 
+    def get_parent_item(self) -> CaseItem | None:
+        return self.goal
+
+    def update_descendant_case_ids(self) -> None:
+        _update_claim_subtree_case_ids(
+            PropertyClaim.objects.filter(strategy_id=self.pk), self.assurance_case_id
+        )
+
 
 class PropertyClaim(CaseItem):
     class ClaimType(models.TextChoices):
@@ -208,6 +391,20 @@ class PropertyClaim(CaseItem):
             error_message = "A PropertyClaim cannot be the parent of itself."
             raise ValueError(error_message)
 
+        adding: bool = self._state.adding
+        moved: bool = (
+            not adding and self._get_saved_parent_id() != self.property_claim_id
+        )
+        if (
+            moved
+            and self.property_claim_id is not None
+            and PropertyClaimClosure.objects.filter(
+                ancestor_id=self.pk, descendant_id=self.property_claim_id
+            ).exists()
+        ):
+            error_message = "A PropertyClaim cannot be the descendant of itself."
+            raise ValueError(error_message)
+
         try:
             parent_level = self.property_claim.level  # type:ignore[attr-defined]
         except AttributeError:
@@ -215,7 +412,125 @@ class PropertyClaim(CaseItem):
 
         self.level = parent_level + 1
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self._link_to_ancestors()
+            elif moved:
+                self._move_subtree()
+
+        self._saved_parent_id = self.property_claim_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "property_claim_id" in instance.__dict__:
+            instance._saved_parent_id = instance.property_claim_id
+        return instance
+
+    def get_parent_item(self) -> CaseItem | None:
+        return self.goal or self.strategy or self.property_claim
+
+    def update_descendant_case_ids(self) -> None:
+        _update_claim_subtree_case_ids(
+            PropertyClaim.objects.filter(pk=self.pk), self.assurance_case_id
+        )
+
+    def _get_saved_parent_id(self) -> int | None:
+        try:
+            return self._saved_parent_id
+        except AttributeError:
+            return (
+                PropertyClaim.objects.filter(pk=self.pk)
+                .values_list("property_claim_id", flat=True)
+                .first()
+            )
+
+    def _link_to_ancestors(self) -> None:
+        links: list[PropertyClaimClosure] = [
+            PropertyClaimClosure(ancestor_id=self.pk, descendant_id=self.pk, depth=0)
+        ]
+        if self.property_claim_id is not None:
+            links += [
+                PropertyClaimClosure(
+                    ancestor_id=ancestor_id, descendant_id=self.pk, depth=depth + 1
+                )
+                for ancestor_id, depth in PropertyClaimClosure.objects.filter(
+                    descendant_id=self.property_claim_id
+                ).values_list("ancestor_id", "depth")
+            ]
+
+        PropertyClaimClosure.objects.bulk_create(links)
+
+    def _move_subtree(self) -> None:
+        """Re-links this claim and its descendants under the new parent."""
+        subtree_links: list[tuple[int, int]] = list(
+            PropertyClaimClosure.objects.filter(ancestor_id=self.pk).values_list(
+                "descendant_id", "depth"
+            )
+        )
+        if not subtree_links:
+            # Claims created in bulk are not indexed until the index is rebuilt.
+            self._link_to_ancestors()
+            return
+
+        subtree_ids: list[int] = [descendant_id for descendant_id, _ in subtree_links]
+        PropertyClaimClosure.objects.filter(descendant_id__in=subtree_ids).exclude(
+            ancestor_id__in=subtree_ids
+        ).delete()
+
+        if self.property_claim_id is not None:
+            PropertyClaimClosure.objects.bulk_create(
+                [
+                    PropertyClaimClosure(
+                        ancestor_id=ancestor_id,
+                        descendant_id=descendant_id,
+                        depth=ancestor_depth + descendant_depth + 1,
+                    )
+                    for ancestor_id, ancestor_depth in PropertyClaimClosure.objects.filter(
+                        descendant_id=self.property_claim_id
+                    ).values_list(
+                        "ancestor_id", "depth"
+                    )
+                    for descendant_id, descendant_depth in subtree_links
+                ]
+            )
+
+        descendants_by_depth: dict[int, list[int]] = {}
+        for descendant_id, depth in subtree_links:
+            if depth > 0:
+                descendants_by_depth.setdefault(depth, []).append(descendant_id)
+        for depth, descendant_ids in descendants_by_depth.items():
+            PropertyClaim.objects.filter(pk__in=descendant_ids).update(
+                level=self.level + depth
+            )
+
+
+class PropertyClaimClosure(models.Model):
+    """Ancestor/descendant index of the PropertyClaim tree.
+
+    There is a row for every claim and each of its ancestors, including the claim
+    itself at depth 0. PropertyClaim.save keeps it up to date, and the
+    rebuild_claim_closure management command regenerates it from scratch.
+    """
+
+    ancestor = models.ForeignKey(
+        PropertyClaim, related_name="descendant_links", on_delete=models.CASCADE
+    )
+    descendant = models.ForeignKey(
+        PropertyClaim, related_name="ancestor_links", on_delete=models.CASCADE
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"], name="unique_claim_closure_link"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
 
 
 class Evidence(CaseItem):
@@ -231,6 +546,24 @@ class Evidence(CaseItem):
         null=True,
     )
 
+    def get_parent_item(self) -> CaseItem | None:
+        # Links to property claims are added after the first save, see signals.py.
+        if self.pk is None:
+            return None
+        return self.property_claim.first()
+
+
+def _update_claim_subtree_case_ids(
+    top_claims: models.QuerySet, assurance_case_id: int | None
+) -> None:
+    subtree_claims: models.QuerySet = PropertyClaim.objects.filter(
+        ancestor_links__ancestor__in=top_claims
+    )
+    subtree_claims.update(assurance_case_id=assurance_case_id)
+    Evidence.objects.filter(property_claim__in=subtree_claims).update(
+        assurance_case_id=assurance_case_id
+    )
+
 
 class AssuranceCaseImage(models.Model):
     assurance_case = models.ForeignKey(
@@ -298,3 +631,57 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+
+
+class CaseJob(models.Model):
+    """Import, export or renumbering of a case, run in the background by a worker.
+
+    Jobs are queued in this table and picked up by the run_case_jobs command. Their
+    files are kept on the local disk of the server, under MEDIA_ROOT.
+    """
+
+    class Kind(models.TextChoices):
+        IMPORT = "import"
+        EXPORT = "export"
+        UPDATE_IDENTIFIERS = "update_identifiers"
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    owner = models.ForeignKey(
+        EAPUser, related_name="case_jobs", on_delete=models.CASCADE
+    )
+    assurance_case = models.ForeignKey(
+        AssuranceCase,
+        related_name="jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    input_file = models.FileField(
+        upload_to="jobs/input/", storage=FileSystemStorage(), blank=True
+    )
+    result_file = models.FileField(
+        upload_to="jobs/result/", storage=FileSystemStorage(), blank=True
+    )
+    result = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=200, blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    started_date = models.DateTimeField(null=True, blank=True)
+    # Last sign of life from the worker of a running job, see jobs.JobHeartbeat.
+    heartbeat_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_date"])]
+
+    def __str__(self):
+        return f"{self.kind} job {self.pk} ({self.status})"
@@ -0,0 +1,44 @@
+from django.http import HttpRequest
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptInPaginationMixin:
+    """Lists are only paginated on request, so existing clients get a full array."""
+
+    # Parameters that ask for a page, the first as named by PageNumberPagination.
+    page_query_param: str = "page"
+    page_size_query_param: str = "page_size"
+
+    @classmethod
+    def is_requested(cls, request: HttpRequest) -> bool:
+        return any(
+            parameter in request.GET
+            for parameter in (cls.page_query_param, cls.page_size_query_param)
+        )
+
+
+class CaseItemCursorPagination(OptInPaginationMixin, CursorPagination):
+    """Keyset pagination for the case item list endpoints.
+
+    Items are ordered by id, so pages stay stable while items are being added, and
+    the cursor in the next and previous links is opaque to clients.
+    """
+
+    ordering = "id"
+    page_size = 100
+    max_page_size = 1000
+    page_query_param = CursorPagination.cursor_query_param
+
+
+class CaseListPagination(OptInPaginationMixin, PageNumberPagination):
+    """Numbered pages for the case list, which clients can sort by several fields."""
+
+    page_size = 20
+    max_page_size = 100
+
+
+class GroupListPagination(OptInPaginationMixin, PageNumberPagination):
+    """Numbered pages for the owned and member group lists, paged side by side."""
+
+    page_size = 20
+    max_page_size = 100
@@ -1,17 +1,19 @@
 import warnings
 from typing import Any, Optional, cast
 
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from rest_framework import serializers
 from rest_framework.serializers import ReturnDict
 
 from . import models
 from .github import Github, register_social_user
-from .model_utils import get_property_claims_by_case_id
+from .model_utils import allocate_item_number, get_property_claim_path
 from .models import (
     AssuranceCase,
     AssuranceCaseImage,
     CaseItem,
+    CaseJob,
     Comment,
     Context,
     EAPGroup,
@@ -141,6 +143,23 @@ class CommentSerializer(serializers.ModelSerializer):
         )
 
 
+class CaseJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CaseJob
+        fields = (
+            "id",
+            "kind",
+            "status",
+            "assurance_case",
+            "progress",
+            "result",
+            "created_date",
+            "started_date",
+            "finished_date",
+        )
+        read_only_fields = fields
+
+
 class AssuranceCaseSerializer(serializers.ModelSerializer):
     goals = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
@@ -165,6 +184,26 @@ class AssuranceCaseSerializer(serializers.ModelSerializer):
         )
 
 
+class AssuranceCaseSummarySerializer(serializers.ModelSerializer):
+    """Short description of a case for the case list, with the user's permissions.
+
+    Cases need the permission annotations of ShareAssuranceCaseUtils.get_user_cases.
+    """
+
+    permissions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AssuranceCase
+        fields = ("id", "name", "description", "created_date", "permissions")
+
+    def get_permissions(self, assurance_case: AssuranceCase) -> list[str]:
+        return [
+            permission
+            for permission in self.context["permission_list"]
+            if getattr(assurance_case, f"has_{permission}_permission")
+        ]
+
+
 class SandboxSerializer(serializers.ModelSerializer):
 
     contexts = serializers.SerializerMethodField()
@@ -229,9 +268,11 @@ class TopLevelNormativeGoalSerializer(serializers.ModelSerializer):
 
         assurance_case_id: int = validated_data["assurance_case"].pk
 
-        validated_data["name"] = _get_unique_name(
-            TopLevelNormativeGoal.objects.filter(assurance_case_id=assurance_case_id),
+        validated_data["name"] = _allocate_name(
+            assurance_case_id,
             "G",
+            0,
+            TopLevelNormativeGoal.objects.filter(assurance_case_id=assurance_case_id),
         )
 
         return super().create(validated_data)
@@ -259,8 +300,12 @@ class ContextSerializer(serializers.ModelSerializer):
         extra_kwargs = {"name": {"allow_null": True, "required": False}}
 
     def create(self, validated_data: dict):
-        validated_data["name"] = _get_unique_name(
-            Context.objects.filter(goal_id=validated_data["goal"].pk), "C"
+        goal: TopLevelNormativeGoal = validated_data["goal"]
+        validated_data["name"] = _allocate_name(
+            goal.assurance_case_id,
+            "C",
+            goal.pk,
+            Context.objects.filter(goal_id=goal.pk),
         )
 
         return super().create(validated_data)
@@ -319,28 +364,31 @@ class PropertyClaimSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data: dict[str, Any]) -> PropertyClaim:
 
-        if (
-            validated_data.get("strategy") is not None
-            or validated_data.get("goal") is not None
-        ):
-            top_level_claim_ids, _ = get_property_claims_by_case_id(
-                get_case_id(PropertyClaim(**validated_data))
-            )
-            validated_data["name"] = _get_unique_name(
-                PropertyClaim.objects.filter(pk__in=top_level_claim_ids),
-                name_prefix="P",
+        parent_item: Optional[CaseItem] = validated_data.get(
+            "strategy"
+        ) or validated_data.get("goal")
+        if parent_item is not None:
+            assurance_case_id: Optional[int] = parent_item.assurance_case_id
+            validated_data["name"] = _allocate_name(
+                assurance_case_id,
+                "P",
+                0,
+                PropertyClaim.objects.filter(
+                    Q(goal__assurance_case_id=assurance_case_id)
+                    | Q(strategy__goal__assurance_case_id=assurance_case_id)
+                ),
             )
         elif validated_data.get("property_claim") is not None:
-            parent_property_claim: PropertyClaim | None = validated_data.get(
-                "property_claim"
+            parent_property_claim: PropertyClaim = validated_data["property_claim"]
+            validated_data["name"] = _allocate_name(
+                parent_property_claim.assurance_case_id,
+                "P",
+                parent_property_claim.pk,
+                PropertyClaim.objects.filter(
+                    property_claim_id=parent_property_claim.pk
+                ),
+                name_prefix=f"{parent_property_claim.name}.",
             )
-            if parent_property_claim is not None:
-                validated_data["name"] = _get_unique_name(
-                    PropertyClaim.objects.filter(
-                        property_claim_id=parent_property_claim.pk
-                    ),
-                    name_prefix=f"{parent_property_claim.name}.",
-                )
 
         return super().create(validated_data)
 
@@ -350,6 +398,7 @@ class EvidenceSerializer(serializers.ModelSerializer):
         source="property_claim",
         queryset=PropertyClaim.objects.all(),
         many=True,
+        allow_empty=False,
     )
     type = serializers.CharField(default="Evidence", read_only=True)
 
@@ -370,18 +419,14 @@ class EvidenceSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data: dict) -> Evidence:
 
-        (
-            top_level_claim_ids,
-            child_claim_ids,
-        ) = get_property_claims_by_case_id(
-            case_id=get_case_id(validated_data["property_claim"][0])
-        )
-
-        validated_data["name"] = _get_unique_name(
-            Evidence.objects.filter(
-                property_claim__id__in=top_level_claim_ids + child_claim_ids
-            ),
+        assurance_case_id: Optional[int] = validated_data["property_claim"][
+            0
+        ].assurance_case_id
+        validated_data["name"] = _allocate_name(
+            assurance_case_id,
             "E",
+            0,
+            Evidence.objects.filter(assurance_case_id=assurance_case_id),
         )
 
         return super().create(validated_data)
@@ -432,19 +477,29 @@ class StrategySerializer(serializers.ModelSerializer):
 
     def create(self, validated_data: dict) -> Strategy:
 
-        validated_data["name"] = _get_unique_name(
-            Strategy.objects.filter(goal_id=validated_data["goal"].pk), "S"
+        goal: TopLevelNormativeGoal = validated_data["goal"]
+        validated_data["name"] = _allocate_name(
+            goal.assurance_case_id,
+            "S",
+            goal.pk,
+            Strategy.objects.filter(goal_id=goal.pk),
         )
         return super().create(validated_data)
 
 
-def _get_unique_name(base_query_set: QuerySet, name_prefix: str) -> str:
-
-    candidate_index: int = base_query_set.count() + 1
-    while base_query_set.filter(name=f"{name_prefix}{candidate_index}").count() != 0:
-        candidate_index += 1
+def _allocate_name(
+    assurance_case_id: Optional[int],
+    prefix: str,
+    parent_id: int,
+    existing_items: QuerySet,
+    name_prefix: Optional[str] = None,
+) -> str:
+    """Names a new item after the next number of its group, see allocate_item_number."""
+    number: int = allocate_item_number(
+        assurance_case_id, prefix, parent_id, existing_items.count
+    )
 
-    return f"{name_prefix}{candidate_index}"
+    return f"{prefix if name_prefix is None else name_prefix}{number}"
 
 
 def get_type_dictionary() -> dict[str, Any]:
@@ -521,6 +576,18 @@ TYPE_DICT = get_type_dictionary()
 
 def get_case_id(item: AssuranceCase | CaseItem) -> Optional[int]:
     """Return the id of the case in which this item is. Works for all item types."""
+    case_id: Optional[int] = find_case_id(item)
+    if case_id is None:
+        # TODO This should probably be an error raise rather than a warning, but
+        # currently there are dead items in the database without parents which hit
+        # this branch.
+        msg = f"Can't figure out the case ID of {item}."
+        warnings.warn(msg)
+    return case_id
+
+
+def find_case_id(item: AssuranceCase | CaseItem) -> Optional[int]:
+    """Like get_case_id, but silently returns None for items without a case."""
     # In some cases, when there's a ManyToManyField, instead of the parent item, we get
     # an iterable that can potentially list all the parents. In that case, just pick the
     # first.
@@ -529,14 +596,61 @@ def get_case_id(item: AssuranceCase | CaseItem) -> Optional[int]:
 
     if isinstance(item, models.AssuranceCase):
         return item.id
+
+    # Saved items always have their case in a column, see CaseItem.save.
+    case_id: Optional[int] = getattr(item, "assurance_case_id", None)
+    if case_id is not None:
+        return case_id
+
+    if isinstance(item, PropertyClaim) and item.property_claim_id is not None:
+        # Jump straight to the top-level claim instead of walking up one parent at a time.
+        top_level_claim: Optional[PropertyClaim] = get_property_claim_path(
+            item.property_claim_id
+        ).first()
+        if top_level_claim is not None:
+            item = top_level_claim
     for _k, v in TYPE_DICT.items():
         if isinstance(item, v["model"]):
             for parent_type, _ in v["parent_types"]:
                 parent = getattr(item, parent_type)
                 if parent is not None:
-                    return get_case_id(parent)
-    # TODO This should probably be an error raise rather than a warning, but currently
-    # there are dead items in the database without parents which hit this branch.
-    msg = f"Can't figure out the case ID of {item}."
-    warnings.warn(msg)
+                    return find_case_id(parent)
     return None
+
+
+COMMENT_TARGETS: tuple[str, ...] = (
+    "goal",
+    "strategy",
+    "property_claim",
+    "evidence",
+    "context",
+)
+
+
+def get_item_case_id(
+    item: AssuranceCase | CaseItem | models.Comment,
+) -> Optional[int]:
+    """Returns the case of an item or comment, including items in the sandbox."""
+    if isinstance(item, models.Comment):
+        if item.assurance_case_id is not None:
+            return item.assurance_case_id
+
+        for target in COMMENT_TARGETS:
+            target_item: Optional[CaseItem] = getattr(item, target)
+            if target_item is not None:
+                return get_item_case_id(target_item)
+        return None
+
+    return find_case_id(item)
+
+
+def get_item_type(item: AssuranceCase | CaseItem | models.Comment) -> str:
+    """Returns the TYPE_DICT key of a case, item or comment, as in "property_claim"."""
+    if isinstance(item, models.Comment):
+        return "comment"
+
+    return next(
+        item_type
+        for item_type, type_info in TYPE_DICT.items()
+        if isinstance(item, type_info["model"])
+    )
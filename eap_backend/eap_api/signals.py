@@ -0,0 +1,285 @@
+"""Signal receivers that keep data derived from assurance cases up to date.
+
+Every change to a case, to one of its items, or to their comments increases the
+revision of the case, which in turn invalidates any cached serialization of it, and is
+recorded in the change journal of the case. Links between evidence and property claims
+also set the case of the evidence here, since they are made after the evidence is
+saved. Once committed, the changes of each revision are sent to the editors connected
+to the case.
+
+Changes to case owners, case groups and group members refresh the permission index
+of the cases involved.
+"""
+
+from typing import Any, Optional
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from .case_changes import CaseChangeFeed
+from .model_utils import (
+    CaseChangeEntry,
+    bump_case_revision,
+    case_revised,
+    refresh_case_permissions,
+)
+from .models import (
+    AssuranceCase,
+    AssuranceCaseRevision,
+    CaseChange,
+    CaseItem,
+    Comment,
+    Context,
+    EAPGroup,
+    EAPUser,
+    Evidence,
+    PropertyClaim,
+    Strategy,
+    TopLevelNormativeGoal,
+)
+from .serializers import get_item_case_id, get_item_type
+
+CASE_CONTENT_MODELS: tuple = (
+    TopLevelNormativeGoal,
+    Context,
+    Strategy,
+    PropertyClaim,
+    Evidence,
+    Comment,
+)
+
+
+def _bump_revisions(case_ids: Any, changes: Any = ()) -> None:
+    changes = list(changes)
+    for case_id in {case_id for case_id in case_ids if case_id is not None}:
+        bump_case_revision(case_id, changes)
+
+
+CASE_GROUP_RELATIONS: tuple = (
+    AssuranceCase.edit_groups,
+    AssuranceCase.view_groups,
+    AssuranceCase.review_groups,
+)
+
+
+def _get_group_case_ids(group_ids: Any) -> set[int]:
+    case_ids: set[int] = set()
+    for group_relation in CASE_GROUP_RELATIONS:
+        case_ids.update(
+            group_relation.through.objects.filter(
+                eapgroup_id__in=group_ids
+            ).values_list("assurancecase_id", flat=True)
+        )
+    return case_ids
+
+
+def on_case_saved(instance: AssuranceCase, created: bool, **_) -> None:
+    if created:
+        AssuranceCaseRevision.objects.create(assurance_case=instance, number=1)
+    else:
+        bump_case_revision(instance.pk)
+
+    if created or getattr(instance, "_saved_owner_id", None) != instance.owner_id:
+        refresh_case_permissions([instance.pk])
+        instance._saved_owner_id = instance.owner_id  # type: ignore[attr-defined]
+
+
+def on_case_deleting(instance: AssuranceCase, **_) -> None:
+    # Items deleted along with the case are not journaled, as their case has no
+    # revision left to bump.
+    AssuranceCaseRevision.objects.filter(assurance_case_id=instance.pk).delete()
+
+
+def on_case_content_saved(instance: CaseItem | Comment, created: bool, **_) -> None:
+    action: str = CaseChange.Action.CREATE if created else CaseChange.Action.UPDATE
+    saved_in_sandbox: Optional[bool] = getattr(instance, "_saved_in_sandbox", None)
+    if not created and saved_in_sandbox is not None:
+        if instance.in_sandbox and not saved_in_sandbox:  # type: ignore[union-attr]
+            action = CaseChange.Action.DETACH
+        elif saved_in_sandbox and not instance.in_sandbox:  # type: ignore[union-attr]
+            action = CaseChange.Action.ATTACH
+
+    _bump_revisions(
+        [get_item_case_id(instance)], [(action, get_item_type(instance), instance.pk)]
+    )
+
+
+def on_case_content_deleting(instance: CaseItem | Comment, **_) -> None:
+    # Parents may be gone by the time post_delete is sent, so we locate the case now.
+    instance._deleted_from_case_id = get_item_case_id(instance)  # type: ignore[union-attr]
+
+
+def on_case_content_deleted(instance: CaseItem | Comment, **_) -> None:
+    _bump_revisions(
+        [getattr(instance, "_deleted_from_case_id", None)],
+        [(CaseChange.Action.DELETE, get_item_type(instance), instance.pk)],
+    )
+
+
+def on_evidence_links_changed(
+    instance: Evidence | PropertyClaim,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[set],
+    **_,
+) -> None:
+    if action == "pre_clear":
+        instance._cleared_from_case_id = get_item_case_id(instance)  # type: ignore[union-attr]
+        instance._cleared_evidence_ids = (  # type: ignore[union-attr]
+            list(instance.evidence.values_list("pk", flat=True))  # type: ignore[union-attr]
+            if reverse
+            else [instance.pk]
+        )
+    elif action == "post_clear":
+        _bump_revisions(
+            [getattr(instance, "_cleared_from_case_id", None)],
+            _get_evidence_changes(
+                CaseChange.Action.DETACH,
+                getattr(instance, "_cleared_evidence_ids", []),
+            ),
+        )
+    elif action == "post_add":
+        _set_linked_evidence_case_ids(instance, reverse, pk_set)
+
+    if action in ("post_add", "post_remove"):
+        changes: list = _get_evidence_changes(
+            (
+                CaseChange.Action.ATTACH
+                if action == "post_add"
+                else CaseChange.Action.DETACH
+            ),
+            (pk_set or []) if reverse else [instance.pk],
+        )
+        if reverse:
+            _bump_revisions([get_item_case_id(instance)], changes)
+        elif pk_set:
+            _bump_revisions(
+                [
+                    get_item_case_id(property_claim)
+                    for property_claim in PropertyClaim.objects.filter(pk__in=pk_set)
+                ],
+                changes,
+            )
+
+
+def _get_evidence_changes(action: str, evidence_ids: Any) -> list:
+    return [(action, "evidence", evidence_id) for evidence_id in sorted(evidence_ids)]
+
+
+def _set_linked_evidence_case_ids(
+    instance: Evidence | PropertyClaim, reverse: bool, pk_set: Optional[set]
+) -> None:
+    # Evidence belongs to the case of the property claims it supports, see CaseItem.save.
+    if not pk_set:
+        return
+
+    if reverse:
+        Evidence.objects.filter(pk__in=pk_set).update(
+            assurance_case_id=instance.assurance_case_id
+        )
+        return
+
+    assurance_case_id: Optional[int] = (
+        PropertyClaim.objects.filter(pk__in=pk_set)
+        .values_list("assurance_case_id", flat=True)
+        .first()
+    )
+    if (
+        assurance_case_id is not None
+        and assurance_case_id != instance.assurance_case_id
+    ):
+        Evidence.objects.filter(pk=instance.pk).update(
+            assurance_case_id=assurance_case_id
+        )
+        instance.assurance_case_id = assurance_case_id
+        instance._saved_case_id = assurance_case_id  # type: ignore[union-attr]
+
+
+def on_case_groups_changed(
+    sender: Any,
+    instance: AssuranceCase | Any,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[set],
+    **_,
+) -> None:
+    if action == "pre_clear" and reverse:
+        instance._cleared_from_case_ids = list(
+            sender.objects.filter(eapgroup_id=instance.pk).values_list(
+                "assurancecase_id", flat=True
+            )
+        )
+        return
+
+    case_ids: list[int] = []
+    if action == "post_clear":
+        case_ids = (
+            [instance.pk]
+            if not reverse
+            else getattr(instance, "_cleared_from_case_ids", [])
+        )
+    elif action in ("post_add", "post_remove"):
+        case_ids = [instance.pk] if not reverse else list(pk_set or [])
+
+    _bump_revisions(case_ids)
+    refresh_case_permissions(case_ids)
+
+
+def on_group_members_changed(
+    instance: EAPGroup | EAPUser,
+    action: str,
+    reverse: bool,
+    pk_set: Optional[set],
+    **_,
+) -> None:
+    if action == "pre_clear" and reverse:
+        instance._cleared_from_group_ids = list(  # type: ignore[union-attr]
+            instance.all_groups.values_list("pk", flat=True)  # type: ignore[union-attr]
+        )
+    elif action == "post_clear":
+        refresh_case_permissions(
+            _get_group_case_ids(
+                [instance.pk]
+                if not reverse
+                else getattr(instance, "_cleared_from_group_ids", [])
+            )
+        )
+    elif action in ("post_add", "post_remove"):
+        refresh_case_permissions(
+            _get_group_case_ids([instance.pk] if not reverse else (pk_set or []))
+        )
+
+
+def on_group_deleting(instance: EAPGroup, **_) -> None:
+    # Deleting a group removes its case links without sending m2m_changed.
+    instance._deleted_from_case_ids = _get_group_case_ids([instance.pk])  # type: ignore[attr-defined]
+
+
+def on_group_deleted(instance: EAPGroup, **_) -> None:
+    refresh_case_permissions(getattr(instance, "_deleted_from_case_ids", []))
+
+
+def on_case_revised(
+    case_id: int, sequence: int, changes: list[CaseChangeEntry], **_
+) -> None:
+    transaction.on_commit(lambda: CaseChangeFeed.send_patch(case_id, sequence, changes))
+
+
+post_save.connect(on_case_saved, sender=AssuranceCase)
+pre_delete.connect(on_case_deleting, sender=AssuranceCase)
+
+for content_model in CASE_CONTENT_MODELS:
+    post_save.connect(on_case_content_saved, sender=content_model)
+    pre_delete.connect(on_case_content_deleting, sender=content_model)
+    post_delete.connect(on_case_content_deleted, sender=content_model)
+
+m2m_changed.connect(on_evidence_links_changed, sender=Evidence.property_claim.through)
+
+for group_relation in CASE_GROUP_RELATIONS:
+    m2m_changed.connect(on_case_groups_changed, sender=group_relation.through)
+
+m2m_changed.connect(on_group_members_changed, sender=EAPGroup.member.through)
+pre_delete.connect(on_group_deleting, sender=EAPGroup)
+post_delete.connect(on_group_deleted, sender=EAPGroup)
+
+case_revised.connect(on_case_revised)
@@ -16,15 +16,34 @@ urlpatterns = [
     path("groups/", views.group_list, name="group_list"),
     path("groups/<int:pk>/", views.group_detail, name="group_detail"),
     path("cases/", views.case_list, name="case_list"),
+    path("cases/export", views.case_bulk_export, name="case_bulk_export"),
     path("cases/<int:pk>/", views.case_detail, name="case_detail"),
+    path("cases/<int:pk>/batch", views.case_batch, name="case_batch"),
+    path("cases/<int:pk>/clone", views.case_clone, name="case_clone"),
+    path("cases/<int:pk>/export", views.case_export, name="case_export"),
     path("cases/<int:pk>/image", views.case_image, name="case_image"),
+    path("cases/<int:pk>/changes", views.case_changes, name="case_changes"),
     path("cases/<int:pk>/sandbox", views.case_sandbox, name="case_sandbox"),
+    path(
+        "cases/<int:pk>/sandbox/detach",
+        views.detach_sandbox_items,
+        name="detach_sandbox_items",
+    ),
+    path(
+        "cases/<int:pk>/sandbox/attach",
+        views.attach_sandbox_items,
+        name="attach_sandbox_items",
+    ),
     path("cases/<int:pk>/sharedwith", views.share_case_with, name="share_case_with"),
     path(
         "cases/<int:pk>/update-ids",
         views.case_update_identifiers,
         name="update_identifiers",
     ),
+    path("jobs/", views.job_list, name="job_list"),
+    path("jobs/import", views.job_import, name="job_import"),
+    path("jobs/<int:pk>/", views.job_detail, name="job_detail"),
+    path("jobs/<int:pk>/result", views.job_result, name="job_result"),
     path("goals/", views.goal_list, name="goal_list"),
     path("goals/<int:pk>/", views.goal_detail, name="goal_detail"),
     path("contexts/", views.context_list, name="context_list"),
@@ -1,20 +1,33 @@
-import functools
+from collections import defaultdict
 from typing import Any, Callable, Literal, Optional, Type, Union, cast
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+)
+from django.db.models.functions import Lower
 from django.db.models.query import QuerySet
 from django.forms.models import model_to_dict
 from django.http import JsonResponse
 from django.utils.crypto import get_random_string
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
 from rest_framework.serializers import ReturnDict
 
-from .model_utils import (
-    get_case_property_claims,
-    traverse_child_property_claims,
-)
+from .case_export import CaseTreeLoader
+from .identifiers import IdentifierGroup, SiblingIdentifierUpdate, UpdateIdentifierUtils
+from .model_utils import bump_case_revision, deferring_revision_bumps
 from .models import (
     AssuranceCase,
+    CaseChange,
     CaseItem,
+    CasePermission,
     Context,
     EAPGroup,
     EAPUser,
@@ -23,30 +36,49 @@ from .models import (
     Strategy,
     TopLevelNormativeGoal,
 )
-from .serializers import (
-    TYPE_DICT,
-    AssuranceCaseSerializer,
-    SandboxSerializer,
-    get_case_id,
-)
+from .pagination import CaseItemCursorPagination
+from .serializers import TYPE_DICT, SandboxSerializer, get_case_id, get_item_type
 
 
 class SandboxUtils:
+    # The kinds of items moved in and out of the sandbox by selection, with the fields
+    # that name their parent.
+    SELECTION_MODELS: dict[str, Type[CaseItem]] = {
+        "contexts": Context,
+        "strategies": Strategy,
+        "property_claims": PropertyClaim,
+        "evidence": Evidence,
+    }
+    SELECTION_PARENT_FIELDS: dict[str, tuple[str, ...]] = {
+        "contexts": ("goal_id",),
+        "strategies": ("goal_id",),
+        "property_claims": ("goal_id", "strategy_id", "property_claim_id"),
+        "evidence": ("property_claim_id",),
+    }
+    PARENT_MODELS: dict[str, Type[CaseItem]] = {
+        "goal_id": TopLevelNormativeGoal,
+        "strategy_id": Strategy,
+        "property_claim_id": PropertyClaim,
+    }
+    MAX_SELECTION_SIZE: int = 1000
+
     @staticmethod
     def detach_context(context_id: int) -> None:
         context: Context = Context.objects.get(pk=context_id)
         assurance_case_id: Optional[int] = get_case_id(context)
 
-        context.goal = None
-        SandboxUtils._move_to_sandbox(context, assurance_case_id)
+        with SiblingIdentifierUpdate(context):
+            context.goal = None
+            SandboxUtils._move_to_sandbox(context, assurance_case_id)
 
     @staticmethod
     def attach_context(context_id: int, goal_id: int) -> None:
         context: Context = Context.objects.get(pk=context_id)
         new_goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(pk=goal_id)
 
-        context.goal = new_goal
-        SandboxUtils._remove_from_sandbox(context)
+        with SiblingIdentifierUpdate(context):
+            context.goal = new_goal
+            SandboxUtils._remove_from_sandbox(context)
 
     @staticmethod
     def detach_evidence(evidence_id: int, property_claim_id: int) -> None:
@@ -59,16 +91,15 @@ class SandboxUtils:
             )
             raise ValueError(error_message)
 
-        evidence.property_claim.set(
-            evidence.property_claim.exclude(pk=property_claim_id)
-        )
+        with SiblingIdentifierUpdate(evidence):
+            evidence.property_claim.remove(property_claim_id)
 
-        SandboxUtils._move_to_sandbox(
-            evidence,
-            assurance_case_id,
-            lambda evidence: evidence.property_claim.count()  # type:ignore[attr-defined]
-            == 0,
-        )
+            SandboxUtils._move_to_sandbox(
+                evidence,
+                assurance_case_id,
+                lambda evidence: evidence.property_claim.count()  # type:ignore[attr-defined]
+                == 0,
+            )
 
     @staticmethod
     def attach_evidence(evidence_id: int, property_claim_id: int) -> None:
@@ -77,8 +108,9 @@ class SandboxUtils:
             pk=property_claim_id
         )
 
-        evidence.property_claim.add(new_property_claim)
-        SandboxUtils._remove_from_sandbox(evidence)
+        with SiblingIdentifierUpdate(evidence):
+            evidence.property_claim.add(new_property_claim)
+            SandboxUtils._remove_from_sandbox(evidence)
 
     @staticmethod
     def _can_detach_property_claim(case_item: CaseItem) -> bool:
@@ -101,51 +133,54 @@ class SandboxUtils:
         strategy_id: Optional[int] = parent_info.get("strategy_id")
 
         error_message: str = ""
-        if goal_id is not None:
-            goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(pk=goal_id)
+        with SiblingIdentifierUpdate(property_claim):
+            if goal_id is not None:
+                goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(
+                    pk=goal_id
+                )
 
-            if goal.property_claims.filter(pk=property_claim_id).count() == 0:  # type: ignore[attr-defined]
-                error_message = f"Property claim {property_claim_id} is not attached to Goal {goal_id}"
-                raise ValueError(error_message)
+                if goal.property_claims.filter(pk=property_claim_id).count() == 0:  # type: ignore[attr-defined]
+                    error_message = f"Property claim {property_claim_id} is not attached to Goal {goal_id}"
+                    raise ValueError(error_message)
 
-            property_claim.goal = None
-            SandboxUtils._move_to_sandbox(
-                property_claim,
-                assurance_case_id,
-                SandboxUtils._can_detach_property_claim,
-            )
-        elif parent_property_claim_id is not None:
-            parent_property_claim: PropertyClaim = PropertyClaim.objects.get(
-                pk=parent_property_claim_id
-            )
+                property_claim.goal = None
+                SandboxUtils._move_to_sandbox(
+                    property_claim,
+                    assurance_case_id,
+                    SandboxUtils._can_detach_property_claim,
+                )
+            elif parent_property_claim_id is not None:
+                parent_property_claim: PropertyClaim = PropertyClaim.objects.get(
+                    pk=parent_property_claim_id
+                )
 
-            if property_claim.property_claim != parent_property_claim:
-                error_message = f"Property claim {parent_property_claim.pk} is not the parent of Property Claim {property_claim.pk}"
-                raise ValueError(error_message)
+                if property_claim.property_claim != parent_property_claim:
+                    error_message = f"Property claim {parent_property_claim.pk} is not the parent of Property Claim {property_claim.pk}"
+                    raise ValueError(error_message)
 
-            property_claim.property_claim = None
-            SandboxUtils._move_to_sandbox(
-                property_claim,
-                assurance_case_id,
-                SandboxUtils._can_detach_property_claim,
-            )
-        elif strategy_id is not None:
-            strategy: Strategy = Strategy.objects.get(pk=strategy_id)
-
-            if property_claim.strategy != strategy:
-                error_message = f"Strategy {strategy.pk} is not the parent of Property Claim {property_claim.pk}"
+                property_claim.property_claim = None
+                SandboxUtils._move_to_sandbox(
+                    property_claim,
+                    assurance_case_id,
+                    SandboxUtils._can_detach_property_claim,
+                )
+            elif strategy_id is not None:
+                strategy: Strategy = Strategy.objects.get(pk=strategy_id)
+
+                if property_claim.strategy != strategy:
+                    error_message = f"Strategy {strategy.pk} is not the parent of Property Claim {property_claim.pk}"
+                    raise ValueError(error_message)
+
+                property_claim.strategy = None
+                SandboxUtils._move_to_sandbox(
+                    property_claim,
+                    assurance_case_id,
+                    SandboxUtils._can_detach_property_claim,
+                )
+            else:
+                error_message = f"Cannot detach property claim {property_claim_id} to parent {parent_info}"
                 raise ValueError(error_message)
 
-            property_claim.strategy = None
-            SandboxUtils._move_to_sandbox(
-                property_claim,
-                assurance_case_id,
-                SandboxUtils._can_detach_property_claim,
-            )
-        else:
-            error_message = f"Cannot detach property claim {property_claim_id} to parent {parent_info}"
-            raise ValueError(error_message)
-
     @staticmethod
     def attach_property_claim(
         property_claim_id: int, parent_info: dict[str, Any]
@@ -156,34 +191,38 @@ class SandboxUtils:
         parent_property_claim_id: Optional[int] = parent_info.get("property_claim_id")
         strategy_id: Optional[int] = parent_info.get("strategy_id")
 
-        if goal_id is not None:
-            goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(pk=goal_id)
-            property_claim.goal = goal
-            SandboxUtils._remove_from_sandbox(property_claim)
-        elif parent_property_claim_id is not None:
-            parent_property_claim: PropertyClaim = PropertyClaim.objects.get(
-                pk=parent_property_claim_id
-            )
-            property_claim.property_claim = parent_property_claim  # type: ignore[attr-defined]
-            SandboxUtils._remove_from_sandbox(property_claim)
-        elif strategy_id is not None:
-            strategy: Strategy = Strategy.objects.get(pk=strategy_id)
-            property_claim.strategy = strategy
-            SandboxUtils._remove_from_sandbox(property_claim)
-        else:
-            error_message = f"Cannot attach property claim {property_claim_id} to parent {parent_info}"
-            raise ValueError(error_message)
+        with SiblingIdentifierUpdate(property_claim):
+            if goal_id is not None:
+                goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(
+                    pk=goal_id
+                )
+                property_claim.goal = goal
+                SandboxUtils._remove_from_sandbox(property_claim)
+            elif parent_property_claim_id is not None:
+                parent_property_claim: PropertyClaim = PropertyClaim.objects.get(
+                    pk=parent_property_claim_id
+                )
+                property_claim.property_claim = parent_property_claim  # type: ignore[attr-defined]
+                SandboxUtils._remove_from_sandbox(property_claim)
+            elif strategy_id is not None:
+                strategy: Strategy = Strategy.objects.get(pk=strategy_id)
+                property_claim.strategy = strategy
+                SandboxUtils._remove_from_sandbox(property_claim)
+            else:
+                error_message = f"Cannot attach property claim {property_claim_id} to parent {parent_info}"
+                raise ValueError(error_message)
 
     @staticmethod
     def detach_strategy(strategy_id: int) -> None:
         strategy: Strategy = Strategy.objects.get(pk=strategy_id)
         assurance_case_id: Optional[int] = get_case_id(strategy)
 
-        strategy.goal = None
-        SandboxUtils._move_to_sandbox(
-            strategy,
-            assurance_case_id,
-        )
+        with SiblingIdentifierUpdate(strategy):
+            strategy.goal = None
+            SandboxUtils._move_to_sandbox(
+                strategy,
+                assurance_case_id,
+            )
 
     @staticmethod
     def attach_strategy(strategy_id: int, parent_info: dict[str, Any]) -> None:
@@ -193,28 +232,353 @@ class SandboxUtils:
 
         if goal_id is not None:
             goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.get(pk=goal_id)
-            strategy.goal = goal
-            SandboxUtils._remove_from_sandbox(strategy)
+            with SiblingIdentifierUpdate(strategy):
+                strategy.goal = goal
+                SandboxUtils._remove_from_sandbox(strategy)
         else:
             error_message = f"Cannot attach strategy {strategy} to parent {parent_info}"
             raise ValueError(error_message)
 
+    @staticmethod
+    def detach_items(assurance_case: AssuranceCase, selection: Any) -> None:
+        """Moves a selection of items of a case to its sandbox, all in one go.
+
+        The selection lists the items to detach by kind, with the parent they are
+        detached from, as in the payloads of the single-item endpoints:
+
+            {"contexts": [{"id": 1}], "evidence": [{"id": 2, "property_claim_id": 3}]}
+
+        The parent of a property claim is optional, and evidence without one is
+        detached from all its property claims. Parents and evidence links are changed
+        with a query per kind of item, and the case revision is bumped once.
+        """
+        entries: dict[str, list[dict[str, int]]] = SandboxUtils._read_selection(
+            selection
+        )
+
+        with transaction.atomic(), deferring_revision_bumps():
+            items: dict[str, dict[int, CaseItem]] = SandboxUtils._get_selected_items(
+                assurance_case, entries
+            )
+            item_ids: dict[str, set[int]] = {
+                kind: set(kind_items) for kind, kind_items in items.items()
+            }
+            groups: set[IdentifierGroup] = UpdateIdentifierUtils.get_selection_groups(
+                assurance_case.pk, item_ids
+            )
+
+            for kind in ("contexts", "strategies", "property_claims"):
+                for entry in entries.get(kind, []):
+                    SandboxUtils._check_detached_parent(items[kind][entry["id"]], entry)
+
+            Context.objects.filter(pk__in=item_ids.get("contexts", ())).update(
+                goal=None, in_sandbox=True
+            )
+            Strategy.objects.filter(pk__in=item_ids.get("strategies", ())).update(
+                goal=None, in_sandbox=True
+            )
+
+            top_level_claim_ids: list[int] = []
+            for property_claim in items.get("property_claims", {}).values():
+                if property_claim.property_claim_id is None:  # type: ignore[attr-defined]
+                    top_level_claim_ids.append(property_claim.pk)
+                    continue
+                # Claims below others are moved with save(), which keeps the closure
+                # table and the levels of their descendants up to date.
+                property_claim.property_claim = None  # type: ignore[attr-defined]
+                property_claim.in_sandbox = True
+                property_claim.save()
+            PropertyClaim.objects.filter(pk__in=top_level_claim_ids).update(
+                goal=None, strategy=None, in_sandbox=True
+            )
+
+            evidence_entries: list[dict[str, int]] = entries.get("evidence", [])
+            if evidence_entries:
+                evidence_links: QuerySet = Evidence.property_claim.through.objects.all()
+                linked_pairs: set[tuple[int, int]] = set(
+                    evidence_links.filter(
+                        evidence_id__in=item_ids["evidence"]
+                    ).values_list("evidence_id", "propertyclaim_id")
+                )
+                link_filter = Q(pk__in=[])
+                for entry in evidence_entries:
+                    if "property_claim_id" not in entry:
+                        link_filter |= Q(evidence_id=entry["id"])
+                        continue
+                    if (entry["id"], entry["property_claim_id"]) not in linked_pairs:
+                        error_message = f"Property claim with id {entry['property_claim_id']} is not the parent of Evidence with id {entry['id']}"
+                        raise ValueError(error_message)
+                    link_filter |= Q(
+                        evidence_id=entry["id"],
+                        propertyclaim_id=entry["property_claim_id"],
+                    )
+                evidence_links.filter(link_filter).delete()
+
+                Evidence.objects.filter(
+                    pk__in=item_ids["evidence"], property_claim__isnull=True
+                ).update(in_sandbox=True)
+
+            SandboxUtils._finish_move(
+                assurance_case, groups, items, CaseChange.Action.DETACH
+            )
+
+    @staticmethod
+    def attach_items(assurance_case: AssuranceCase, selection: Any) -> None:
+        """Moves a selection of items of a case out of its sandbox, all in one go.
+
+        The selection lists the items to attach by kind, each with its new parent, as
+        in the payloads of the single-item endpoints:
+
+            {"contexts": [{"id": 1, "goal_id": 2}], "property_claims": [{"id": 3, "strategy_id": 4}]}
+
+        Parents must belong to the case. Parents and evidence links are changed with a
+        query per kind of item and parent, and the case revision is bumped once.
+        """
+        entries: dict[str, list[dict[str, int]]] = SandboxUtils._read_selection(
+            selection, with_parents=True
+        )
+
+        with transaction.atomic(), deferring_revision_bumps():
+            items: dict[str, dict[int, CaseItem]] = SandboxUtils._get_selected_items(
+                assurance_case, entries
+            )
+            SandboxUtils._check_selected_parents(assurance_case, entries)
+            item_ids: dict[str, set[int]] = {
+                kind: set(kind_items) for kind, kind_items in items.items()
+            }
+            groups: set[IdentifierGroup] = UpdateIdentifierUtils.get_selection_groups(
+                assurance_case.pk, item_ids
+            )
+
+            # Items are attached with an update per parent, except for claims moved in
+            # or out of another claim, which go through save() as in detach_items.
+            ids_by_parent: dict[tuple[str, str, int], list[int]] = defaultdict(list)
+            for kind, kind_entries in entries.items():
+                for entry in kind_entries:
+                    parent_field, parent_id = SandboxUtils._get_entry_parent(entry)
+                    case_item: CaseItem = items[kind][entry["id"]]
+                    if kind == "property_claims" and (
+                        parent_field == "property_claim_id"
+                        or case_item.property_claim_id is not None  # type: ignore[attr-defined]
+                    ):
+                        for claim_parent_field in SandboxUtils.SELECTION_PARENT_FIELDS[
+                            kind
+                        ]:
+                            setattr(
+                                case_item,
+                                claim_parent_field,
+                                (
+                                    parent_id
+                                    if claim_parent_field == parent_field
+                                    else None
+                                ),
+                            )
+                        case_item.in_sandbox = False
+                        case_item.save()
+                    else:
+                        ids_by_parent[kind, parent_field, parent_id].append(entry["id"])
+
+            evidence_link_model: Type[models.Model] = Evidence.property_claim.through
+            for (kind, parent_field, parent_id), ids in ids_by_parent.items():
+                if kind == "evidence":
+                    evidence_link_model.objects.bulk_create(
+                        [
+                            evidence_link_model(
+                                evidence_id=evidence_id, propertyclaim_id=parent_id
+                            )
+                            for evidence_id in ids
+                        ],
+                        ignore_conflicts=True,
+                    )
+                    continue
+
+                new_parents: dict[str, Optional[int]] = {
+                    field: parent_id if field == parent_field else None
+                    for field in SandboxUtils.SELECTION_PARENT_FIELDS[kind]
+                }
+                SandboxUtils.SELECTION_MODELS[kind].objects.filter(  # type: ignore[attr-defined]
+                    pk__in=ids
+                ).update(
+                    in_sandbox=False, **new_parents
+                )
+            Evidence.objects.filter(pk__in=item_ids.get("evidence", ())).update(
+                in_sandbox=False
+            )
+
+            SandboxUtils._finish_move(
+                assurance_case, groups, items, CaseChange.Action.ATTACH
+            )
+
+    @staticmethod
+    def _read_selection(
+        selection: Any, with_parents: bool = False
+    ) -> dict[str, list[dict[str, int]]]:
+        """Checks the shape of a selection of items, and returns its entries by kind."""
+        error_message: str = ""
+        if not isinstance(selection, dict) or not selection:
+            error_message = "The selection should list the items to move by kind."
+            raise ValueError(error_message)
+
+        entries: dict[str, list[dict[str, int]]] = {}
+        for kind, kind_entries in selection.items():
+            if kind not in SandboxUtils.SELECTION_MODELS:
+                error_message = f"Cannot move items of kind {kind}"
+                raise ValueError(error_message)
+            if not isinstance(kind_entries, list):
+                error_message = f"The {kind} to move should be a list"
+                raise ValueError(error_message)
+
+            parent_fields: tuple[str, ...] = SandboxUtils.SELECTION_PARENT_FIELDS[kind]
+            seen_entries: set[tuple] = set()
+            for entry in kind_entries:
+                if (
+                    not isinstance(entry, dict)
+                    or "id" not in entry
+                    or any(
+                        field != "id" and field not in parent_fields for field in entry
+                    )
+                    or any(type(value) is not int for value in entry.values())
+                    or len(entry) > 2  # noqa: PLR2004
+                    or (with_parents and len(entry) != 2)  # noqa: PLR2004
+                ):
+                    error_message = f"Invalid entry in {kind}: {entry}"
+                    raise ValueError(error_message)
+
+                # Evidence can be moved in or out of several claims at once.
+                entry_key: tuple = (
+                    tuple(sorted(entry.items())) if kind == "evidence" else entry["id"]
+                )
+                if entry_key in seen_entries:
+                    error_message = f"Duplicate entry in {kind}: {entry}"
+                    raise ValueError(error_message)
+                seen_entries.add(entry_key)
+            entries[kind] = kind_entries
+
+        if sum(len(kind_entries) for kind_entries in entries.values()) > (
+            SandboxUtils.MAX_SELECTION_SIZE
+        ):
+            error_message = (
+                f"Cannot move more than {SandboxUtils.MAX_SELECTION_SIZE} items at once"
+            )
+            raise ValueError(error_message)
+
+        return entries
+
+    @staticmethod
+    def _get_selected_items(
+        assurance_case: AssuranceCase, entries: dict[str, list[dict[str, int]]]
+    ) -> dict[str, dict[int, CaseItem]]:
+        """Loads the items of a selection, with a query per kind, by kind and id."""
+        items: dict[str, dict[int, CaseItem]] = {}
+        for kind, kind_entries in entries.items():
+            model: Type[CaseItem] = SandboxUtils.SELECTION_MODELS[kind]
+            item_ids: set[int] = {entry["id"] for entry in kind_entries}
+            items[kind] = model.objects.filter(  # type: ignore[attr-defined]
+                assurance_case_id=assurance_case.pk
+            ).in_bulk(item_ids)
+
+            missing_ids: set[int] = item_ids - set(items[kind])
+            if missing_ids:
+                error_message: str = (
+                    f"{model.__name__} with id {min(missing_ids)} is not part of case {assurance_case.pk}"
+                )
+                raise model.DoesNotExist(error_message)  # type: ignore[attr-defined]
+        return items
+
+    @staticmethod
+    def _check_selected_parents(
+        assurance_case: AssuranceCase, entries: dict[str, list[dict[str, int]]]
+    ) -> None:
+        """Checks that the new parents of a selection belong to its case."""
+        parent_ids: dict[str, set[int]] = defaultdict(set)
+        for kind_entries in entries.values():
+            for entry in kind_entries:
+                parent_field, parent_id = SandboxUtils._get_entry_parent(entry)
+                parent_ids[parent_field].add(parent_id)
+
+        for parent_field, ids in parent_ids.items():
+            model: Type[CaseItem] = SandboxUtils.PARENT_MODELS[parent_field]
+            missing_ids: set[int] = ids - set(
+                model.objects.filter(  # type: ignore[attr-defined]
+                    pk__in=ids, assurance_case_id=assurance_case.pk
+                ).values_list("pk", flat=True)
+            )
+            if missing_ids:
+                error_message: str = (
+                    f"{model.__name__} with id {min(missing_ids)} is not part of case {assurance_case.pk}"
+                )
+                raise model.DoesNotExist(error_message)  # type: ignore[attr-defined]
+
+    @staticmethod
+    def _get_entry_parent(entry: dict[str, int]) -> tuple[str, int]:
+        return next((field, value) for field, value in entry.items() if field != "id")
+
+    @staticmethod
+    def _check_detached_parent(case_item: CaseItem, entry: dict[str, int]) -> None:
+        for parent_field, parent_id in entry.items():
+            if parent_field != "id" and getattr(case_item, parent_field) != parent_id:
+                error_message: str = (
+                    f"{type(case_item).__name__} {case_item.pk} is not attached to {parent_field[:-3]} {parent_id}"
+                )
+                raise ValueError(error_message)
+
+    @staticmethod
+    def _finish_move(
+        assurance_case: AssuranceCase,
+        groups: set[IdentifierGroup],
+        items: dict[str, dict[int, CaseItem]],
+        action: str,
+    ) -> None:
+        """Renumbers the groups the moved items left or joined, and bumps the case."""
+        # Bulk updates and link changes send no signals.
+        bump_case_revision(
+            assurance_case.pk,
+            [
+                (action, get_item_type(case_item), case_item.pk)
+                for kind_items in items.values()
+                for case_item in kind_items.values()
+            ],
+        )
+        UpdateIdentifierUtils.number_groups(
+            groups
+            | UpdateIdentifierUtils.get_selection_groups(
+                assurance_case.pk,
+                {kind: set(kind_items) for kind, kind_items in items.items()},
+            )
+        )
+
     @staticmethod
     def serialise_sandbox(assurance_case: AssuranceCase) -> ReturnDict:
         serializer = SandboxSerializer(assurance_case)
         serialized_sandbox: ReturnDict = cast(ReturnDict, serializer.data)
 
+        tree_loader: CaseTreeLoader = CaseTreeLoader().load(
+            {
+                "property_claims": [
+                    child_id
+                    for parent in serialized_sandbox["property_claims"]
+                    + serialized_sandbox["strategies"]
+                    for child_id in parent["property_claims"]
+                ],
+                "evidence": [
+                    evidence_id
+                    for property_claim in serialized_sandbox["property_claims"]
+                    for evidence_id in property_claim["evidence"]
+                ],
+            }
+        )
+
         for property_claim in serialized_sandbox["property_claims"]:
-            property_claim["property_claims"] = get_json_tree(
+            property_claim["property_claims"] = tree_loader.get_json_tree(
                 property_claim["property_claims"], "property_claims"
             )
 
-            property_claim["evidence"] = get_json_tree(
+            property_claim["evidence"] = tree_loader.get_json_tree(
                 property_claim["evidence"], "evidence"
             )
 
         for strategy in serialized_sandbox["strategies"]:
-            strategy["property_claims"] = get_json_tree(
+            strategy["property_claims"] = tree_loader.get_json_tree(
                 strategy["property_claims"], "property_claims"
             )
 
@@ -222,7 +586,7 @@ class SandboxUtils:
 
     @staticmethod
     def _remove_from_sandbox(case_item: CaseItem) -> None:
-        case_item.assurance_case = None  # type: ignore[attr-defined]
+        # The item keeps its assurance case, which is then taken from its new parent.
         case_item.in_sandbox = False
         case_item.save()
 
@@ -274,117 +638,6 @@ class CommentUtils:
         return model_class.objects.get(pk=element_id)
 
 
-class UpdateIdentifierUtils:
-    @staticmethod
-    def update_identifiers(
-        case_id: Optional[int] = None, model_instance: Optional[CaseItem] = None
-    ):
-        """Traverses the case and ensures the identifiers follow a sequence
-
-        Args:
-            case_id: Identifier of the case where we perform the update.
-            model_instance: The case element that triggered this method.
-        """
-
-        error_message: str = "Assurance Case ID not provided."
-        if case_id is None and model_instance is not None:
-            case_id = get_case_id(model_instance)
-
-        if case_id is None:
-            raise ValueError(error_message)
-
-        if TopLevelNormativeGoal.objects.filter(assurance_case_id=case_id).exists():
-
-            current_case_goal: TopLevelNormativeGoal = (
-                TopLevelNormativeGoal.objects.get(assurance_case_id=case_id)
-            )
-            goal_id: int = current_case_goal.pk
-
-            UpdateIdentifierUtils._update_sequential_identifiers(
-                TopLevelNormativeGoal.objects.filter(id=goal_id).order_by("id"),
-                "G",
-            )
-
-            UpdateIdentifierUtils._update_sequential_identifiers(
-                Context.objects.filter(goal_id=goal_id).order_by("id"), "C"
-            )
-
-            current_case_strategies: QuerySet = Strategy.objects.filter(
-                goal_id=goal_id
-            ).order_by("id")
-            UpdateIdentifierUtils._update_sequential_identifiers(
-                current_case_strategies, "S"
-            )
-
-            (
-                top_level_claim_ids,
-                child_claim_ids,
-            ) = get_case_property_claims(current_case_goal, current_case_strategies)
-
-            UpdateIdentifierUtils._update_sequential_identifiers(
-                Evidence.objects.filter(
-                    property_claim__id__in=top_level_claim_ids + child_claim_ids
-                ).order_by("id"),
-                "E",
-            )
-
-            parent_property_claims: list = sorted(
-                PropertyClaim.objects.filter(pk__in=top_level_claim_ids),
-                key=functools.cmp_to_key(
-                    UpdateIdentifierUtils._compare_property_claims
-                ),
-            )
-
-            UpdateIdentifierUtils._update_sequential_identifiers(
-                parent_property_claims, "P"
-            )
-
-            for _, property_claim in enumerate(parent_property_claims):
-                traverse_child_property_claims(
-                    lambda index, child, parent: UpdateIdentifierUtils._update_item_name(
-                        child, f"{parent.name}.", index + 1
-                    ),
-                    property_claim.pk,
-                )
-
-            if model_instance is not None:
-                model_instance.refresh_from_db()
-
-    @staticmethod
-    def _compare_property_claims(
-        one_claim: PropertyClaim, another_claim: PropertyClaim
-    ) -> int:
-        ONE_CLAIM_LEFT: int = -1
-        ONE_CLAIM_RIGHT: int = 1
-        result: int = 0
-
-        if one_claim.strategy is None and another_claim.strategy is not None:
-            result = ONE_CLAIM_LEFT
-        elif one_claim.strategy is None and another_claim.strategy is None:
-            result = one_claim.pk - another_claim.pk
-        elif one_claim.strategy is not None and another_claim.strategy is None:
-            result = ONE_CLAIM_RIGHT
-        elif one_claim.strategy is not None and another_claim.strategy is not None:
-            if one_claim.strategy != another_claim.strategy:
-                result = one_claim.strategy.pk - another_claim.strategy.pk
-            else:
-                result = one_claim.pk - another_claim.pk
-
-        return result
-
-    @staticmethod
-    def _update_item_name(case_item: CaseItem, prefix: str, number: int) -> None:
-        """Updates the name of a case item, given a prefix and a sequence number."""
-        case_item.name = f"{prefix}{number}"
-        case_item.save()
-
-    @staticmethod
-    def _update_sequential_identifiers(query_set: QuerySet | list, prefix: str):
-        """For a list of case items, it updates their name according to its order."""
-        for model_index, model in enumerate(query_set):
-            UpdateIdentifierUtils._update_item_name(model, prefix, model_index + 1)
-
-
 class SocialAuthenticationUtils:
     @staticmethod
     def register_social_user(social_user: EAPUser, auth_provider: str) -> EAPUser:
@@ -453,64 +706,58 @@ class ShareAssuranceCaseUtils:
 
         return additions, removals
 
-    @staticmethod
-    def get_user_cases(user: EAPUser, permission_list: list[str]) -> list[dict]:
-        case_catalog: dict[int, dict] = {}
-        group_ids: list[int] = [group.pk for group in user.all_groups.all()]
-
-        if "view" in permission_list:
-            ShareAssuranceCaseUtils._consolidate_case_list(
-                case_catalog,
-                AssuranceCase.objects.filter(view_groups__in=group_ids),
-                "view",
-            )
-
-        if "edit" in permission_list:
-            ShareAssuranceCaseUtils._consolidate_case_list(
-                case_catalog,
-                AssuranceCase.objects.filter(edit_groups__in=group_ids),
-                "edit",
-            )
+    CASE_PERMISSIONS: tuple[str, ...] = ("view", "edit", "review", "owner")
+    CASE_ORDERINGS: tuple[str, ...] = ("id", "name", "created_date")
 
-        if "review" in permission_list:
-            ShareAssuranceCaseUtils._consolidate_case_list(
-                case_catalog,
-                AssuranceCase.objects.filter(review_groups__in=group_ids),
-                "review",
-            )
+    @staticmethod
+    def get_user_cases(
+        user: EAPUser,
+        permission_list: list[str],
+        name_filter: Optional[str] = None,
+        ordering: str = "id",
+    ) -> QuerySet[AssuranceCase]:
+        """Cases the user has any of the given permissions on, in a single query.
+
+        Every case is annotated with a has_<permission>_permission flag for each of
+        "view", "edit", "review" and "owner".
+        """
+        user_group_ids: QuerySet = EAPGroup.objects.filter(member=user).values("pk")
 
-        if "owner" in permission_list:
-            ShareAssuranceCaseUtils._consolidate_case_list(
-                case_catalog, user.cases.all(), "owner"
+        def is_shared_through(group_relation: Any) -> Exists:
+            return Exists(
+                group_relation.through.objects.filter(
+                    assurancecase_id=OuterRef("pk"), eapgroup_id__in=user_group_ids
+                )
             )
 
-        return [
-            ShareAssuranceCaseUtils.make_case_summary(
-                AssuranceCaseSerializer(case_entry["case"]),
-                case_entry["permissions"],
-            )
-            for case_entry in case_catalog.values()
-        ]
+        user_cases: QuerySet = AssuranceCase.objects.only(
+            "id", "name", "description", "created_date", "owner_id"
+        ).annotate(
+            has_view_permission=is_shared_through(AssuranceCase.view_groups),
+            has_edit_permission=is_shared_through(AssuranceCase.edit_groups),
+            has_review_permission=is_shared_through(AssuranceCase.review_groups),
+            has_owner_permission=ExpressionWrapper(
+                Q(owner_id=user.pk), output_field=BooleanField()
+            ),
+        )
 
-    @staticmethod
-    def make_case_summary(serialized_case, permissions: set) -> dict:
-        case_summary: dict = cast(dict, make_case_summary(serialized_case.data))
-        case_summary["permissions"] = list(permissions)
-        return case_summary
+        permission_filter: Q = Q(pk__in=[])
+        for permission in permission_list:
+            permission_filter |= Q(**{f"has_{permission}_permission": True})
+        user_cases = user_cases.filter(permission_filter)
 
-    @staticmethod
-    def _consolidate_case_list(
-        case_catalog: dict[int, dict],
-        new_cases: QuerySet[AssuranceCase],
-        permission: str,
-    ):
-        cases_as_list: list[AssuranceCase] = list(new_cases)
+        if name_filter:
+            user_cases = user_cases.filter(name__icontains=name_filter)
 
-        for case in cases_as_list:
-            if case.pk not in case_catalog:
-                case_catalog[case.pk] = {"case": case, "permissions": {permission}}
-            else:
-                case_catalog[case.pk]["permissions"].add(permission)
+        descending: bool = ordering.startswith("-")
+        order_field: str = ordering.lstrip("-")
+        # Names are sorted as users read them, regardless of case.
+        order_expression: Any = (
+            Lower(order_field) if order_field == "name" else F(order_field)
+        )
+        return user_cases.order_by(
+            order_expression.desc() if descending else order_expression.asc(), "id"
+        )
 
     @staticmethod
     def _get_users_from_group_list(group_manager: QuerySet) -> list[dict[str, Any]]:
@@ -656,10 +903,40 @@ def filter_by_case_id(items, request):
     """
     if "case_id" in request.GET:
         case_id = int(request.GET["case_id"])
-        items = [g for g in items if get_case_id(g) == case_id]
+        items = items.filter(assurance_case_id=case_id)
     return items
 
 
+def list_case_item_summaries(items: QuerySet, request: Any) -> JsonResponse:
+    """Summaries of the case items in the case given in the request, if any.
+
+    The response is a plain list unless the request asks for a page, using the
+    "cursor" or "page_size" query parameters. Then it is a dict with the summaries in
+    "results", and links to the "next" and "previous" pages.
+    """
+    items = filter_by_case_id(items, request).order_by("id")
+    summaries: QuerySet = items.values("id", "name")
+
+    if not CaseItemCursorPagination.is_requested(request):
+        return JsonResponse(list(summaries), safe=False)
+
+    paginator = CaseItemCursorPagination()
+    try:
+        page: list[dict] = cast(
+            list, paginator.paginate_queryset(summaries, Request(request))
+        )
+    except NotFound as not_found:
+        return JsonResponse({"detail": str(not_found.detail)}, status=404)
+
+    return JsonResponse(
+        {
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+            "results": page,
+        }
+    )
+
+
 def make_summary(model_data: Union[dict, list, CaseItem]):
     """
     Take in a full serialized object, and return dict containing just
@@ -740,67 +1017,6 @@ def get_json_tree(id_list: list, obj_type: str) -> list:
     return objs
 
 
-def save_json_tree(data, obj_type, parent_id=None, parent_type=None):
-    """Recursively write items in an assurance case tree.
-
-    Create a new assurance case like the one described by data, including all
-    its items.
-
-    Params
-    ======
-    data: JSON for the assurance case and all its items. At the top level
-        includes the whole item tree, subtrees when recursing.
-    obj_type: Key of the json object (also a key of 'TYPE_DICT'). At the top
-        level this should be "assurance_case".
-    parent_id: None at the top level, id of the caller when recursing.
-
-    Returns
-    =======
-    objs: JsonResponse describing failure/success.
-    """
-    # Create the top object in data. Only include some of the fields from data,
-    # so that e.g. the new object gets a unique ID even if `data` specifies an
-    # ID.
-    this_data = {k: data[k] for k in TYPE_DICT[obj_type]["fields"]}
-    if parent_id is not None and parent_type is not None:
-        for parent_type_tmp, plural in TYPE_DICT[obj_type]["parent_types"]:
-            # TODO This is silly. It's all because some parent_type names are written
-            # with a plural s in the end while others are not.
-            if (
-                parent_type[:-1] not in parent_type_tmp[:-1]
-                and parent_type_tmp[:-1] not in parent_type[:-1]
-            ):
-                continue
-            if plural:
-                parent_id = [parent_id]
-            this_data[parent_type_tmp + "_id"] = parent_id
-    serializer_class = TYPE_DICT[obj_type]["serializer"]
-    serializer = serializer_class(data=this_data)
-    if serializer.is_valid():
-        serializer.save()
-    else:
-        return JsonResponse(serializer.errors, status=400)
-
-    # Recurse into child types.
-    name = serializer.data["name"]
-    id = serializer.data["id"]
-    success_http_code = 201
-    child_types = TYPE_DICT[obj_type]["children"]
-    for child_type in child_types:
-        if child_type not in data:
-            continue
-        for child_data in data[child_type]:
-            retval = save_json_tree(
-                child_data, child_type, parent_id=id, parent_type=obj_type
-            )
-            # If one of the subcalls returns an error, return.
-            if retval.status_code != success_http_code:
-                return retval
-
-    summary = {"name": name, "id": id}
-    return JsonResponse(summary, status=success_http_code)
-
-
 def get_case_permissions(
     case: AssuranceCase | int | str, user: EAPUser
 ) -> Literal["manage"] | Literal["edit"] | Literal["review"] | Literal["view"] | None:
@@ -822,34 +1038,18 @@ def get_case_permissions(
     None otherwise.
     """
     if isinstance(case, (int, str)):
-        case = AssuranceCase.objects.get(pk=int(case))
+        case = AssuranceCase.objects.only("owner_id").get(pk=int(case))
 
-    if (not case.owner) or (case.owner == user):
+    if case.owner_id is None or case.owner_id == user.pk:
         # case has no owner - anyone can view it, or user is owner
         return "manage"
 
-    # now check groups
-    try:
-        user_groups: QuerySet = user.all_groups.get_queryset()
-        edit_groups: QuerySet = case.edit_groups.get_queryset()
-        # check intersection of two lists
-        if set(edit_groups) & set(user_groups):
-            return "edit"
-
-        review_groups: QuerySet = case.review_groups.get_queryset()
-        if set(review_groups) & set(user_groups):
-            return "review"
-
-        view_groups = case.view_groups.get_queryset()
-        if set(view_groups) & set(user_groups):
-            return "view"
-    except EAPGroup.DoesNotExist:
-        # no group found for user or for case
-        pass
-    except AttributeError:
-        # probably AnonymousUser
-        pass
-    return None
+    # now check the permission index, maintained from the groups of the case
+    return (
+        CasePermission.objects.filter(user_id=user.pk, assurance_case_id=case.pk)
+        .values_list("permission", flat=True)
+        .first()
+    )
 
 
 def get_allowed_cases(user):
@@ -864,9 +1064,11 @@ def get_allowed_cases(user):
     ========
     list of AssuranceCase instances.
     """
-    all_cases = AssuranceCase.objects.all()
-    # if get_case_permissions returns anything other than None, include in allowed_cases
-    return [case for case in all_cases if get_case_permissions(case, user)]
+    return list(
+        AssuranceCase.objects.filter(
+            Q(owner__isnull=True) | Q(user_permissions__user_id=user.pk)
+        ).distinct()
+    )
 
 
 def can_view_group(group, user, level="member"):
@@ -890,16 +1092,17 @@ def can_view_group(group, user, level="member"):
     if not hasattr(user, "all_groups"):
         # probably AnonymousUser
         return False
-    if level == "owner" and group.owner and group.owner == user:
-        return True
-    elif level == "member" and group in user.all_groups.get_queryset():
-        return True
-    return False
+    if level == "owner":
+        return group.owner_id is not None and group.owner_id == user.pk
+    return group.member.filter(pk=user.pk).exists()
 
 
-def get_allowed_groups(user, level="member"):
+def get_allowed_groups(user, level="member") -> QuerySet:
     """
-    get a list of Groups that the user is allowed to view or that they own.
+    get the Groups that the user is allowed to view or that they own.
+
+    The groups are filtered in the database, and come with their members and cases
+    prefetched for EAPGroupSerializer.
 
     Parameters:
     ===========
@@ -908,7 +1111,22 @@ def get_allowed_groups(user, level="member"):
 
     Returns:
     ========
-    list of EAPGroup instances in which the user is a member, or the owner
+    QuerySet of EAPGroup instances in which the user is a member, or the owner,
+    ordered by id.
     """
-    all_groups = EAPGroup.objects.all()
-    return [group for group in all_groups if can_view_group(group, user, level)]
+    if level not in ["owner", "member"]:
+        msg = "'level' parameter should be 'owner' or 'member'"
+        raise RuntimeError(msg)
+    if not hasattr(user, "all_groups"):
+        # probably AnonymousUser
+        return EAPGroup.objects.none()
+
+    if level == "owner":
+        groups = EAPGroup.objects.filter(owner_id=user.pk)
+    else:
+        groups = EAPGroup.objects.filter(member__id=user.pk)
+    return groups.prefetch_related(
+        Prefetch("member", queryset=EAPUser.objects.only("id")),
+        Prefetch("viewable_cases", queryset=AssuranceCase.objects.only("id")),
+        Prefetch("editable_cases", queryset=AssuranceCase.objects.only("id")),
+    ).order_by("id")
@@ -1,22 +1,41 @@
-from typing import Any, cast
-
-from django.http import HttpResponse, JsonResponse
+import functools
+import io
+from pathlib import Path
+from typing import Any, Optional, cast
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import GenericAPIView
 from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.request import HttpRequest
 from rest_framework.response import Response
-from rest_framework.serializers import ReturnDict
 from social_core.exceptions import AuthForbidden
 from social_django.utils import psa
 
+from .case_batch import CaseBatch, CaseBatchError
+from .case_cache import CaseTreeCache, ConditionalGetUtils
+from .case_changes import CaseChangeFeed
+from .case_export import CaseTreeExporter, CaseTreeLoader
+from .case_import import (
+    CaseCloner,
+    case_upload_too_large,
+    check_case_upload_size,
+    import_case_stream,
+)
+from .identifiers import SiblingIdentifierUpdate, UpdateIdentifierUtils
+from .jobs import read_job_input, submit_case_job
+from .json_stream import JSONStreamTooLargeError
 from .models import (
     AssuranceCase,
     AssuranceCaseImage,
+    CaseJob,
     Comment,
     Context,
     EAPGroup,
@@ -27,10 +46,13 @@ from .models import (
     Strategy,
     TopLevelNormativeGoal,
 )
+from .pagination import CaseListPagination, GroupListPagination
 from .serializers import (
     TYPE_DICT,
     AssuranceCaseImageSerializer,
     AssuranceCaseSerializer,
+    AssuranceCaseSummarySerializer,
+    CaseJobSerializer,
     CommentSerializer,
     ContextSerializer,
     EAPGroupSerializer,
@@ -51,14 +73,11 @@ from .view_utils import (
     SandboxUtils,
     ShareAssuranceCaseUtils,
     SocialAuthenticationUtils,
-    UpdateIdentifierUtils,
     can_view_group,
-    filter_by_case_id,
     get_allowed_groups,
     get_case_permissions,
-    get_json_tree,
+    list_case_item_summaries,
     make_summary,
-    save_json_tree,
 )
 
 
@@ -179,8 +198,30 @@ def group_list(request):
         response_dict = {}
         for level in ["owner", "member"]:
             groups = get_allowed_groups(request.user, level)
-            serializer = EAPGroupSerializer(groups, many=True)
-            response_dict[level] = serializer.data
+            if not GroupListPagination.is_requested(request):
+                serializer = EAPGroupSerializer(groups, many=True)
+                response_dict[level] = serializer.data
+                continue
+
+            paginator = GroupListPagination()
+            try:
+                page = paginator.paginate_queryset(groups, request)
+            except NotFound:
+                # the other list may still have groups on this page
+                response_dict[level] = {
+                    "count": groups.count(),
+                    "next": None,
+                    "previous": None,
+                    "results": [],
+                }
+                continue
+            serializer = EAPGroupSerializer(page, many=True)
+            response_dict[level] = {
+                "count": paginator.page.paginator.count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data,
+            }
         return JsonResponse(response_dict, safe=False)
     elif request.method == "POST":
         data = JSONParser().parse(request)
@@ -233,20 +274,46 @@ def case_list(request):
 
     permission_list: list[str] = [
         permission
-        for permission in ["owner", "view", "edit", "review"]
+        for permission in ShareAssuranceCaseUtils.CASE_PERMISSIONS
         if request.query_params.get(permission, "true").lower() == "true"
     ]
 
     if request.method == "GET":
+        ordering: str = request.query_params.get("ordering", "id")
+        if ordering.lstrip("-") not in ShareAssuranceCaseUtils.CASE_ORDERINGS:
+            return JsonResponse(
+                {"error_message": f"Cannot order cases by {ordering}"}, status=400
+            )
 
-        serialized_cases = ShareAssuranceCaseUtils.get_user_cases(
-            request.user, permission_list
+        user_cases = ShareAssuranceCaseUtils.get_user_cases(
+            request.user,
+            permission_list,
+            name_filter=request.query_params.get("search"),
+            ordering=ordering,
+        )
+        serializer_context: dict = {"permission_list": permission_list}
+
+        if not CaseListPagination.is_requested(request):
+            serializer = AssuranceCaseSummarySerializer(
+                user_cases, many=True, context=serializer_context
+            )
+            return JsonResponse(serializer.data, safe=False)
+
+        paginator = CaseListPagination()
+        page = paginator.paginate_queryset(user_cases, request)
+        serializer = AssuranceCaseSummarySerializer(
+            page, many=True, context=serializer_context
+        )
+        return JsonResponse(
+            {
+                "count": paginator.page.paginator.count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data,
+            }
         )
-        return JsonResponse(serialized_cases, safe=False)
     elif request.method == "POST":
-        data = JSONParser().parse(request)
-        data["owner"] = request.user.id
-        return save_json_tree(data, "assurance_case")
+        return import_case_stream(request, {"owner": request.user.id})
     return None
 
 
@@ -299,19 +366,23 @@ def case_detail(request, pk):
     Retrieve, update, or delete an AssuranceCase, by primary key
     """
     try:
-        case = AssuranceCase.objects.get(pk=pk)
+        case = AssuranceCase.objects.select_related("revision").get(pk=pk)
     except AssuranceCase.DoesNotExist:
         return HttpResponse(status=404)
     permissions = get_case_permissions(case, request.user)
     if not permissions:
         return HttpResponse(status=403)
     if request.method == "GET":
-        serializer = AssuranceCaseSerializer(case)
-        case_data = serializer.data
-        goals = get_json_tree(case_data["goals"], "goals")
-        case_data["goals"] = goals
+        etag: str | None = CaseTreeCache.get_etag(case, "tree", permissions)
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        case_data = CaseTreeCache.get_case_tree(case)
         case_data["permissions"] = permissions
-        return JsonResponse(case_data)
+        # Lets clients follow later changes from /cases/<pk>/changes.
+        case_data["sequence"] = CaseTreeCache.get_revision(case)
+        return ConditionalGetUtils.tag_response(JsonResponse(case_data), etag)
     elif request.method == "PUT":
         if permissions not in ["manage", "edit"]:
             return HttpResponse(status=403)
@@ -333,14 +404,187 @@ def case_detail(request, pk):
 @csrf_exempt
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def case_sandbox(_: HttpRequest, pk: int) -> HttpResponse:
+def case_sandbox(request: HttpRequest, pk: int) -> HttpResponse:
     try:
-        assurance_case: AssuranceCase = AssuranceCase.objects.get(pk=pk)
-        serialized_sandbox: ReturnDict = SandboxUtils.serialise_sandbox(assurance_case)
-        return JsonResponse(serialized_sandbox)
+        assurance_case: AssuranceCase = AssuranceCase.objects.select_related(
+            "revision"
+        ).get(pk=pk)
     except AssuranceCase.DoesNotExist:
         return HttpResponse(status=404)
 
+    etag: str | None = CaseTreeCache.get_etag(assurance_case, "sandbox")
+    not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    serialized_sandbox: dict = CaseTreeCache.get_sandbox(assurance_case)
+    return ConditionalGetUtils.tag_response(JsonResponse(serialized_sandbox), etag)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def case_changes(request, pk: int):
+    """
+    List the items of a case changed since the revision given as `since`
+    """
+    try:
+        assurance_case = AssuranceCase.objects.select_related("revision").get(pk=pk)
+    except AssuranceCase.DoesNotExist:
+        return HttpResponse(status=404)
+    if not get_case_permissions(assurance_case, request.user):
+        return HttpResponse(status=403)
+
+    since: str = request.query_params.get("since", "")
+    if not since.isdigit():
+        return JsonResponse(
+            {"error_message": "Query parameter since should be a revision number."},
+            status=400,
+        )
+
+    return JsonResponse(CaseChangeFeed.get_changes(assurance_case, int(since)))
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def detach_sandbox_items(request, pk: int):
+    """
+    Move a selection of items of a case to its sandbox, and return the sandbox
+    """
+    return _move_sandbox_items(request, pk, SandboxUtils.detach_items)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def attach_sandbox_items(request, pk: int):
+    """
+    Move a selection of items of a case out of its sandbox, and return the sandbox
+    """
+    return _move_sandbox_items(request, pk, SandboxUtils.attach_items)
+
+
+def _move_sandbox_items(request, pk: int, move_items) -> HttpResponse:
+    try:
+        assurance_case = AssuranceCase.objects.get(pk=pk)
+    except AssuranceCase.DoesNotExist:
+        return HttpResponse(status=404)
+    if get_case_permissions(assurance_case, request.user) not in ["manage", "edit"]:
+        return HttpResponse(status=403)
+
+    try:
+        move_items(assurance_case, request.data)
+    except ObjectDoesNotExist as does_not_exist:
+        return JsonResponse({"error_message": str(does_not_exist)}, status=404)
+    except ValueError as value_error:
+        return JsonResponse({"error_message": str(value_error)}, status=400)
+
+    assurance_case = AssuranceCase.objects.select_related("revision").get(pk=pk)
+    return JsonResponse(CaseTreeCache.get_sandbox(assurance_case))
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def case_batch(request, pk: int):
+    """
+    Apply a list of changes to the items of a case, all together or not at all
+    """
+    try:
+        assurance_case = AssuranceCase.objects.get(pk=pk)
+    except AssuranceCase.DoesNotExist:
+        return HttpResponse(status=404)
+    if get_case_permissions(assurance_case, request.user) not in ["manage", "edit"]:
+        return HttpResponse(status=403)
+
+    try:
+        operations = (
+            request.data.get("operations") if isinstance(request.data, dict) else None
+        )
+        results = CaseBatch(assurance_case).apply(operations)
+    except CaseBatchError as error:
+        return error.as_response()
+    return JsonResponse({"results": results})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def case_clone(request, pk: int):
+    """
+    Copy a case, with all its items and comments, as a new case of the user
+    """
+    try:
+        assurance_case = AssuranceCase.objects.get(pk=pk)
+    except AssuranceCase.DoesNotExist:
+        return HttpResponse(status=404)
+    if not get_case_permissions(assurance_case, request.user):
+        return HttpResponse(status=403)
+
+    if not isinstance(request.data, dict):
+        return JsonResponse(
+            {"error_message": "The request body should be a JSON object."},
+            status=400,
+        )
+    max_length: int = AssuranceCase._meta.get_field("name").max_length
+    name: str = request.data.get("name") or (
+        f"{assurance_case.name} (copy)"[:max_length]
+    )
+    if not isinstance(name, str) or len(name) > max_length:
+        return JsonResponse(
+            {"error_message": f"Case names are limited to {max_length} characters"},
+            status=400,
+        )
+
+    copy: AssuranceCase = CaseCloner(assurance_case).clone(request.user, name)
+    return JsonResponse({"name": copy.name, "id": copy.pk}, status=201)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def case_export(request, pk: int):
+    """
+    Download the JSON of a whole case, in the format of the examples directory
+    """
+    try:
+        assurance_case = AssuranceCase.objects.get(pk=pk)
+    except AssuranceCase.DoesNotExist:
+        return HttpResponse(status=404)
+    if not get_case_permissions(assurance_case, request.user):
+        return HttpResponse(status=403)
+
+    return CaseTreeExporter.make_response(
+        CaseTreeExporter(assurance_case).write,
+        CaseTreeExporter.get_file_name(assurance_case),
+        "application/json",
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def case_bulk_export(request):
+    """
+    Download every case the user has access to, as NDJSON or as a zip archive
+    """
+    output: str = request.query_params.get("output", "ndjson")
+    if output not in ["ndjson", "zip"]:
+        return JsonResponse(
+            {"error_message": f"Cannot export cases as {output}"}, status=400
+        )
+
+    case_ids: list[int] = list(
+        ShareAssuranceCaseUtils.get_user_cases(
+            request.user, list(ShareAssuranceCaseUtils.CASE_PERMISSIONS)
+        ).values_list("pk", flat=True)
+    )
+    if output == "zip":
+        return CaseTreeExporter.make_response(
+            functools.partial(CaseTreeExporter.write_zip, case_ids),
+            "cases.zip",
+            "application/zip",
+        )
+    return CaseTreeExporter.make_response(
+        functools.partial(CaseTreeExporter.write_ndjson, case_ids),
+        "cases.ndjson",
+        "application/x-ndjson",
+    )
+
 
 @csrf_exempt
 @api_view(["GET", "POST"])
@@ -391,6 +635,97 @@ def case_update_identifiers(_, pk: int):
     return HttpResponse(status=200)
 
 
+@csrf_exempt
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def job_list(request):
+    """
+    List the jobs of the user, or queue an export or renumbering of a case
+    """
+    if request.method == "GET":
+        jobs = CaseJob.objects.filter(owner=request.user).order_by("-created_date")
+        serializer = CaseJobSerializer(jobs, many=True)
+        return JsonResponse(serializer.data, safe=False)
+    elif request.method == "POST":
+        kind = request.data.get("kind") if isinstance(request.data, dict) else None
+        if kind not in [CaseJob.Kind.EXPORT, CaseJob.Kind.UPDATE_IDENTIFIERS]:
+            return JsonResponse(
+                {"error_message": f"Cannot queue a job of kind {kind}"}, status=400
+            )
+        try:
+            assurance_case = AssuranceCase.objects.get(pk=request.data.get("case_id"))
+        except (AssuranceCase.DoesNotExist, ValueError, TypeError):
+            return HttpResponse(status=404)
+
+        permissions = get_case_permissions(assurance_case, request.user)
+        if not permissions or (
+            kind == CaseJob.Kind.UPDATE_IDENTIFIERS
+            and permissions not in ["manage", "edit"]
+        ):
+            return HttpResponse(status=403)
+
+        job = submit_case_job(request.user, kind, assurance_case)
+        return JsonResponse(CaseJobSerializer(job).data, status=202)
+    return None
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def job_import(request):
+    """
+    Queue the import of a case, whose JSON is the request body
+    """
+    size_error: Optional[JsonResponse] = check_case_upload_size(request)
+    if size_error is not None:
+        return size_error
+    try:
+        input_file = read_job_input(
+            request.stream or io.BytesIO(), settings.CASE_UPLOAD_MAX_SIZE
+        )
+    except JSONStreamTooLargeError:
+        return case_upload_too_large()
+
+    with input_file:
+        job = submit_case_job(request.user, CaseJob.Kind.IMPORT, input_file=input_file)
+    return JsonResponse(CaseJobSerializer(job).data, status=202)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def job_detail(request, pk: int):
+    try:
+        job = CaseJob.objects.get(pk=pk)
+    except CaseJob.DoesNotExist:
+        return HttpResponse(status=404)
+    if job.owner_id != request.user.id:
+        return HttpResponse(status=403)
+
+    return JsonResponse(CaseJobSerializer(job).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def job_result(request, pk: int):
+    try:
+        job = CaseJob.objects.get(pk=pk)
+    except CaseJob.DoesNotExist:
+        return HttpResponse(status=404)
+    if job.owner_id != request.user.id:
+        return HttpResponse(status=403)
+    if not job.result_file:
+        return JsonResponse(
+            {"error_message": f"Job {job.pk} has no result file"}, status=404
+        )
+
+    return FileResponse(
+        job.result_file.open("rb"),
+        as_attachment=True,
+        filename=Path(job.result_file.name).name,
+        content_type="application/json",
+    )
+
+
 @csrf_exempt
 @permission_classes([IsAuthenticated])
 def goal_list(request: HttpRequest) -> HttpResponse:
@@ -398,11 +733,7 @@ def goal_list(request: HttpRequest) -> HttpResponse:
     List all goals, or make a new goal
     """
     if request.method == "GET":
-        goals = TopLevelNormativeGoal.objects.all()
-        goals = filter_by_case_id(goals, request)
-        serializer = TopLevelNormativeGoalSerializer(goals, many=True)
-        summaries = make_summary(serializer.data)
-        return JsonResponse(summaries, safe=False)
+        return list_case_item_summaries(TopLevelNormativeGoal.objects.all(), request)
     elif request.method == "POST":
 
         data = JSONParser().parse(request)
@@ -410,10 +741,12 @@ def goal_list(request: HttpRequest) -> HttpResponse:
         data["assurance_case"] = assurance_case_id
         serializer = TopLevelNormativeGoalSerializer(data=data)
         if serializer.is_valid():
-            model_instance: TopLevelNormativeGoal = cast(
-                TopLevelNormativeGoal,
-                serializer.save(),
-            )
+            with SiblingIdentifierUpdate() as identifier_update:
+                model_instance: TopLevelNormativeGoal = cast(
+                    TopLevelNormativeGoal,
+                    serializer.save(),
+                )
+                identifier_update.track(model_instance)
 
             serialised_model = TopLevelNormativeGoalSerializer(model_instance)
             return JsonResponse(serialised_model.data, status=201)
@@ -435,13 +768,21 @@ def goal_detail(request: HttpRequest, pk: int) -> HttpResponse:
         return HttpResponse(status=404)
 
     if request.method == "GET":
+        etag: str | None = ConditionalGetUtils.get_item_etag(goal, "goal")
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = TopLevelNormativeGoalSerializer(goal)
         data = serializer.data
         # replace IDs for children with full JSON objects
+        tree_loader = CaseTreeLoader().load(
+            {key: data[key] for key in ["context", "property_claims"]}
+        )
         for key in ["context", "property_claims"]:
-            data[key] = get_json_tree(data[key], key)
+            data[key] = tree_loader.get_json_tree(data[key], key)
         data["shape"] = shape
-        return JsonResponse(data)
+        return ConditionalGetUtils.tag_response(JsonResponse(data), etag)
     elif request.method == "PUT":
         data = JSONParser().parse(request)
         serializer = TopLevelNormativeGoalSerializer(goal, data=data, partial=True)
@@ -452,7 +793,8 @@ def goal_detail(request: HttpRequest, pk: int) -> HttpResponse:
             return JsonResponse(data)
         return JsonResponse(serializer.errors, status=400)
     elif request.method == "DELETE":
-        goal.delete()
+        with SiblingIdentifierUpdate(goal):
+            goal.delete()
         return HttpResponse(status=204)
     return HttpResponse(status=400)
 
@@ -464,16 +806,14 @@ def context_list(request: HttpRequest) -> HttpResponse:
     List all contexts, or make a new context
     """
     if request.method == "GET":
-        contexts = Context.objects.all()
-        contexts = filter_by_case_id(contexts, request)
-        serializer = ContextSerializer(contexts, many=True)
-        summaries = make_summary(serializer.data)
-        return JsonResponse(summaries, safe=False)
+        return list_case_item_summaries(Context.objects.all(), request)
     elif request.method == "POST":
         data = JSONParser().parse(request)
         serializer = ContextSerializer(data=data)
         if serializer.is_valid():
-            model_instance: Context = cast(Context, serializer.save())
+            with SiblingIdentifierUpdate() as identifier_update:
+                model_instance: Context = cast(Context, serializer.save())
+                identifier_update.track(model_instance)
 
             serialised_model = ContextSerializer(model_instance)
             return JsonResponse(serialised_model.data, status=201)
@@ -494,21 +834,28 @@ def context_detail(request: HttpRequest, pk: int) -> HttpResponse:
         return HttpResponse(status=404)
 
     if request.method == "GET":
+        etag: str | None = ConditionalGetUtils.get_item_etag(context, "context")
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = ContextSerializer(context)
         data = serializer.data
         data["shape"] = shape
-        return JsonResponse(data)
+        return ConditionalGetUtils.tag_response(JsonResponse(data), etag)
     elif request.method == "PUT":
         data = JSONParser().parse(request)
         serializer = ContextSerializer(context, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with SiblingIdentifierUpdate(context):
+                serializer.save()
             data = serializer.data
             data["shape"] = shape
             return JsonResponse(data)
         return JsonResponse(serializer.errors, status=400)
     elif request.method == "DELETE":
-        context.delete()
+        with SiblingIdentifierUpdate(context):
+            context.delete()
         return HttpResponse(status=204)
     return HttpResponse(status=400)
 
@@ -547,16 +894,14 @@ def property_claim_list(request: HttpRequest) -> HttpResponse:
     List all claims, or make a new claim
     """
     if request.method == "GET":
-        claims = PropertyClaim.objects.all()
-        claims = filter_by_case_id(claims, request)
-        serializer = PropertyClaimSerializer(claims, many=True)
-        summaries = make_summary(serializer.data)
-        return JsonResponse(summaries, safe=False)
+        return list_case_item_summaries(PropertyClaim.objects.all(), request)
     elif request.method == "POST":
         data = JSONParser().parse(request)
         serializer = PropertyClaimSerializer(data=data)
         if serializer.is_valid():
-            model_instance: PropertyClaim = cast(PropertyClaim, serializer.save())
+            with SiblingIdentifierUpdate() as identifier_update:
+                model_instance: PropertyClaim = cast(PropertyClaim, serializer.save())
+                identifier_update.track(model_instance)
 
             serialised_model = PropertyClaimSerializer(model_instance)
             return JsonResponse(serialised_model.data, status=201)
@@ -577,15 +922,21 @@ def property_claim_detail(request: HttpRequest, pk: int) -> HttpResponse:
         return HttpResponse(status=404)
 
     if request.method == "GET":
+        etag: str | None = ConditionalGetUtils.get_item_etag(claim, "property_claim")
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = PropertyClaimSerializer(claim)
         data = serializer.data
         data["shape"] = shape
-        return JsonResponse(data)
+        return ConditionalGetUtils.tag_response(JsonResponse(data), etag)
     elif request.method == "PUT":
         data = JSONParser().parse(request)
         serializer = PropertyClaimSerializer(claim, data=data, partial=True)
         if serializer.is_valid():
-            model_instance: PropertyClaim = cast(PropertyClaim, serializer.save())
+            with SiblingIdentifierUpdate(claim):
+                model_instance: PropertyClaim = cast(PropertyClaim, serializer.save())
 
             data: dict = cast(
                 dict,
@@ -596,7 +947,8 @@ def property_claim_detail(request: HttpRequest, pk: int) -> HttpResponse:
             return JsonResponse(data)
         return JsonResponse(serializer.errors, status=400)
     elif request.method == "DELETE":
-        claim.delete()
+        with SiblingIdentifierUpdate(claim):
+            claim.delete()
         return HttpResponse(status=204)
     return HttpResponse(status=400)
 
@@ -653,16 +1005,14 @@ def evidence_list(request: HttpRequest) -> HttpResponse:
     List all evidences, or make a new evidence
     """
     if request.method == "GET":
-        evidences = Evidence.objects.all()
-        evidences = filter_by_case_id(evidences, request)
-        serializer = EvidenceSerializer(evidences, many=True)
-        summaries = make_summary(serializer.data)
-        return JsonResponse(summaries, safe=False)
+        return list_case_item_summaries(Evidence.objects.all(), request)
     elif request.method == "POST":
         data = JSONParser().parse(request)
         serializer = EvidenceSerializer(data=data)
         if serializer.is_valid():
-            model_instance: Evidence = cast(Evidence, serializer.save())
+            with SiblingIdentifierUpdate() as identifier_update:
+                model_instance: Evidence = cast(Evidence, serializer.save())
+                identifier_update.track(model_instance)
 
             serialised_model = EvidenceSerializer(model_instance)
             return JsonResponse(serialised_model.data, status=201)
@@ -683,21 +1033,28 @@ def evidence_detail(request: HttpRequest, pk: int) -> HttpResponse:
         return HttpResponse(status=404)
 
     if request.method == "GET":
+        etag: str | None = ConditionalGetUtils.get_item_etag(evidence, "evidence")
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = EvidenceSerializer(evidence)
         data = serializer.data
         data["shape"] = shape
-        return JsonResponse(data)
+        return ConditionalGetUtils.tag_response(JsonResponse(data), etag)
     elif request.method == "PUT":
         data = JSONParser().parse(request)
         serializer = EvidenceSerializer(evidence, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with SiblingIdentifierUpdate(evidence):
+                serializer.save()
             data = serializer.data
             data["shape"] = shape
             return JsonResponse(data)
         return JsonResponse(serializer.errors, status=400)
     elif request.method == "DELETE":
-        evidence.delete()
+        with SiblingIdentifierUpdate(evidence):
+            evidence.delete()
         return HttpResponse(status=204)
     return HttpResponse(status=400)
 
@@ -751,16 +1108,14 @@ def strategies_list(request: HttpRequest) -> HttpResponse:
     List all strategies, or make a new strategy
     """
     if request.method == "GET":
-        strategies = Strategy.objects.all()
-        strategies = filter_by_case_id(strategies, request)
-        serializer = StrategySerializer(strategies, many=True)
-        summaries = make_summary(serializer.data)
-        return JsonResponse(summaries, safe=False)
+        return list_case_item_summaries(Strategy.objects.all(), request)
     elif request.method == "POST":
         data = JSONParser().parse(request)
         serializer = StrategySerializer(data=data)
         if serializer.is_valid():
-            model_instance: Strategy = cast(Strategy, serializer.save())
+            with SiblingIdentifierUpdate() as identifier_update:
+                model_instance: Strategy = cast(Strategy, serializer.save())
+                identifier_update.track(model_instance)
 
             serialised_model = StrategySerializer(model_instance)
             return JsonResponse(serialised_model.data, status=201)
@@ -777,20 +1132,27 @@ def strategy_detail(request: HttpRequest, pk: int) -> HttpResponse:
         return HttpResponse(status=404)
 
     if request.method == "GET":
+        etag: str | None = ConditionalGetUtils.get_item_etag(strategy, "strategy")
+        not_modified = ConditionalGetUtils.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         serializer = StrategySerializer(strategy)
-        return JsonResponse(serializer.data)
+        return ConditionalGetUtils.tag_response(JsonResponse(serializer.data), etag)
 
     elif request.method == "PUT":
         data = JSONParser().parse(request)
         serializer = StrategySerializer(strategy, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with SiblingIdentifierUpdate(strategy):
+                serializer.save()
             summary = make_summary(serializer.data)
             return JsonResponse(summary)
         return JsonResponse(serializer.errors, status=400)
 
     elif request.method == "DELETE":
-        strategy.delete()
+        with SiblingIdentifierUpdate(strategy):
+            strategy.delete()
         return HttpResponse(status=204)
     return HttpResponse(status=400)
 
@@ -0,0 +1,100 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from eap_api.models import AssuranceCase, EAPUser
+from eap_websockets.consumers import AssuranceCaseConsumer
+
+BENCHMARK_USERNAME_PREFIX: str = "connection-benchmark-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many simultaneous websocket connections to a temporary assurance case, "
+        "and report how long they took to connect"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections",
+            type=int,
+            default=100,
+            help="Number of simultaneous connections, each by a different user",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30.0,
+            help="Seconds to wait for each connection to be accepted",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        if options["connections"] < 1:
+            msg: str = "At least one connection is needed."
+            raise CommandError(msg)
+
+        # Cases without an owner can be viewed by anyone, including simulated users.
+        assurance_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Connection benchmark"
+        )
+        # Connections are not stored in the database, so neither are their users.
+        users: list[EAPUser] = [
+            EAPUser(pk=index + 1, username=f"{BENCHMARK_USERNAME_PREFIX}{index}")
+            for index in range(options["connections"])
+        ]
+        try:
+            latencies: list[float] = async_to_sync(self.connect_all)(
+                assurance_case.pk, users, options["timeout"]
+            )
+        finally:
+            assurance_case.delete()
+
+        self.report(latencies)
+
+    async def connect_all(
+        self, case_id: int, users: list[EAPUser], timeout: float
+    ) -> list[float]:
+        communicators: list[WebsocketCommunicator] = []
+        for user in users:
+            communicator = WebsocketCommunicator(
+                AssuranceCaseConsumer.as_asgi(), f"/ws/case/{case_id}/"
+            )
+            communicator.scope["user"] = user
+            communicator.scope["url_route"] = {"kwargs": {"case_id": str(case_id)}}
+            communicators.append(communicator)
+
+        async def connect(communicator: WebsocketCommunicator) -> float:
+            start: float = time.perf_counter()
+            connected, _ = await communicator.connect(timeout)
+            if not connected:
+                msg: str = "A connection was rejected."
+                raise CommandError(msg)
+            return time.perf_counter() - start
+
+        try:
+            return list(await asyncio.gather(*map(connect, communicators)))
+        finally:
+            await asyncio.gather(
+                *(communicator.disconnect(timeout) for communicator in communicators),
+                return_exceptions=True,
+            )
+
+    def report(self, latencies: list[float]) -> None:
+        milliseconds: list[float] = sorted(latency * 1000 for latency in latencies)
+        percentiles: list[float] = (
+            statistics.quantiles(milliseconds, n=100, method="inclusive")
+            if len(milliseconds) > 1
+            else milliseconds * 99
+        )
+
+        self.stdout.write(f"Connections: {len(milliseconds)}")
+        for percentile in (50, 90, 99):
+            self.stdout.write(
+                f"p{percentile} connect latency: {percentiles[percentile - 1]:.1f} ms"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Max connect latency: {milliseconds[-1]:.1f} ms")
+        )
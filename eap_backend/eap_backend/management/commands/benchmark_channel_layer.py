@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from channels.layers import BaseChannelLayer, InMemoryChannelLayer
+from django.core.management.base import BaseCommand, CommandError
+from eap_websockets.layers import SQLiteChannelLayer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many group messages the in-memory and SQLite channel layers "
+        "deliver per second"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=1000,
+            help="Number of messages sent to the group",
+        )
+        parser.add_argument(
+            "--receivers",
+            type=int,
+            default=10,
+            help="Number of channels in the group, each receiving every message",
+        )
+
+        parser.add_argument(
+            "--idle-workers",
+            type=int,
+            default=4,
+            help="Number of other processes waiting on the SQLite layer meanwhile",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        if options["messages"] < 1 or options["receivers"] < 1:
+            msg: str = "At least one message and one receiver are needed."
+            raise CommandError(msg)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = str(Path(directory) / "channels.sqlite3")
+            # Enough capacity for receivers to fall behind without losing messages.
+            self.benchmark(
+                "in-memory", InMemoryChannelLayer(capacity=options["messages"]), options
+            )
+            self.benchmark(
+                "sqlite",
+                SQLiteChannelLayer(path, capacity=options["messages"]),
+                options,
+            )
+            if options["idle_workers"] > 0:
+                self.benchmark_with_idle_workers(path, options)
+
+    def benchmark_with_idle_workers(self, path: str, options: dict) -> None:
+        # Forked processes start with Django set up, like the workers of a server.
+        context = multiprocessing.get_context("fork")
+        idle_workers: list = [
+            context.Process(target=wait_for_messages, args=(path,), daemon=True)
+            for _ in range(options["idle_workers"])
+        ]
+        for idle_worker in idle_workers:
+            idle_worker.start()
+        try:
+            # Let them start polling.
+            time.sleep(0.5)
+            self.benchmark(
+                f"sqlite with {len(idle_workers)} idle workers",
+                SQLiteChannelLayer(path, capacity=options["messages"]),
+                options,
+            )
+        finally:
+            for idle_worker in idle_workers:
+                idle_worker.terminate()
+                idle_worker.join()
+
+    def benchmark(self, name: str, layer: BaseChannelLayer, options: dict) -> None:
+        elapsed: float = async_to_sync(self.run)(
+            layer, options["messages"], options["receivers"]
+        )
+        async_to_sync(layer.close)()
+
+        deliveries: int = options["messages"] * options["receivers"]
+        self.stdout.write(
+            f"{name}: {deliveries} deliveries in {elapsed:.2f} s, "
+            f"{deliveries / elapsed:.0f} per second"
+        )
+
+    async def run(
+        self, layer: BaseChannelLayer, message_count: int, receiver_count: int
+    ) -> float:
+        channels: list[str] = [await layer.new_channel() for _ in range(receiver_count)]
+        for channel in channels:
+            await layer.group_add("benchmark", channel)
+
+        async def receive_all(channel: str) -> None:
+            for _ in range(message_count):
+                await layer.receive(channel)
+
+        start: float = time.perf_counter()
+        receivers: asyncio.Future = asyncio.gather(*map(receive_all, channels))
+        for index in range(message_count):
+            await layer.group_send(
+                "benchmark", {"type": "case_message", "content": index}
+            )
+        await receivers
+        return time.perf_counter() - start
+
+
+def wait_for_messages(path: str) -> None:
+    """Waits on a channel of a SQLite layer that is never sent anything."""
+    layer = SQLiteChannelLayer(path)
+
+    async def receive() -> None:
+        await layer.receive(await layer.new_channel())
+
+    async_to_sync(receive)()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from eap_api.model_utils import find_case_permission_errors, refresh_case_permissions
+from eap_api.models import AssuranceCase
+
+
+class Command(BaseCommand):
+    help = "Check the case permission index against case owners and groups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rebuild the index of every case if it is inconsistent",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        errors: list[str] = find_case_permission_errors()
+        if not errors:
+            self.stdout.write(
+                self.style.SUCCESS("Case permission index is consistent.")
+            )
+            return
+
+        for error in errors:
+            self.stdout.write(self.style.WARNING(error))
+
+        if not options["fix"]:
+            error_message: str = (
+                f"Found {len(errors)} inconsistencies in the case permission index."
+            )
+            raise CommandError(error_message)
+
+        refresh_case_permissions(AssuranceCase.objects.values_list("pk", flat=True))
+        self.stdout.write(
+            self.style.SUCCESS(f"Fixed {len(errors)} case permission index entries.")
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from eap_api.model_utils import compact_case_changes
+
+
+class Command(BaseCommand):
+    help = "Remove old entries from the change journal of every assurance case"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=1000,
+            help="Number of latest revisions of each case to keep changes for",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        deleted_count: int = compact_case_changes(options["keep"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Removed {deleted_count} case change journal entries.")
+        )
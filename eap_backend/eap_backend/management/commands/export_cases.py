@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from eap_api.case_export import CaseTreeExporter
+from eap_api.models import AssuranceCase
+
+
+class Command(BaseCommand):
+    help = "Export assurance cases in the format of the examples directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write, or - for standard output")
+        parser.add_argument(
+            "--format",
+            choices=["ndjson", "zip"],
+            default="ndjson",
+            help="One case per line of JSON, or a zip archive with a file per case",
+        )
+        parser.add_argument(
+            "--case-id",
+            type=int,
+            action="append",
+            dest="case_ids",
+            help="Only export this case, can be repeated (default: all cases)",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        case_ids = options["case_ids"] or AssuranceCase.objects.order_by(
+            "pk"
+        ).values_list("pk", flat=True)
+        write = (
+            CaseTreeExporter.write_zip
+            if options["format"] == "zip"
+            else CaseTreeExporter.write_ndjson
+        )
+
+        if options["output"] == "-":
+            write(case_ids, sys.stdout.buffer)
+            return
+
+        with Path(options["output"]).open("wb") as output:
+            case_count: int = write(case_ids, output)
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {case_count} cases to {options['output']}.")
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from eap_api.model_utils import rebuild_property_claim_closure
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ancestor/descendant index of property claims"
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        link_count: int = rebuild_property_claim_closure()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Property claim index rebuilt with {link_count} links.")
+        )
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from eap_api.jobs import (
+    JobHeartbeat,
+    claim_next_job,
+    fail_expired_jobs,
+    finish_case_job,
+    requeue_case_job,
+    run_case_job,
+)
+from eap_api.models import CaseJob
+
+
+class Command(BaseCommand):
+    help = "Run the queued import, export and renumbering jobs of assurance cases"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of jobs to run at once, or 0 to run them in this process",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when no job is pending, instead of waiting for new ones",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before looking for new jobs when none is pending",
+        )
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        worker: str = f"{socket.gethostname()}:{os.getpid()}"
+        with JobHeartbeat() as heartbeat:
+            if options["processes"] < 1:
+                self.run_inline(
+                    worker, heartbeat, options["once"], options["poll_interval"]
+                )
+            else:
+                self.run_in_pool(
+                    worker,
+                    heartbeat,
+                    options["processes"],
+                    options["once"],
+                    options["poll_interval"],
+                )
+
+    def run_inline(
+        self, worker: str, heartbeat: JobHeartbeat, once: bool, poll_interval: float
+    ) -> None:
+        while True:
+            self.fail_expired_jobs()
+            job_id: int | None = claim_next_job(worker)
+            if job_id is not None:
+                heartbeat.job_ids.add(job_id)
+                run_case_job(job_id)
+                heartbeat.job_ids.discard(job_id)
+                self.report(job_id)
+            elif once:
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def run_in_pool(
+        self,
+        worker: str,
+        heartbeat: JobHeartbeat,
+        processes: int,
+        once: bool,
+        poll_interval: float,
+    ) -> None:
+        running: dict[Future, int] = {}
+        executor: ProcessPoolExecutor = self.start_pool(processes)
+        try:
+            while True:
+                self.fail_expired_jobs()
+                while len(running) < processes:
+                    job_id: int | None = claim_next_job(worker)
+                    if job_id is None:
+                        break
+                    try:
+                        future: Future = executor.submit(run_case_job, job_id)
+                    except BrokenProcessPool:
+                        # A process died, and the pool cannot run anything else.
+                        requeue_case_job(job_id, worker)
+                        executor.shutdown(wait=False)
+                        executor = self.start_pool(processes)
+                        continue
+                    running[future] = job_id
+                    heartbeat.job_ids.add(job_id)
+
+                if not running:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, poll_interval, FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    heartbeat.job_ids.discard(job_id)
+                    error: BaseException | None = future.exception()
+                    if error is not None:
+                        # The process running the job died before saving its outcome.
+                        job: CaseJob = CaseJob.objects.get(pk=job_id)
+                        finish_case_job(
+                            job, CaseJob.Status.FAILED, {"error_message": str(error)}
+                        )
+                    self.report(job_id)
+        finally:
+            executor.shutdown()
+
+    @staticmethod
+    def start_pool(processes: int) -> ProcessPoolExecutor:
+        # Processes are spawned rather than forked, as the heartbeat thread may hold
+        # locks or a database connection, and set up Django themselves.
+        return ProcessPoolExecutor(
+            processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    def fail_expired_jobs(self) -> None:
+        # Jobs left running by workers that died, here or on another host.
+        for job_id in fail_expired_jobs():
+            self.report(job_id)
+
+    def report(self, job_id: int) -> None:
+        job: CaseJob = CaseJob.objects.get(pk=job_id)
+        message: str = f"{job.kind} job {job.pk} {job.status}."
+        if job.status == CaseJob.Status.SUCCEEDED:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(self.style.ERROR(message))
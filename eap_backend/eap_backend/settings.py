@@ -173,6 +173,38 @@ else:
         }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Serialized case trees are cached per (case, revision), for a day by default. The
+# local-memory backend evicts the least recently used entries once MAX_ENTRIES is
+# reached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "case_trees": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "case_trees",
+        "TIMEOUT": int(os.environ.get("CASE_TREE_CACHE_TIMEOUT", "86400")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("CASE_TREE_CACHE_MAX_ENTRIES", "200")),
+        },
+    },
+}
+
+
+# Largest JSON body accepted when creating a case, which is read as a stream, in
+# bytes (50 MiB by default).
+CASE_UPLOAD_MAX_SIZE = int(os.environ.get("CASE_UPLOAD_MAX_SIZE", "52428800"))
+
+# Seconds a websocket connection to a case is shown to other editors without a ping.
+CASE_PRESENCE_TTL = int(os.environ.get("CASE_PRESENCE_TTL", "30"))
+
+# Seconds a case job stays running without a heartbeat from its worker, which must
+# have died by then, before it is failed.
+CASE_JOB_LEASE = int(os.environ.get("CASE_JOB_LEASE", "300"))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -236,4 +268,16 @@ ACCOUNT_UNIQUE_USERNAME = True
 
 ASGI_APPLICATION = "eap_backend.asgi.application"
 
-CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+# Websocket messages only reach the clients of the same worker process, unless the
+# workers of the host share a channel layer database.
+CHANNEL_LAYER_DATABASE = os.environ.get("CHANNEL_LAYER_DATABASE")
+CHANNEL_LAYERS = {
+    "default": (
+        {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+        if CHANNEL_LAYER_DATABASE is None
+        else {
+            "BACKEND": "eap_websockets.layers.SQLiteChannelLayer",
+            "CONFIG": {"path": CHANNEL_LAYER_DATABASE},
+        }
+    )
+}
@@ -1,67 +1,147 @@
+import asyncio
 import json
 import logging
+from functools import partial
 from typing import cast
 
-from asgiref.sync import async_to_sync
-from channels.generic.websocket import WebsocketConsumer
-from channels.layers import get_channel_layer
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth.models import AnonymousUser
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models.query import QuerySet
 from django.utils import timezone
-from eap_api.models import EAPUser
+from eap_api.models import AssuranceCase, EAPUser
 from eap_api.serializers import UsernameAwareUserSerializer
+from eap_api.view_utils import get_case_permissions
 
-from .models import AssuranceCaseConnection
+from .presence import CaseConnection, presence_store
 
+# The presence store may block on its database, and is safe to use from any thread.
+in_thread = partial(sync_to_async, thread_sensitive=False)
 
-class AssuranceCaseConsumer(WebsocketConsumer):
-    def connect(self):
+
+class AssuranceCaseConsumer(AsyncWebsocketConsumer):
+    """Connects the editors of an assurance case, and sends them its changes.
+
+    Only users who can view the case may connect. Editors joining a case are sent
+    everyone connected to it, and everyone else is sent who joins or leaves after
+    that. Connections are kept in the presence store, and kept alive by the "ping"
+    messages of clients.
+    """
+
+    async def connect(self):
         self.case_id: int = int(self.scope["url_route"]["kwargs"]["case_id"])
         user: EAPUser | AnonymousUser = self.scope["user"]
         self.case_group_name: str | None = None
         self.user_data: dict = {}
 
-        if user.is_authenticated:
-            user_serializer = UsernameAwareUserSerializer(user)
-            self.user_data = cast(dict, user_serializer.data)
+        if user.is_authenticated and await self.can_view_case(user):
+            self.user_data = {
+                "id": user.pk,
+                "username": UsernameAwareUserSerializer().get_username(user),
+            }
             self.case_group_name = f"assurance_case_{self.case_id}"
 
-            async_to_sync(self.channel_layer.group_add)(  # type: ignore  # noqa: PGH003
-                self.case_group_name, self.channel_name
-            )
-
-            self.persist_connection()
-            self.accept()
-            async_to_sync(self.channel_layer.group_send)(  # type: ignore  # noqa: PGH003
-                self.case_group_name,
-                self.get_connections_message(),
-            )
+            await self.join_case()
+            await self.accept()
+            await self.send_connections()
         else:
-            self.close()
+            await self.close()
+
+    @database_sync_to_async
+    def can_view_case(self, user: EAPUser) -> bool:
+        # Connected users are sent the content of every change to the case.
+        try:
+            return get_case_permissions(self.case_id, user) is not None
+        except AssuranceCase.DoesNotExist:
+            return False
+
+    async def send_connections(self) -> None:
+        connections: list[CaseConnection] = await in_thread(
+            presence_store.get_connections
+        )(self.case_group_name)
+        await self.case_message(
+            {
+                "type": "case_message",
+                "content": {
+                    "current_connections": [
+                        connection.to_message() for connection in connections
+                    ]
+                },
+                "datetime": timezone.now().isoformat(),
+            }
+        )
+
+    async def send_presence(self, action: str, connection: CaseConnection) -> None:
+        await self.channel_layer.group_send(
+            self.case_group_name,
+            {
+                "type": "case_message",
+                "content": {
+                    "presence": {
+                        "action": action,
+                        "connection": connection.to_message(),
+                    }
+                },
+                "datetime": timezone.now().isoformat(),
+            },
+        )
+
+    async def join_case(self) -> None:
+        case_group_name: str = cast(str, self.case_group_name)
+        expired_connections: list[CaseConnection] = await in_thread(
+            presence_store.expire
+        )(case_group_name)
+        connection, replaced_connections = await in_thread(presence_store.join)(
+            case_group_name, self.channel_name, self.user_data
+        )
 
-    def get_connections_message(self) -> dict:
-        return {
-            "type": "case_message",
-            "content": {"current_connections": self.get_current_connections()},
-            "datetime": timezone.now().isoformat(),
-        }
+        await asyncio.gather(
+            self.channel_layer.group_add(case_group_name, self.channel_name),
+            *(
+                self.channel_layer.group_discard(
+                    case_group_name, other_connection.channel_name
+                )
+                for other_connection in [*expired_connections, *replaced_connections]
+            ),
+        )
+        for expired_connection in expired_connections:
+            await self.send_presence("leave", expired_connection)
+        await self.send_presence("join", connection)
+
+    async def keep_alive(self) -> None:
+        case_group_name: str = cast(str, self.case_group_name)
+        if not await in_thread(presence_store.heartbeat)(
+            case_group_name, self.channel_name
+        ):
+            # Expired while the client was unreachable.
+            await self.join_case()
+            await self.send_connections()
+            return
+
+        expired_connections: list[CaseConnection] = await in_thread(
+            presence_store.expire
+        )(case_group_name)
+        for connection in expired_connections:
+            await self.channel_layer.group_discard(
+                case_group_name, connection.channel_name
+            )
+            await self.send_presence("leave", connection)
 
-    def disconnect(self, code):
+    async def disconnect(self, code):
 
         if self.case_group_name is not None:
-            async_to_sync(self.channel_layer.group_discard)(  # type: ignore  # noqa: PGH003
+            await self.channel_layer.group_discard(
                 self.case_group_name, self.channel_name
             )
-            self.remove_connection()
-
-            async_to_sync(self.channel_layer.group_send)(  # type: ignore  # noqa: PGH003
-                self.case_group_name,
-                self.get_connections_message(),
+            connection: CaseConnection | None = await in_thread(presence_store.leave)(
+                self.case_group_name, self.channel_name
             )
-        return super().disconnect(code)
+            if connection is not None:
+                await self.send_presence("leave", connection)
+        return await super().disconnect(code)
 
-    def receive(self, text_data=None, _=None):
+    async def receive(self, text_data=None, _=None):
 
         message_content: str = ""
         is_ping_message: bool = False
@@ -76,8 +156,10 @@ class AssuranceCaseConsumer(WebsocketConsumer):
             )
             message_content = f"ERROR: Could not parse JSON message: `{text_data}`"
 
-        if self.user_data is not None and not is_ping_message:
-            async_to_sync(self.channel_layer.group_send)(  # type: ignore  # noqa: PGH003
+        if is_ping_message and self.case_group_name is not None:
+            await self.keep_alive()
+        elif self.user_data is not None and not is_ping_message:
+            await self.channel_layer.group_send(
                 self.case_group_name,
                 {
                     "type": "case_message",
@@ -88,66 +170,5 @@ class AssuranceCaseConsumer(WebsocketConsumer):
                 },
             )
 
-    def case_message(self, event: dict):
-        self.send(text_data=json.dumps(event, cls=DjangoJSONEncoder))
-
-    def remove_connection(self) -> None:
-
-        try:
-            connection = AssuranceCaseConnection.objects.get(
-                user=EAPUser.objects.get(pk=self.user_data["id"]),
-                case_group_name=self.case_group_name,
-                channel_name=self.channel_name,
-            )
-            connection.delete()
-        except (AssuranceCaseConnection.DoesNotExist, TypeError) as error:
-            logging.warning(
-                "Error on remove: Could locate connection. Context: %s",
-                {
-                    "user": self.user_data,
-                    "case_group_name": self.case_group_name,
-                    "channel_name": self.channel_name,
-                    "error": error,
-                },
-            )
-
-    def get_current_connections(self) -> list[dict]:
-        current_connections: QuerySet[AssuranceCaseConnection] = (
-            AssuranceCaseConnection.objects.filter(case_group_name=self.case_group_name)
-        )
-
-        return [
-            {
-                "user": {
-                    "username": UsernameAwareUserSerializer(connection.user).data[
-                        "username"
-                    ],  # type: ignore  # noqa: PGH003
-                    "id": connection.user.pk,
-                },
-                "connection_date": connection.connection_date,
-            }
-            for connection in current_connections
-        ]
-
-    def persist_connection(self) -> None:
-        user_model: EAPUser = EAPUser.objects.get(pk=self.user_data["id"])
-
-        user_connections: QuerySet[
-            AssuranceCaseConnection
-        ] = AssuranceCaseConnection.objects.filter(
-            user=user_model, case_group_name=self.case_group_name  # type: ignore  # noqa: PGH003
-        )
-
-        channel_layer = get_channel_layer()
-        for user_connection in user_connections:
-            async_to_sync(channel_layer.group_discard)(  # type: ignore  # noqa: PGH003
-                self.case_group_name, user_connection.channel_name
-            )
-
-            user_connection.delete()
-
-        AssuranceCaseConnection.objects.create(
-            user=user_model,
-            case_group_name=self.case_group_name,
-            channel_name=self.channel_name,
-        )
+    async def case_message(self, event: dict):
+        await self.send(text_data=json.dumps(event, cls=DjangoJSONEncoder))
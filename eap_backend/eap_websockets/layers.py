@@ -0,0 +1,402 @@
+"""A channel layer shared by the processes of one host through a SQLite database.
+
+The in-memory channel layer only reaches the consumers of its own process, so it
+limits the server to one worker. This layer keeps messages and group memberships in a
+SQLite database in WAL mode instead, which the workers of a host share without a
+separate broker.
+
+Receivers poll the database. The consumers of a process share one poll, which reads
+the messages of all of them at once. Polls only read, and skip even that while nothing
+was written since the last one, so idle workers do not compete for the write lock. Messages are stored as JSON, with dates and times
+as ISO strings.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import string
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.core.serializers.json import DjangoJSONEncoder
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    process TEXT,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel
+    ON channel_messages (channel, expires);
+CREATE INDEX IF NOT EXISTS channel_messages_process ON channel_messages (process);
+CREATE INDEX IF NOT EXISTS channel_messages_expires ON channel_messages (expires);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+CREATE INDEX IF NOT EXISTS channel_groups_expires ON channel_groups (expires);
+"""
+
+
+def connect_database(path: str) -> sqlite3.Connection:
+    """Opens a database shared by the workers of the host, in autocommit mode.
+
+    Transactions are started explicitly, with BEGIN IMMEDIATE when they write.
+    """
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+# A message read for a consumer of this process, with its expiry.
+BufferedMessage = tuple[float, dict]
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """Channel layer for the processes of one host, sharing a SQLite database.
+
+    Args:
+        path: The database file, created if needed.
+        expiry: Seconds before an unread message is dropped. The consumer it was for
+            is then removed from its groups, as its process is likely gone.
+        group_expiry: Seconds before a channel is removed from a group it was added to.
+        capacity: Most unread messages a channel can hold. Sending more raises
+            ChannelFull, and group messages to full channels are dropped.
+        poll_interval: Seconds between reads of the messages of a process.
+    """
+
+    extensions: list[str] = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path: str,
+        expiry: int = 60,
+        group_expiry: int = 86400,
+        capacity: int = 100,
+        channel_capacity: Optional[dict] = None,
+        poll_interval: float = 0.01,
+    ):
+        super().__init__(expiry=expiry, capacity=capacity)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.path: str = path
+        self.group_expiry: int = group_expiry
+        self.poll_interval: float = poll_interval
+        self._pid: Optional[int] = None
+
+    def _start(self) -> None:
+        # Processes forked with the layer need their own connection and channels.
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        self.client_prefix: str = "".join(
+            random.choice(string.ascii_letters) for _ in range(12)
+        )
+        # SQLite connections belong to the thread that opened them.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._buffers: dict[str, deque[BufferedMessage]] = {}
+        self._next_polls: dict[str, float] = {}
+        # The database changes seen by the last poll of each channel or process, as
+        # the data version, which only counts the commits of other connections, and
+        # the number of messages this process sent.
+        self._seen_changes: dict[str, tuple[int, int]] = {}
+        self._sent_count: int = 0
+        self._next_cleanup: float = 0.0
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        self._start()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = connect_database(self.path)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def _get_process(self, channel: str) -> Optional[str]:
+        # Specific channels are named <prefix>.<client prefix>!<id>.
+        if "!" not in channel:
+            return None
+        return channel[: channel.index("!")].rsplit(".", 1)[-1]
+
+    # Channel layer API
+
+    async def send(self, channel: str, message: dict) -> None:
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+
+        if not await self._run(
+            self._send, channel, json.dumps(message, cls=DjangoJSONEncoder)
+        ):
+            raise ChannelFull(channel)
+
+    def _send(self, channel: str, body: str) -> bool:
+        connection: sqlite3.Connection = self._connect()
+        now: float = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            (message_count,) = connection.execute(
+                """
+                SELECT COUNT(*) FROM channel_messages
+                WHERE channel = ? AND expires > ?
+                """,
+                [channel, now],
+            ).fetchone()
+            if message_count >= self.get_capacity(channel):
+                return False
+
+            connection.execute(
+                """
+                INSERT INTO channel_messages (channel, process, expires, body)
+                VALUES (?, ?, ?, ?)
+                """,
+                [channel, self._get_process(channel), now + self.expiry, body],
+            )
+        self._sent_count += 1
+        return True
+
+    async def receive(self, channel: str) -> dict:
+        """Waits for the next message on a channel.
+
+        Messages to the specific channels of this process are read together, and
+        kept for their receivers.
+        """
+        assert self.valid_channel_name(channel)
+        self._start()
+        process: Optional[str] = self._get_process(channel)
+        poll_key: str = channel if process is None else f"{process}!"
+
+        while True:
+            message: Optional[dict] = self._pop_buffered(channel)
+            if message is not None:
+                return message
+
+            now: float = time.monotonic()
+            if now >= self._next_polls.get(poll_key, 0.0):
+                self._next_polls[poll_key] = now + self.poll_interval
+                # Messages read for other receivers must be kept if this one is
+                # cancelled meanwhile.
+                await asyncio.shield(self._poll(channel, process, poll_key))
+                if channel in self._buffers:
+                    continue
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self, channel: str, process: Optional[str], poll_key: str) -> None:
+        now: float = time.monotonic()
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + min(self.expiry, 1)
+            await self._run(self._clean_expired)
+            # Including messages kept for consumers that stopped receiving.
+            for buffered_channel in list(self._buffers):
+                self._pop_buffered(buffered_channel, keep=True)
+
+        for message_channel, expires, body in await self._run(
+            self._read_messages, channel, process, poll_key
+        ):
+            self._buffers.setdefault(message_channel, deque()).append(
+                (expires, json.loads(body))
+            )
+
+    def _pop_buffered(self, channel: str, keep: bool = False) -> Optional[dict]:
+        """Returns the next unexpired message kept for a channel, dropping expired ones.
+
+        With keep, the message is left for the receiver.
+        """
+        buffer: Optional[deque[BufferedMessage]] = self._buffers.get(channel)
+        while buffer:
+            expires, message = buffer[0]
+            if expires > time.time():
+                if not keep:
+                    buffer.popleft()
+                return message
+            buffer.popleft()
+        self._buffers.pop(channel, None)
+        return None
+
+    def _read_messages(
+        self, channel: str, process: Optional[str], poll_key: str
+    ) -> list[tuple[str, float, str]]:
+        connection: sqlite3.Connection = self._connect()
+        (data_version,) = connection.execute("PRAGMA data_version").fetchone()
+        changes: tuple[int, int] = (data_version, self._sent_count)
+        if self._seen_changes.get(poll_key) == changes:
+            return []
+
+        # Messages are read without a transaction, which would take the write lock.
+        if process is None:
+            rows: list[tuple[int, str, float, str]] = connection.execute(
+                """
+                SELECT id, channel, expires, body FROM channel_messages
+                WHERE channel = ? AND expires > ? ORDER BY id LIMIT 1
+                """,
+                [channel, time.time()],
+            ).fetchall()
+            if rows:
+                with connection:
+                    connection.execute("BEGIN IMMEDIATE")
+                    deleted_count: int = connection.execute(
+                        "DELETE FROM channel_messages WHERE id = ?", [rows[0][0]]
+                    ).rowcount
+                # Unless another process received it first.
+                if deleted_count == 0:
+                    rows = []
+                # More messages may be waiting.
+                return [(rows[0][1], rows[0][2], rows[0][3])] if rows else []
+        else:
+            rows = connection.execute(
+                """
+                SELECT id, channel, expires, body FROM channel_messages
+                WHERE process = ? AND expires > ? ORDER BY id
+                """,
+                [process, time.time()],
+            ).fetchall()
+            if rows:
+                # Only this process reads the messages of its channels.
+                with connection:
+                    connection.execute("BEGIN IMMEDIATE")
+                    connection.execute(
+                        "DELETE FROM channel_messages WHERE process = ? AND id <= ?",
+                        [process, rows[-1][0]],
+                    )
+
+        self._seen_changes[poll_key] = changes
+        return [
+            (message_channel, expires, body)
+            for _, message_channel, expires, body in rows
+        ]
+
+    def _clean_expired(self) -> None:
+        connection: sqlite3.Connection = self._connect()
+        now: float = time.time()
+        (has_expired,) = connection.execute(
+            """
+            SELECT EXISTS (SELECT 1 FROM channel_messages WHERE expires <= ?)
+            OR EXISTS (SELECT 1 FROM channel_groups WHERE expires <= ?)
+            """,
+            [now, now],
+        ).fetchone()
+        if not has_expired:
+            return
+
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Channels with unread expired messages have likely lost their consumer.
+            connection.execute(
+                """
+                DELETE FROM channel_groups WHERE expires <= ? OR channel IN (
+                    SELECT channel FROM channel_messages WHERE expires <= ?
+                )
+                """,
+                [now, now],
+            )
+            connection.execute("DELETE FROM channel_messages WHERE expires <= ?", [now])
+
+    async def new_channel(self, prefix: str = "specific.") -> str:
+        self._start()
+        return "{}.{}!{}".format(
+            prefix,
+            self.client_prefix,
+            "".join(random.choice(string.ascii_letters) for _ in range(12)),
+        )
+
+    # Flush extension
+
+    async def flush(self) -> None:
+        await self._run(self._flush)
+        self._buffers.clear()
+
+    def _flush(self) -> None:
+        connection: sqlite3.Connection = self._connect()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM channel_messages")
+            connection.execute("DELETE FROM channel_groups")
+
+    async def close(self) -> None:
+        if self._pid == os.getpid() and self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+    # Groups extension
+
+    async def group_add(self, group: str, channel: str) -> None:
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+
+        await self._run(
+            self._execute,
+            """
+            INSERT INTO channel_groups (group_name, channel, expires) VALUES (?, ?, ?)
+            ON CONFLICT (group_name, channel) DO UPDATE SET expires = excluded.expires
+            """,
+            [group, channel, time.time() + self.group_expiry],
+        )
+
+    async def group_discard(self, group: str, channel: str) -> None:
+        assert self.valid_channel_name(channel), "Invalid channel name"
+        assert self.valid_group_name(group), "Invalid group name"
+
+        await self._run(
+            self._execute,
+            "DELETE FROM channel_groups WHERE group_name = ? AND channel = ?",
+            [group, channel],
+        )
+
+    def _execute(self, sql: str, parameters: list) -> None:
+        connection: sqlite3.Connection = self._connect()
+        with connection:
+            connection.execute(sql, parameters)
+
+    async def group_send(self, group: str, message: dict) -> None:
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Invalid group name"
+
+        await self._run(
+            self._group_send, group, json.dumps(message, cls=DjangoJSONEncoder)
+        )
+
+    def _group_send(self, group: str, body: str) -> None:
+        connection: sqlite3.Connection = self._connect()
+        now: float = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            channels: list[tuple[str, int]] = connection.execute(
+                """
+                SELECT channel_groups.channel, (
+                    SELECT COUNT(*) FROM channel_messages
+                    WHERE channel_messages.channel = channel_groups.channel
+                    AND channel_messages.expires > ?
+                )
+                FROM channel_groups WHERE group_name = ? AND expires > ?
+                """,
+                [now, group, now],
+            ).fetchall()
+            # Full channels miss the message, as with the other channel layers.
+            connection.executemany(
+                """
+                INSERT INTO channel_messages (channel, process, expires, body)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (channel, self._get_process(channel), now + self.expiry, body)
+                    for channel, message_count in channels
+                    if message_count < self.get_capacity(channel)
+                ],
+            )
+        self._sent_count += 1
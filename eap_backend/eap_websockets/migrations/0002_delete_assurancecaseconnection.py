@@ -0,0 +1,16 @@
+# Generated by Django 3.2.8 on 2026-10-18 21:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("eap_websockets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="AssuranceCaseConnection",
+        ),
+    ]
@@ -0,0 +1,314 @@
+"""Who is connected to each assurance case.
+
+Connections are kept alive by the "ping" messages their clients send, and expire when
+none arrived within settings.CASE_PRESENCE_TTL seconds, as happens to clients that
+were lost without disconnecting. Like the in-memory channel layer, the default store
+only knows about the connections to its process. With the SQLite channel layer, they
+are kept in its database instead, so every worker knows them all, and those of a
+worker that died expire like the others.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Union
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .layers import connect_database
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS case_connections (
+    case_group_name TEXT NOT NULL,
+    channel_name TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    connection_date TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (case_group_name, channel_name)
+);
+"""
+
+
+class CaseConnection:
+    """A connection of a user to a case, with the user data shown to other editors."""
+
+    def __init__(
+        self,
+        channel_name: str,
+        user: dict,
+        expires_at: float,
+        connection_date: Optional[datetime] = None,
+    ):
+        self.channel_name: str = channel_name
+        self.user: dict = user
+        self.connection_date: datetime = connection_date or timezone.now()
+        self.expires_at: float = expires_at
+
+    def to_message(self) -> dict:
+        return {"user": self.user, "connection_date": self.connection_date}
+
+
+class PresenceStore:
+    def __init__(self, ttl: float):
+        self.ttl: float = ttl
+        # Connections by case group name, then by channel name.
+        self._connections: dict[str, dict[str, CaseConnection]] = {}
+        # When each case may next have an expired connection, to skip looking before.
+        self._next_expiry: dict[str, float] = {}
+        # HTTP requests check for connections from other threads.
+        self._lock = threading.Lock()
+
+    def join(
+        self, case_group_name: str, channel_name: str, user: dict
+    ) -> tuple[CaseConnection, list[CaseConnection]]:
+        """Records a connection, replacing earlier ones of the same user to the case.
+
+        Args:
+            user: The id and username of the user.
+
+        Returns:
+            The new connection, and the ones it replaced.
+        """
+        with self._lock:
+            connections: dict[str, CaseConnection] = self._connections.setdefault(
+                case_group_name, {}
+            )
+            replaced_connections: list[CaseConnection] = [
+                connection
+                for connection in connections.values()
+                if connection.user["id"] == user["id"]
+            ]
+            for connection in replaced_connections:
+                del connections[connection.channel_name]
+
+            connection = CaseConnection(channel_name, user, time.monotonic() + self.ttl)
+            connections[channel_name] = connection
+            self._next_expiry.setdefault(case_group_name, connection.expires_at)
+            return connection, replaced_connections
+
+    def heartbeat(self, case_group_name: str, channel_name: str) -> bool:
+        """Keeps a connection alive, returning False if it is no longer recorded."""
+        with self._lock:
+            connection: Optional[CaseConnection] = self._connections.get(
+                case_group_name, {}
+            ).get(channel_name)
+            if connection is None:
+                return False
+
+            connection.expires_at = time.monotonic() + self.ttl
+            return True
+
+    def leave(
+        self, case_group_name: str, channel_name: str
+    ) -> Optional[CaseConnection]:
+        """Removes a connection, returning it unless it was replaced or expired."""
+        with self._lock:
+            connections: dict[str, CaseConnection] = self._connections.get(
+                case_group_name, {}
+            )
+            connection: Optional[CaseConnection] = connections.pop(channel_name, None)
+            if not connections:
+                self._connections.pop(case_group_name, None)
+                self._next_expiry.pop(case_group_name, None)
+            return connection
+
+    def expire(self, case_group_name: str) -> list[CaseConnection]:
+        """Removes and returns the connections to a case without a recent heartbeat."""
+        now: float = time.monotonic()
+        with self._lock:
+            if now < self._next_expiry.get(case_group_name, now):
+                return []
+
+            connections: dict[str, CaseConnection] = self._connections.get(
+                case_group_name, {}
+            )
+            expired_connections: list[CaseConnection] = [
+                connection
+                for connection in connections.values()
+                if connection.expires_at <= now
+            ]
+            for connection in expired_connections:
+                del connections[connection.channel_name]
+            if connections:
+                # Heartbeats only push expiries back, so none comes sooner.
+                self._next_expiry[case_group_name] = min(
+                    connection.expires_at for connection in connections.values()
+                )
+            else:
+                self._connections.pop(case_group_name, None)
+                self._next_expiry.pop(case_group_name, None)
+            return expired_connections
+
+    def get_connections(self, case_group_name: str) -> list[CaseConnection]:
+        now: float = time.monotonic()
+        with self._lock:
+            return [
+                connection
+                for connection in self._connections.get(case_group_name, {}).values()
+                if connection.expires_at > now
+            ]
+
+    def has_connections(self, case_group_name: str) -> bool:
+        return bool(self.get_connections(case_group_name))
+
+
+class SQLitePresenceStore:
+    """A presence store shared by the workers of a host, in a SQLite database.
+
+    It has the methods of PresenceStore, which block on the database. Heartbeats only
+    write when half of the time to live of a connection has passed.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path: str = path
+        self.ttl: float = ttl
+        # SQLite connections belong to the thread that opened them.
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Forked processes must not share the connections of their parent.
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.connection = connect_database(self.path)
+            self._local.connection.executescript(SCHEMA)
+        return self._local.connection
+
+    def _select(
+        self, connection: sqlite3.Connection, where: str, parameters: list
+    ) -> list[CaseConnection]:
+        return [
+            CaseConnection(
+                channel_name,
+                json.loads(user),
+                expires,
+                datetime.fromisoformat(connection_date),
+            )
+            for channel_name, user, connection_date, expires in connection.execute(
+                f"""
+                SELECT channel_name, user, connection_date, expires
+                FROM case_connections WHERE {where} ORDER BY connection_date
+                """,
+                parameters,
+            )
+        ]
+
+    def join(
+        self, case_group_name: str, channel_name: str, user: dict
+    ) -> tuple[CaseConnection, list[CaseConnection]]:
+        connection: sqlite3.Connection = self._connect()
+        case_connection = CaseConnection(channel_name, user, time.time() + self.ttl)
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            replaced_connections: list[CaseConnection] = self._select(
+                connection,
+                "case_group_name = ? AND user_id = ?",
+                [case_group_name, user["id"]],
+            )
+            connection.execute(
+                "DELETE FROM case_connections WHERE case_group_name = ? AND user_id = ?",
+                [case_group_name, user["id"]],
+            )
+            connection.execute(
+                """
+                INSERT INTO case_connections (
+                    case_group_name, channel_name, user_id, user, connection_date,
+                    expires
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    case_group_name,
+                    channel_name,
+                    user["id"],
+                    json.dumps(user, cls=DjangoJSONEncoder),
+                    case_connection.connection_date.isoformat(),
+                    case_connection.expires_at,
+                ],
+            )
+        return case_connection, replaced_connections
+
+    def heartbeat(self, case_group_name: str, channel_name: str) -> bool:
+        connection: sqlite3.Connection = self._connect()
+        row: Optional[tuple[float]] = connection.execute(
+            """
+            SELECT expires FROM case_connections
+            WHERE case_group_name = ? AND channel_name = ?
+            """,
+            [case_group_name, channel_name],
+        ).fetchone()
+        if row is None:
+            return False
+
+        now: float = time.time()
+        if row[0] - now < self.ttl / 2:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                updated_count: int = connection.execute(
+                    """
+                    UPDATE case_connections SET expires = ?
+                    WHERE case_group_name = ? AND channel_name = ?
+                    """,
+                    [now + self.ttl, case_group_name, channel_name],
+                ).rowcount
+            return updated_count > 0
+        return True
+
+    def leave(
+        self, case_group_name: str, channel_name: str
+    ) -> Optional[CaseConnection]:
+        connection: sqlite3.Connection = self._connect()
+        where: str = "case_group_name = ? AND channel_name = ?"
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connections: list[CaseConnection] = self._select(
+                connection, where, [case_group_name, channel_name]
+            )
+            connection.execute(
+                f"DELETE FROM case_connections WHERE {where}",
+                [case_group_name, channel_name],
+            )
+        return connections[0] if connections else None
+
+    def expire(self, case_group_name: str) -> list[CaseConnection]:
+        connection: sqlite3.Connection = self._connect()
+        where: str = "case_group_name = ? AND expires <= ?"
+        parameters: list = [case_group_name, time.time()]
+        # Read first, as most calls find nothing to remove.
+        if not self._select(connection, where, parameters):
+            return []
+
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Only those still there, if another worker removed some meanwhile.
+            expired_connections: list[CaseConnection] = self._select(
+                connection, where, parameters
+            )
+            connection.execute(
+                f"DELETE FROM case_connections WHERE {where}",
+                parameters,
+            )
+        return expired_connections
+
+    def get_connections(self, case_group_name: str) -> list[CaseConnection]:
+        return self._select(
+            self._connect(),
+            "case_group_name = ? AND expires > ?",
+            [case_group_name, time.time()],
+        )
+
+    def has_connections(self, case_group_name: str) -> bool:
+        return bool(self.get_connections(case_group_name))
+
+
+presence_store: Union[PresenceStore, SQLitePresenceStore] = (
+    PresenceStore(settings.CASE_PRESENCE_TTL)
+    if settings.CHANNEL_LAYER_DATABASE is None
+    else SQLitePresenceStore(
+        settings.CHANNEL_LAYER_DATABASE, settings.CASE_PRESENCE_TTL
+    )
+)
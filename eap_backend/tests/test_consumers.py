@@ -0,0 +1,248 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from eap_api.models import AssuranceCase, EAPGroup, EAPUser, TopLevelNormativeGoal
+from eap_websockets.consumers import AssuranceCaseConsumer
+from eap_websockets.presence import (
+    PresenceStore,
+    SQLitePresenceStore,
+    presence_store,
+)
+
+from .constants_tests import CASE1_INFO, GOAL_INFO, USER1_INFO, USER2_INFO, USER3_INFO
+
+
+def get_user_ids(connections: list[dict]) -> list[int]:
+    return [connection["user"]["id"] for connection in connections]
+
+
+def get_presence(message: dict) -> tuple[str, int]:
+    presence: dict = message["content"]["presence"]
+    return presence["action"], presence["connection"]["user"]["id"]
+
+
+class PresenceStoreTest(TestCase):
+    def test_connections_expire_without_heartbeats(self):
+        store = PresenceStore(ttl=60)
+        user: dict = {"id": 1, "username": "user"}
+        connection, replaced_connections = store.join("case", "first", user)
+        assert replaced_connections == []
+        assert store.heartbeat("case", "first")
+
+        _, replaced_connections = store.join("case", "second", user)
+        assert replaced_connections == [connection]
+        assert store.leave("case", "first") is None
+        assert store.expire("case") == []
+
+        expiring_store = PresenceStore(ttl=0)
+        expiring_store.join("case", "second", user)
+        assert not expiring_store.has_connections("case")
+        assert [
+            connection.channel_name for connection in expiring_store.expire("case")
+        ] == ["second"]
+        assert not expiring_store.heartbeat("case", "second")
+
+
+class SQLitePresenceStoreTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: str = str(Path(directory.name) / "channels.sqlite3")
+
+    def test_workers_share_connections(self):
+        store = SQLitePresenceStore(self.path, ttl=60)
+        other_store = SQLitePresenceStore(self.path, ttl=60)
+        user: dict = {"id": 1, "username": "user"}
+        other_user: dict = {"id": 2, "username": "other"}
+
+        store.join("case", "first", user)
+        _, replaced_connections = other_store.join("case", "second", user)
+        assert [connection.channel_name for connection in replaced_connections] == [
+            "first"
+        ]
+        other_store.join("case", "third", other_user)
+        assert [
+            (connection.channel_name, connection.user)
+            for connection in store.get_connections("case")
+        ] == [("second", user), ("third", other_user)]
+        assert store.heartbeat("case", "third")
+        assert not store.heartbeat("case", "first")
+
+        assert store.leave("case", "second").user == user
+        assert other_store.leave("case", "second") is None
+        assert store.expire("case") == []
+
+    def test_connections_of_dead_workers_expire(self):
+        crashed_store = SQLitePresenceStore(self.path, ttl=0)
+        crashed_store.join("case", "first", {"id": 1, "username": "user"})
+        store = SQLitePresenceStore(self.path, ttl=60)
+
+        assert not store.has_connections("case")
+        assert [connection.channel_name for connection in store.expire("case")] == [
+            "first"
+        ]
+        assert store.expire("case") == []
+        assert not store.heartbeat("case", "first")
+
+
+class AssuranceCaseConsumerTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.outsider: EAPUser = EAPUser.objects.create(**USER3_INFO)
+        self.case: AssuranceCase = AssuranceCase.objects.create(
+            **CASE1_INFO, owner=self.user
+        )
+        group: EAPGroup = EAPGroup.objects.create(name="Editors", owner=self.user)
+        group.member.add(self.other_user)
+        self.case.edit_groups.add(group)
+
+    def get_communicator(self, user: EAPUser | AnonymousUser) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(
+            AssuranceCaseConsumer.as_asgi(), f"/ws/case/{self.case.pk}/"
+        )
+        communicator.scope["user"] = user
+        communicator.scope["url_route"] = {"kwargs": {"case_id": str(self.case.pk)}}
+        return communicator
+
+    @async_to_sync
+    async def test_joins_and_leaves_are_announced(self):
+        communicator: WebsocketCommunicator = self.get_communicator(self.user)
+        other_communicator: WebsocketCommunicator = self.get_communicator(
+            self.other_user
+        )
+
+        connected, _ = await communicator.connect()
+        assert connected
+        message: dict = await communicator.receive_json_from()
+        assert get_user_ids(message["content"]["current_connections"]) == [self.user.pk]
+        assert get_presence(await communicator.receive_json_from()) == (
+            "join",
+            self.user.pk,
+        )
+
+        connected, _ = await other_communicator.connect()
+        assert connected
+        message = await other_communicator.receive_json_from()
+        assert get_user_ids(message["content"]["current_connections"]) == [
+            self.user.pk,
+            self.other_user.pk,
+        ]
+        for connected_communicator in (communicator, other_communicator):
+            assert get_presence(await connected_communicator.receive_json_from()) == (
+                "join",
+                self.other_user.pk,
+            )
+
+        await other_communicator.send_json_to({"content": "Hello"})
+        message = await communicator.receive_json_from()
+        assert message["content"] == "Hello"
+        assert message["id"] == self.other_user.pk
+
+        await other_communicator.send_json_to({"content": "ping"})
+        assert await communicator.receive_nothing()
+
+        await other_communicator.disconnect()
+        assert get_presence(await communicator.receive_json_from()) == (
+            "leave",
+            self.other_user.pk,
+        )
+        await communicator.disconnect()
+        assert not presence_store.has_connections(f"assurance_case_{self.case.pk}")
+
+    @async_to_sync
+    async def test_reconnecting_replaces_connection(self):
+        first_communicator: WebsocketCommunicator = self.get_communicator(self.user)
+        second_communicator: WebsocketCommunicator = self.get_communicator(self.user)
+
+        await first_communicator.connect()
+        await first_communicator.receive_json_from()
+        await first_communicator.receive_json_from()
+        await second_communicator.connect()
+        message: dict = await second_communicator.receive_json_from()
+
+        assert len(message["content"]["current_connections"]) == 1
+        assert await first_communicator.receive_nothing()
+        await first_communicator.disconnect()
+        await second_communicator.disconnect()
+
+    @async_to_sync
+    async def test_stale_connections_expire(self):
+        communicator: WebsocketCommunicator = self.get_communicator(self.user)
+        other_communicator: WebsocketCommunicator = self.get_communicator(
+            self.other_user
+        )
+        with patch.object(presence_store, "ttl", 0):
+            await communicator.connect()
+        await communicator.receive_json_from()
+        await communicator.receive_json_from()
+
+        await other_communicator.connect()
+        message: dict = await other_communicator.receive_json_from()
+        assert get_user_ids(message["content"]["current_connections"]) == [
+            self.other_user.pk
+        ]
+        assert get_presence(await other_communicator.receive_json_from()) == (
+            "leave",
+            self.user.pk,
+        )
+        assert get_presence(await other_communicator.receive_json_from()) == (
+            "join",
+            self.other_user.pk,
+        )
+        assert await communicator.receive_nothing()
+
+        await communicator.send_json_to({"content": "ping"})
+        assert get_presence(await other_communicator.receive_json_from()) == (
+            "join",
+            self.user.pk,
+        )
+        await communicator.disconnect()
+        await other_communicator.disconnect()
+
+    @async_to_sync
+    async def test_anonymous_user_is_rejected(self):
+        connected, _ = await self.get_communicator(AnonymousUser()).connect()
+
+        assert not connected
+
+    @async_to_sync
+    async def test_outsider_is_rejected(self):
+        communicator: WebsocketCommunicator = self.get_communicator(self.user)
+        await communicator.connect()
+        await communicator.receive_json_from()
+        await communicator.receive_json_from()
+
+        outsider_communicator: WebsocketCommunicator = self.get_communicator(
+            self.outsider
+        )
+        connected, _ = await outsider_communicator.connect()
+        assert not connected
+
+        await database_sync_to_async(self.save_goal)()
+        message: dict = await communicator.receive_json_from()
+        assert message["content"]["patch"]["changes"][0]["type"] == "goal"
+        assert await outsider_communicator.receive_nothing()
+        await communicator.disconnect()
+
+    def save_goal(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            TopLevelNormativeGoal.objects.create(
+                **{**GOAL_INFO, "assurance_case_id": self.case.pk}
+            )
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command("benchmark_case_connections", connections=5, stdout=output)
+
+        assert "Connections: 5" in output.getvalue()
+        assert "p99 connect latency" in output.getvalue()
+        assert list(AssuranceCase.objects.all()) == [self.case]
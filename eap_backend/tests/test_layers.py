@@ -0,0 +1,131 @@
+import asyncio
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from django.test import SimpleTestCase
+from eap_websockets.layers import SQLiteChannelLayer
+
+
+class SQLiteChannelLayerTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path: str = str(Path(directory.name) / "channels.sqlite3")
+
+    def get_layer(self, **config) -> SQLiteChannelLayer:
+        layer = SQLiteChannelLayer(self.path, poll_interval=0.001, **config)
+        self.addCleanup(async_to_sync(layer.close))
+        return layer
+
+    def count_group_channels(self) -> int:
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM channel_groups").fetchone()[
+                0
+            ]
+
+    @async_to_sync
+    async def test_group_send_reaches_other_processes(self):
+        layer: SQLiteChannelLayer = self.get_layer()
+        other_layer: SQLiteChannelLayer = self.get_layer()
+        first_channel: str = await layer.new_channel()
+        second_channel: str = await layer.new_channel()
+        other_channel: str = await other_layer.new_channel()
+        for channel_layer, channel in (
+            (layer, first_channel),
+            (layer, second_channel),
+            (other_layer, other_channel),
+        ):
+            await channel_layer.group_add("assurance_case_1", channel)
+
+        await other_layer.group_send(
+            "assurance_case_1", {"type": "case_message", "content": "Hello"}
+        )
+
+        for channel_layer, channel in (
+            (layer, first_channel),
+            (layer, second_channel),
+            (other_layer, other_channel),
+        ):
+            message: dict = await asyncio.wait_for(channel_layer.receive(channel), 1)
+            assert message == {"type": "case_message", "content": "Hello"}
+
+        await layer.group_discard("assurance_case_1", first_channel)
+        await other_layer.send(first_channel, {"type": "direct"})
+        await other_layer.group_send("assurance_case_1", {"type": "group"})
+        assert await layer.receive(first_channel) == {"type": "direct"}
+        assert await layer.receive(second_channel) == {"type": "group"}
+
+    @async_to_sync
+    async def test_named_channels(self):
+        layer: SQLiteChannelLayer = self.get_layer()
+        other_layer: SQLiteChannelLayer = self.get_layer()
+
+        await layer.send("case_jobs", {"type": "first"})
+        await layer.send("case_jobs", {"type": "second"})
+
+        assert await other_layer.receive("case_jobs") == {"type": "first"}
+        assert await layer.receive("case_jobs") == {"type": "second"}
+
+    @async_to_sync
+    async def test_capacity(self):
+        layer: SQLiteChannelLayer = self.get_layer(capacity=1)
+        channel: str = await layer.new_channel()
+        await layer.group_add("assurance_case_1", channel)
+
+        await layer.send(channel, {"type": "first"})
+        with self.assertRaises(ChannelFull):  # noqa: PT027
+            await layer.send(channel, {"type": "second"})
+        await layer.group_send("assurance_case_1", {"type": "dropped"})
+
+        assert await layer.receive(channel) == {"type": "first"}
+        await layer.send(channel, {"type": "third"})
+        assert await layer.receive(channel) == {"type": "third"}
+
+    @async_to_sync
+    async def test_expiry(self):
+        layer: SQLiteChannelLayer = self.get_layer(expiry=0)
+        channel: str = await layer.new_channel()
+        await layer.group_add("assurance_case_1", channel)
+        await layer.group_send("assurance_case_1", {"type": "expired"})
+
+        with self.assertRaises(asyncio.TimeoutError):  # noqa: PT027
+            await asyncio.wait_for(layer.receive(channel), 0.05)
+        # The channel never read its message, so it left its groups.
+        assert self.count_group_channels() == 0
+
+        group_expiring_layer: SQLiteChannelLayer = self.get_layer(group_expiry=0)
+        await group_expiring_layer.group_add("assurance_case_1", channel)
+        await group_expiring_layer.group_send("assurance_case_1", {"type": "lost"})
+        with self.assertRaises(asyncio.TimeoutError):  # noqa: PT027
+            await asyncio.wait_for(group_expiring_layer.receive(channel), 0.05)
+        assert self.count_group_channels() == 0
+
+    @async_to_sync
+    async def test_idle_polls_only_read(self):
+        layer: SQLiteChannelLayer = self.get_layer()
+        other_layer: SQLiteChannelLayer = self.get_layer()
+        channel: str = await layer.new_channel()
+        with self.assertRaises(asyncio.TimeoutError):  # noqa: PT027
+            await asyncio.wait_for(layer.receive(channel), 0.02)
+
+        statements: list[str] = []
+        await layer._run(layer._connect().set_trace_callback, statements.append)
+        with self.assertRaises(asyncio.TimeoutError):  # noqa: PT027
+            await asyncio.wait_for(layer.receive(channel), 0.05)
+
+        assert statements
+        assert not [
+            statement for statement in statements if "BEGIN" in statement.upper()
+        ]
+        # Nothing is read again until another process writes.
+        assert {statement.strip() for statement in statements} == {
+            "PRAGMA data_version"
+        }
+
+        await other_layer.send(channel, {"type": "case_message"})
+        assert await asyncio.wait_for(layer.receive(channel), 1) == {
+            "type": "case_message"
+        }
@@ -2,18 +2,43 @@
 https://www.bezkoder.com/django-rest-api/
 https://docs.djangoproject.com/en/3.2/topics/testing/tools/"""
 
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 # Create your tests here.
+from eap_api.identifiers import (
+    SiblingIdentifierUpdate,
+    UpdateIdentifierUtils,
+    _CaseItemRenamer,
+)
+from eap_api.model_utils import (
+    allocate_item_number,
+    deferring_revision_bumps,
+    get_case_property_claims,
+    get_case_revision,
+    get_descendant_property_claims,
+    get_property_claim_path,
+    traverse_child_property_claims,
+)
 from eap_api.models import (
     AssuranceCase,
+    AssuranceCaseRevision,
+    CaseChange,
+    CaseItemSequence,
     Context,
     EAPGroup,
     EAPUser,
     Evidence,
     PropertyClaim,
+    PropertyClaimClosure,
+    Strategy,
     TopLevelNormativeGoal,
 )
+from eap_api.serializers import ContextSerializer
 
 from .constants_tests import (
     CASE1_INFO,
@@ -116,6 +141,357 @@ class PropertyClaimTestCase(TestCase):
         assert isinstance(test_entry.goal.assurance_case, AssuranceCase)
 
 
+class PropertyClaimTraversalTestCase(TestCase):
+    """
+    creates a hierarchy of PropertyClaims and tests that traversal visits it
+    depth-first, in primary key order, with a single query
+    """
+
+    def setUp(self):
+        case = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        self.goal.assurance_case = case
+        self.goal.save()
+
+        self.root = PropertyClaim.objects.create(name="P1", goal=self.goal)
+        self.child_1 = PropertyClaim.objects.create(
+            name="P1.1", property_claim=self.root
+        )
+        self.child_2 = PropertyClaim.objects.create(
+            name="P1.2", property_claim=self.root
+        )
+        self.grandchild = PropertyClaim.objects.create(
+            name="P1.1.1", property_claim=self.child_1
+        )
+
+    def test_traversal_order(self):
+        visits: list[tuple[int, int, int]] = []
+
+        with CaptureQueriesContext(connection) as context:
+            traverse_child_property_claims(
+                lambda index, child, parent: visits.append(
+                    (index, child.pk, parent.pk)
+                ),
+                self.root.pk,
+            )
+
+        assert len(context.captured_queries) == 1
+        assert visits == [
+            (0, self.child_1.pk, self.root.pk),
+            (0, self.grandchild.pk, self.child_1.pk),
+            (1, self.child_2.pk, self.root.pk),
+        ]
+
+    def test_changes_visible_to_descendants(self):
+        renamed: list[str] = []
+
+        def rename(index: int, child: PropertyClaim, parent: PropertyClaim):
+            child.name = f"{parent.name}.{index + 1}"
+            renamed.append(child.name)
+
+        self.root.name = "P9"
+        self.root.save()
+        traverse_child_property_claims(rename, self.root.pk)
+
+        assert renamed == ["P9.1", "P9.1.1", "P9.2"]
+
+    def test_case_property_claims(self):
+        top_level_claim_ids, child_claim_ids = get_case_property_claims(
+            self.goal, self.goal.strategies.all()
+        )
+
+        assert top_level_claim_ids == [self.root.pk]
+        assert child_claim_ids == sorted(
+            [self.child_1.pk, self.child_2.pk, self.grandchild.pk]
+        )
+
+
+class PropertyClaimClosureTestCase(TestCase):
+    """
+    creates a hierarchy of PropertyClaims and tests that the ancestor/descendant
+    index follows it as claims are moved, deleted and re-indexed
+    """
+
+    def setUp(self):
+        AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        self.root = PropertyClaim.objects.create(name="P1", goal=self.goal)
+        self.child = PropertyClaim.objects.create(name="P1.1", property_claim=self.root)
+        self.grandchild = PropertyClaim.objects.create(
+            name="P1.1.1", property_claim=self.child
+        )
+        self.other_root = PropertyClaim.objects.create(name="P2", goal=self.goal)
+
+    def get_links(self) -> set[tuple[int, int, int]]:
+        return set(
+            PropertyClaimClosure.objects.values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        )
+
+    def test_links_on_create(self):
+        assert list(get_descendant_property_claims(self.root.pk)) == [
+            self.child,
+            self.grandchild,
+        ]
+        assert list(get_property_claim_path(self.grandchild.pk)) == [
+            self.root,
+            self.child,
+            self.grandchild,
+        ]
+
+    def test_links_on_move(self):
+        self.child.property_claim = self.other_root
+        self.child.save()
+
+        assert list(get_property_claim_path(self.grandchild.pk)) == [
+            self.other_root,
+            self.child,
+            self.grandchild,
+        ]
+        assert list(get_descendant_property_claims(self.root.pk)) == []
+
+        self.child.property_claim = None
+        self.child.save()
+        assert list(get_property_claim_path(self.grandchild.pk)) == [
+            self.child,
+            self.grandchild,
+        ]
+
+        self.grandchild.refresh_from_db()
+        assert self.grandchild.level == 2
+
+    def test_cycles_are_rejected(self):
+        self.root.goal = None
+        self.root.property_claim = self.grandchild
+        with self.assertRaises(ValueError):  # noqa: PT027
+            self.root.save()
+
+    def test_links_on_delete(self):
+        self.child.delete()
+
+        assert not PropertyClaimClosure.objects.filter(
+            descendant_id=self.grandchild.pk
+        ).exists()
+        assert list(get_descendant_property_claims(self.root.pk)) == []
+
+    def test_rebuild(self):
+        expected_links: set[tuple[int, int, int]] = self.get_links()
+        PropertyClaimClosure.objects.all().delete()
+        PropertyClaim.objects.filter(pk=self.grandchild.pk).update(level=7)
+
+        call_command("rebuild_claim_closure", stdout=StringIO())
+
+        assert self.get_links() == expected_links
+        self.grandchild.refresh_from_db()
+        assert self.grandchild.level == 3
+
+
+class CaseItemCaseIdTestCase(TestCase):
+    """
+    creates items at every level of a case and tests that they all know their case
+    """
+
+    def setUp(self):
+        self.case = AssuranceCase.objects.create(**CASE1_INFO)
+        self.other_case = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        self.strategy = Strategy.objects.create(name="S1", goal=self.goal)
+        self.claim = PropertyClaim.objects.create(name="P1", strategy=self.strategy)
+        self.child_claim = PropertyClaim.objects.create(
+            name="P1.1", property_claim=self.claim
+        )
+        self.evidence = Evidence.objects.create(name="E1")
+        self.child_claim.evidence.add(self.evidence)
+
+    def test_case_id_on_create(self):
+        for item in (self.strategy, self.claim, self.child_claim):
+            assert item.assurance_case_id == self.case.pk
+
+        self.evidence.refresh_from_db()
+        assert self.evidence.assurance_case_id == self.case.pk
+
+    def test_case_id_on_move(self):
+        other_goal = TopLevelNormativeGoal.objects.create(
+            name="G2", keywords="key", assurance_case=self.other_case
+        )
+
+        self.strategy.goal = other_goal
+        self.strategy.save()
+
+        for item in (self.claim, self.child_claim, self.evidence):
+            item.refresh_from_db()
+            assert item.assurance_case_id == self.other_case.pk
+
+
+class CaseItemSequenceTestCase(TestCase):
+    """
+    allocates item numbers from the sequence table and tests they follow the items
+    already in each group, without repeats
+    """
+
+    def setUp(self):
+        self.case = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        for name in ("C1", "C2"):
+            Context.objects.create(name=name, goal=self.goal)
+
+    def count_contexts(self) -> int:
+        return Context.objects.filter(goal_id=self.goal.pk).count()
+
+    def test_numbers_follow_existing_items(self):
+        assert (
+            allocate_item_number(self.case.pk, "C", self.goal.pk, self.count_contexts)
+            == 3
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            number: int = allocate_item_number(
+                self.case.pk, "C", self.goal.pk, self.count_contexts
+            )
+
+        assert number == 4
+        assert len(context.captured_queries) == 1
+        sequence: CaseItemSequence = CaseItemSequence.objects.get(
+            assurance_case=self.case, prefix="C", parent_id=self.goal.pk
+        )
+        assert sequence.last_number == 4
+
+    def test_groups_are_numbered_apart(self):
+        assert (
+            allocate_item_number(self.case.pk, "C", self.goal.pk, self.count_contexts)
+            == 3
+        )
+        assert allocate_item_number(self.case.pk, "S", self.goal.pk, lambda: 0) == 1
+        assert allocate_item_number(self.case.pk, "P", 0, lambda: 5) == 6
+        assert allocate_item_number(self.case.pk, "P", 0, lambda: 5) == 7
+
+    def create_context(self) -> Context:
+        serializer = ContextSerializer(
+            data={
+                "short_description": "context for The Goal",
+                "long_description": "A longer description of the context",
+                "goal_id": self.goal.pk,
+            }
+        )
+        assert serializer.is_valid(), serializer.errors
+        return serializer.save()
+
+    def test_names_through_serializer(self):
+        assert self.create_context().name == "C3"
+        assert self.create_context().name == "C4"
+
+    def test_numbers_follow_deletions(self):
+        first_context: Context = self.create_context()
+        self.create_context()
+        with SiblingIdentifierUpdate(first_context):
+            first_context.delete()
+        assert self.create_context().name == "C4"
+
+        # Deleting the last item renames nothing, but its number is given again.
+        last_context: Context = Context.objects.get(goal=self.goal, name="C4")
+        with SiblingIdentifierUpdate(last_context):
+            last_context.delete()
+        assert self.create_context().name == "C4"
+        assert list(
+            Context.objects.filter(goal=self.goal)
+            .order_by("pk")
+            .values_list("name", flat=True)
+        ) == ["C1", "C2", "C3", "C4"]
+
+    def test_numbers_allocated_while_renumbering_are_kept(self):
+        context: Context = self.create_context()
+        context.delete()
+        renamer = _CaseItemRenamer()
+        UpdateIdentifierUtils.number_group(("contexts", self.goal.pk), renamer)
+
+        # An item is created after its group was read, but before it was renumbered.
+        assert (
+            allocate_item_number(self.case.pk, "C", self.goal.pk, self.count_contexts)
+            == 4
+        )
+        renamer.save()
+        sequence: CaseItemSequence = CaseItemSequence.objects.get(
+            assurance_case=self.case, prefix="C", parent_id=self.goal.pk
+        )
+        assert sequence.last_number == 4
+
+
+class CaseChangeTestCase(TestCase):
+    """
+    records changes to a case and its items in its journal, and tests they are
+    sequenced by the revision of the case
+    """
+
+    def setUp(self):
+        self.case = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        self.claim = PropertyClaim.objects.create(name="P1", goal=self.goal)
+
+    def get_changes(self, since: int) -> list[tuple[int, str, str, int]]:
+        return list(
+            CaseChange.objects.filter(assurance_case=self.case, sequence__gt=since)
+            .order_by("sequence", "pk")
+            .values_list("sequence", "action", "item_type", "item_id")
+        )
+
+    def test_changes_are_journaled(self):
+        revision: int = get_case_revision(self.case.pk)
+        context = Context.objects.create(name="C1", goal=self.goal)
+        context_id: int = context.pk
+        context.in_sandbox = True
+        context.save()
+        evidence = Evidence.objects.create(name="E1")
+        evidence.property_claim.add(self.claim)
+        context.delete()
+        self.case.name = "Renamed"
+        self.case.save()
+
+        assert self.get_changes(revision) == [
+            (revision + 1, "create", "context", context_id),
+            (revision + 2, "detach", "context", context_id),
+            (revision + 3, "attach", "evidence", evidence.pk),
+            (revision + 4, "delete", "context", context_id),
+            (revision + 5, "update", "assurance_case", self.case.pk),
+        ]
+
+    def test_deferred_changes_share_a_revision(self):
+        revision: int = get_case_revision(self.case.pk)
+        with deferring_revision_bumps():
+            context = Context.objects.create(name="C1", goal=self.goal)
+            context.short_description = "Changed"
+            context.save()
+            self.claim.name = "P2"
+            self.claim.save()
+
+        assert self.get_changes(revision) == [
+            (revision + 1, "create", "context", context.pk),
+            (revision + 1, "update", "context", context.pk),
+            (revision + 1, "update", "property_claim", self.claim.pk),
+        ]
+
+    def test_deleting_case_leaves_no_changes(self):
+        Context.objects.create(name="C1", goal=self.goal)
+        self.case.delete()
+
+        assert not CaseChange.objects.exists()
+
+    def test_compaction(self):
+        contexts: list[Context] = [
+            Context.objects.create(name=f"C{index + 1}", goal=self.goal)
+            for index in range(3)
+        ]
+        revision: int = get_case_revision(self.case.pk)
+
+        call_command("compact_case_changes", keep=1, stdout=StringIO())
+
+        assert self.get_changes(0) == [(revision, "create", "context", contexts[-1].pk)]
+        assert (
+            AssuranceCaseRevision.objects.get(assurance_case=self.case).compacted_number
+            == revision - 1
+        )
+
+
 class EvidenceCase(TestCase):
     """
     creates an Evidence object and tests foreign key and
@@ -1,11 +1,18 @@
 import json
+from io import StringIO
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import Client, TestCase
 from django.urls import reverse
+from eap_api.model_utils import find_case_permission_errors
 from eap_api.models import (
+    AssuranceCase,
+    CasePermission,
     EAPGroup,
     EAPUser,
 )
+from eap_api.view_utils import get_allowed_cases, get_case_permissions
 from rest_framework.authtoken.models import Token
 
 from .constants_tests import (
@@ -191,3 +198,64 @@ class CasePermissionsTest(TestCase):
         # user3 should be able to delete it.
         delete_detail3 = self.client3.delete(reverse("case_detail", kwargs={"pk": 1}))
         assert delete_detail3.status_code == 204
+
+
+class CasePermissionIndexTest(TestCase):
+    """
+    Change case owners, groups and group members, and test that the permission
+    index follows.
+    user1 owns the case, which group1 can edit and group2 can view.
+    user2 is a member of group2.
+    """
+
+    def setUp(self):
+        self.user1 = EAPUser.objects.create(**USER1_INFO)
+        self.user2 = EAPUser.objects.create(**USER2_INFO)
+        self.group1 = EAPGroup.objects.create(**GROUP1_INFO, owner=self.user1)
+        self.group2 = EAPGroup.objects.create(**GROUP2_INFO, owner=self.user1)
+        self.group2.member.add(self.user2)
+        self.case = AssuranceCase.objects.create(**CASE1_INFO, owner=self.user1)
+        self.case.edit_groups.add(self.group1)
+        self.case.view_groups.add(self.group2)
+
+    def assert_consistent(self):
+        assert find_case_permission_errors() == []
+
+    def test_group_changes(self):
+        assert get_case_permissions(self.case, self.user2) == "view"
+
+        self.user2.all_groups.add(self.group1)
+        assert get_case_permissions(self.case, self.user2) == "edit"
+
+        self.group1.member.clear()
+        assert get_case_permissions(self.case, self.user2) == "view"
+
+        self.group2.viewable_cases.clear()
+        assert get_case_permissions(self.case, self.user2) is None
+
+        self.case.review_groups.add(self.group2)
+        assert get_case_permissions(self.case, self.user2) == "review"
+
+        self.group2.delete()
+        assert get_case_permissions(self.case, self.user2) is None
+        self.assert_consistent()
+
+    def test_owner_changes(self):
+        self.case.owner = self.user2
+        self.case.save()
+
+        assert get_case_permissions(self.case.pk, self.user2) == "manage"
+        assert get_case_permissions(self.case.pk, self.user1) is None
+        assert get_allowed_cases(self.user1) == []
+        assert get_allowed_cases(self.user2) == [self.case]
+        self.assert_consistent()
+
+    def test_check_command(self):
+        call_command("check_case_permissions", stdout=StringIO())
+
+        CasePermission.objects.filter(user=self.user2).delete()
+        with self.assertRaises(CommandError):  # noqa: PT027
+            call_command("check_case_permissions", stdout=StringIO())
+
+        call_command("check_case_permissions", "--fix", stdout=StringIO())
+        self.assert_consistent()
@@ -1,20 +1,52 @@
+import io
 import json
-from datetime import datetime
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any, cast
 from unittest.mock import MagicMock, patch
 from urllib.parse import urlencode
 
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from django.http import HttpResponse
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from eap_api.case_export import CaseTreeExporter, load_json_tree
+from eap_api.case_import import CaseTreeImporter
+from eap_api.identifiers import SiblingIdentifierUpdate, UpdateIdentifierUtils
+from eap_api.jobs import JobHeartbeat, claim_next_job, run_case_job
+from eap_api.json_stream import (
+    JSONEventReader,
+    JSONStreamError,
+    JSONStreamTooLargeError,
+    read_value,
+)
+from eap_api.model_utils import (
+    compact_case_changes,
+    get_case_revision,
+    rebuild_property_claim_closure,
+)
 from eap_api.models import (
     AssuranceCase,
+    AssuranceCaseRevision,
+    CaseJob,
+    Comment,
     Context,
     EAPGroup,
     EAPUser,
     Evidence,
     PropertyClaim,
+    PropertyClaimClosure,
     Strategy,
     TopLevelNormativeGoal,
 )
@@ -27,8 +59,14 @@ from eap_api.serializers import (
     PropertyClaimSerializer,
     TopLevelNormativeGoalSerializer,
 )
-from eap_api.view_utils import SandboxUtils, ShareAssuranceCaseUtils, make_case_summary
+from eap_api.view_utils import (
+    SandboxUtils,
+    ShareAssuranceCaseUtils,
+    get_json_tree,
+    make_case_summary,
+)
 from eap_api.views import make_summary
+from eap_websockets.presence import presence_store
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from social_core.exceptions import AuthForbidden
@@ -45,6 +83,7 @@ from .constants_tests import (
     PROPERTYCLAIM2_INFO,
     STRATEGY_INFO,
     USER1_INFO,
+    USER2_INFO,
 )
 
 
@@ -231,6 +270,9 @@ class CaseViewTest(TestCase):
             0
         ]
         assert strategy_property_claim_json["id"] == strategy_property_claim.pk
+        # Detaching P1 from the goal moved this claim up, before its strategy left.
+        strategy_property_claim.refresh_from_db()
+        assert strategy_property_claim.name == "P1"
         assert strategy_property_claim_json["name"] == strategy_property_claim.name
 
     def test_view_case_with_attached_items(self):
@@ -488,6 +530,162 @@ class CaseViewTest(TestCase):
 
         assert goal_created.name == "G1"
 
+    def test_identifier_update_only_writes_changes(self):
+        goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(**GOAL_INFO)
+        first_claim: PropertyClaim = PropertyClaim.objects.create(goal=goal, name="P1")
+        second_claim: PropertyClaim = PropertyClaim.objects.create(goal=goal, name="P9")
+        evidence: Evidence = Evidence.objects.create(name="E7")
+        evidence.property_claim.set([first_claim, second_claim])
+
+        assert UpdateIdentifierUtils.update_identifiers(case_id=self.assurance_case.pk)
+        second_claim.refresh_from_db()
+        evidence.refresh_from_db()
+        assert second_claim.name == "P2"
+        assert evidence.name == "E1"
+
+        revision: int = get_case_revision(self.assurance_case.pk)
+        with CaptureQueriesContext(connection) as context:
+            response_post: HttpResponse = self.client.post(
+                reverse("update_identifiers", kwargs={"pk": self.assurance_case.pk}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+
+        assert response_post.status_code == 200
+        writes: list[str] = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(("UPDATE", "INSERT", "DELETE"))
+        ]
+        assert writes == [], f"A case in sequence was written to: {writes}"
+        assert get_case_revision(self.assurance_case.pk) == revision
+
+
+class SiblingIdentifierUpdateTest(TestCase):
+    def setUp(self):
+        user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=user)
+        self.assurance_case: AssuranceCase = AssuranceCase.objects.create(**CASE1_INFO)
+        self.assurance_case.owner = user
+        self.assurance_case.save()
+
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            assurance_case=self.assurance_case, name="G1"
+        )
+        self.context: Context = Context.objects.create(goal=self.goal, name="C1")
+        self.first_strategy: Strategy = Strategy.objects.create(
+            goal=self.goal, name="S1"
+        )
+        self.second_strategy: Strategy = Strategy.objects.create(
+            goal=self.goal, name="S2"
+        )
+        self.goal_claim: PropertyClaim = PropertyClaim.objects.create(
+            goal=self.goal, name="P1"
+        )
+        self.strategy_claim: PropertyClaim = PropertyClaim.objects.create(
+            strategy=self.second_strategy, name="P2"
+        )
+        self.first_sub_claim: PropertyClaim = PropertyClaim.objects.create(
+            property_claim=self.strategy_claim, name="P2.1"
+        )
+        self.second_sub_claim: PropertyClaim = PropertyClaim.objects.create(
+            property_claim=self.strategy_claim, name="P2.2"
+        )
+        self.leaf_claim: PropertyClaim = PropertyClaim.objects.create(
+            property_claim=self.second_sub_claim, name="P2.2.1"
+        )
+
+    def get_claim_names(self) -> dict[int, str]:
+        return dict(PropertyClaim.objects.values_list("pk", "name"))
+
+    def test_created_claim_takes_its_place(self):
+        response_post: HttpResponse = self.client.post(
+            reverse("property_claim_list"),
+            {
+                "short_description": "Under the first strategy",
+                "long_description": "Comes before the claims of the second one",
+                "strategy_id": self.first_strategy.pk,
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+        assert response_post.status_code == 201
+        assert response_post.json()["name"] == "P2"
+        claim_names: dict[int, str] = self.get_claim_names()
+        assert claim_names[self.goal_claim.pk] == "P1"
+        assert claim_names[self.strategy_claim.pk] == "P3"
+        assert claim_names[self.first_sub_claim.pk] == "P3.1"
+        assert claim_names[self.leaf_claim.pk] == "P3.2.1"
+
+    def test_deleted_claim_leaves_no_gap(self):
+        revision: int = get_case_revision(self.assurance_case.pk)
+        with CaptureQueriesContext(connection) as context:
+            response_delete: HttpResponse = self.client.delete(
+                reverse(
+                    "property_claim_detail", kwargs={"pk": self.first_sub_claim.pk}
+                ),
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+
+        assert response_delete.status_code == 204
+        claim_names: dict[int, str] = self.get_claim_names()
+        assert claim_names[self.second_sub_claim.pk] == "P2.1"
+        assert claim_names[self.leaf_claim.pk] == "P2.1.1"
+        assert get_case_revision(self.assurance_case.pk) > revision
+
+        # Only the groups the claim was in are renumbered, not the whole case.
+        assert not any(
+            Context._meta.db_table in query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT")
+        )
+
+    def test_moved_claim_renumbers_both_groups(self):
+        SandboxUtils.detach_property_claim(
+            self.second_sub_claim.pk,
+            parent_info={"property_claim_id": self.strategy_claim.pk},
+        )
+        self.leaf_claim.refresh_from_db()
+        assert self.leaf_claim.name == "P2.2.1"
+
+        response_post: HttpResponse = self.client.post(
+            reverse("attach_property_claim", kwargs={"pk": self.second_sub_claim.pk}),
+            {"property_claim_id": self.goal_claim.pk},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+        assert response_post.status_code == 200
+        claim_names: dict[int, str] = self.get_claim_names()
+        assert claim_names[self.first_sub_claim.pk] == "P2.1"
+        assert claim_names[self.second_sub_claim.pk] == "P1.1"
+        assert claim_names[self.leaf_claim.pk] == "P1.1.1"
+
+    def test_update_in_place_keeps_names(self):
+        response_put: HttpResponse = self.client.put(
+            reverse("context_detail", kwargs={"pk": self.context.pk}),
+            {"name": "Operating context", "goal_id": self.goal.pk},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+        assert response_put.status_code == 200
+        self.context.refresh_from_db()
+        assert self.context.name == "Operating context"
+
+    def test_failed_change_is_rolled_back(self):
+        claim_id: int = self.first_sub_claim.pk
+        with self.assertRaises(RuntimeError), SiblingIdentifierUpdate(  # noqa: PT027
+            self.first_sub_claim
+        ):
+            self.first_sub_claim.delete()
+            raise RuntimeError
+
+        claim_names: dict[int, str] = self.get_claim_names()
+        assert claim_names[claim_id] == "P2.1"
+        assert claim_names[self.second_sub_claim.pk] == "P2.2"
+
 
 class GoalViewTest(TestCase):
     def setUp(self):
@@ -644,7 +842,7 @@ class StrategyViewTest(TestCase):
             == self.assurance_case  # type:ignore[attr-defined]
         )
         assert strategy.goal == self.goal
-        assert strategy.assurance_case is None
+        assert strategy.assurance_case == self.assurance_case
         assert not strategy.in_sandbox
 
         response_post: HttpResponse = self.client.post(
@@ -683,7 +881,7 @@ class StrategyViewTest(TestCase):
         detached_strategy.refresh_from_db()
 
         assert not detached_strategy.in_sandbox
-        assert detached_strategy.assurance_case is None
+        assert detached_strategy.assurance_case == self.assurance_case
         assert detached_strategy.goal == self.goal
 
 
@@ -752,7 +950,7 @@ class ContextViewTest(TestCase):
             pk=self.goal.pk
         )
 
-        assert detached_context.assurance_case is None
+        assert detached_context.assurance_case == self.case
         assert not detached_context.in_sandbox
 
     def test_create_context_with_post(self):
@@ -970,7 +1168,7 @@ class PropertyClaimViewTest(TestCase):
 
         assert self.first_property_claim in self.goal.property_claims.all()  # type: ignore[attr-ignore]
         assert not self.first_property_claim.in_sandbox
-        assert self.first_property_claim.assurance_case is None
+        assert self.first_property_claim.assurance_case == self.case
 
         response_post: HttpResponse = self.client.post(
             path=reverse(
@@ -1005,7 +1203,7 @@ class PropertyClaimViewTest(TestCase):
         self.first_property_claim.refresh_from_db()
 
         assert self.first_property_claim in self.goal.property_claims.all()  # type: ignore[attr-ignore]
-        assert self.first_property_claim.assurance_case is None
+        assert self.first_property_claim.assurance_case == self.case
         assert not self.first_property_claim.in_sandbox
 
     def test_detach_property_claim_from_property_claim(self):
@@ -1016,7 +1214,7 @@ class PropertyClaimViewTest(TestCase):
 
         assert new_property_claim in self.first_property_claim.property_claims.all()  # type: ignore[attr-ignore]
         assert not new_property_claim.in_sandbox
-        assert self.first_property_claim.assurance_case is None
+        assert self.first_property_claim.assurance_case == self.case
 
         response_post: HttpResponse = self.client.post(
             path=reverse("detach_property_claim", kwargs={"pk": new_property_claim.pk}),
@@ -1047,7 +1245,7 @@ class PropertyClaimViewTest(TestCase):
         self.first_property_claim.refresh_from_db()
 
         assert new_property_claim in self.first_property_claim.property_claims.all()  # type: ignore[attr-ignore]
-        assert new_property_claim.assurance_case is None
+        assert new_property_claim.assurance_case == self.case
         assert not new_property_claim.in_sandbox
 
     def test_detach_property_claim_from_strategy(self):
@@ -1059,7 +1257,7 @@ class PropertyClaimViewTest(TestCase):
 
         assert self.first_property_claim in new_strategy.property_claims.all()  # type: ignore[attr-ignore]
         assert not self.first_property_claim.in_sandbox
-        assert self.first_property_claim.assurance_case is None
+        assert self.first_property_claim.assurance_case == self.case
 
         response_post: HttpResponse = self.client.post(
             path=reverse(
@@ -1156,6 +1354,14 @@ class EvidenceViewTest(TestCase):
         assert json_response["URL"] == evidence_information["URL"]
         assert json_response["property_claim_id"] == [self.pclaim.pk]
 
+        response_post = self.client.post(
+            reverse("evidence_list"),
+            data=json.dumps(evidence_information | {"property_claim_id": []}),
+            content_type="application/json",
+        )
+        assert response_post.status_code == 400
+        assert "property_claim_id" in response_post.json()
+
     def test_evidence_list_view_get(self):
         response_get = self.client.get(reverse("evidence_list"))
         assert response_get.status_code == 200
@@ -1200,7 +1406,7 @@ class EvidenceViewTest(TestCase):
         assert self.pclaim.goal == self.goal
         assert self.goal.assurance_case == self.case
         assert not self.evidence1.in_sandbox
-        assert self.evidence1.assurance_case is None
+        assert self.evidence1.assurance_case == self.case
 
         response_post: HttpResponse = self.client.post(
             path=reverse("detach_evidence", kwargs={"pk": self.evidence1.pk}),
@@ -1289,6 +1495,1640 @@ class FullCaseDetailViewTest(TestCase):
         assert len(response_data["goals"][0]["property_claims"]) == 1
 
 
+class CaseListQueryTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+
+        for name in ("Charlie", "alpha", "Bravo"):
+            assurance_case: AssuranceCase = AssuranceCase.objects.create(
+                name=name, description="A case", owner=self.user
+            )
+            Comment.objects.create(
+                author=self.user, assurance_case=assurance_case, content="A comment"
+            )
+
+        self.shared_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Shared", description="A case", owner=other_user
+        )
+        ShareAssuranceCaseUtils.get_edit_group(self.shared_case).member.add(self.user)
+
+    def get_cases(self, parameters: dict) -> HttpResponse:
+        return self.client.get(
+            reverse("case_list"),
+            parameters,
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def test_case_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response_get: HttpResponse = self.get_cases({})
+
+        assert response_get.status_code == 200
+        assert len(response_get.json()) == 4
+        case_queries: list[str] = [
+            query["sql"]
+            for query in context.captured_queries
+            if f'"{AssuranceCase._meta.db_table}"' in query["sql"]
+        ]
+        assert len(case_queries) == 1, case_queries
+        assert not any(
+            f'"{Comment._meta.db_table}"' in query["sql"]
+            for query in context.captured_queries
+        )
+
+    def test_case_list_permissions(self):
+        response_data: list[dict] = self.get_cases({"owner": "false"}).json()
+
+        assert [case_data["id"] for case_data in response_data] == [self.shared_case.pk]
+        assert response_data[0]["permissions"] == ["edit"]
+
+    def test_case_list_sorting_and_search(self):
+        response_data: list[dict] = self.get_cases(
+            {"ordering": "-name", "search": "A"}
+        ).json()
+        assert [case_data["name"] for case_data in response_data] == [
+            "Shared",
+            "Charlie",
+            "Bravo",
+            "alpha",
+        ]
+
+        response_data = self.get_cases({"search": "ar"}).json()
+        assert [case_data["name"] for case_data in response_data] == [
+            "Charlie",
+            "Shared",
+        ]
+
+        assert self.get_cases({"ordering": "owner"}).status_code == 400
+
+    def test_case_list_pages(self):
+        response_data: dict = self.get_cases(
+            {"ordering": "name", "page_size": 3}
+        ).json()
+
+        assert response_data["count"] == 4
+        assert response_data["previous"] is None
+        assert [case_data["name"] for case_data in response_data["results"]] == [
+            "alpha",
+            "Bravo",
+            "Charlie",
+        ]
+
+        response_data = self.client.get(
+            response_data["next"], HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        ).json()
+        assert response_data["next"] is None
+        assert [case_data["name"] for case_data in response_data["results"]] == [
+            "Shared"
+        ]
+
+
+class CaseItemListPaginationTest(TestCase):
+    def setUp(self):
+        self.case: AssuranceCase = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            **GOAL_INFO
+        )
+        self.claims: list[PropertyClaim] = [
+            PropertyClaim.objects.create(name=f"P{index}", goal=self.goal)
+            for index in range(5)
+        ]
+
+        other_case: AssuranceCase = AssuranceCase.objects.create(**CASE1_INFO)
+        other_goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            name="Other goal", keywords="key", assurance_case=other_case
+        )
+        PropertyClaim.objects.create(name="P0", goal=other_goal)
+
+    def test_filter_by_case(self):
+        response_get: HttpResponse = self.client.get(
+            reverse("property_claim_list"), {"case_id": self.case.pk}
+        )
+
+        assert response_get.status_code == 200
+        assert response_get.json() == [
+            {"id": claim.pk, "name": claim.name} for claim in self.claims
+        ]
+
+    def test_pages(self):
+        url: str | None = reverse("property_claim_list")
+        parameters: dict = {"case_id": self.case.pk, "page_size": 2}
+        page_sizes: list[int] = []
+        claim_ids: list[int] = []
+        while url is not None:
+            response_get: HttpResponse = self.client.get(url, parameters)
+            assert response_get.status_code == 200
+
+            page: dict = response_get.json()
+            page_sizes.append(len(page["results"]))
+            claim_ids += [summary["id"] for summary in page["results"]]
+            url, parameters = page["next"], {}
+
+        assert page_sizes == [2, 2, 1]
+        assert claim_ids == [claim.pk for claim in self.claims]
+
+    def test_invalid_cursor(self):
+        response_get: HttpResponse = self.client.get(
+            reverse("property_claim_list"), {"cursor": "not-a-cursor"}
+        )
+
+        assert response_get.status_code == 404
+
+
+class CaseTreeLoaderTest(TestCase):
+    def setUp(self):
+        self.case: AssuranceCase = AssuranceCase.objects.create(**CASE1_INFO)
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            **GOAL_INFO
+        )
+
+    def add_items(self, number_of_claims: int) -> None:
+        Context.objects.create(goal=self.goal, name=f"C{number_of_claims}")
+        strategy: Strategy = Strategy.objects.create(
+            goal=self.goal, name=f"S{number_of_claims}"
+        )
+
+        shared_evidence: Evidence = Evidence.objects.create(name="Shared")
+        for index in range(number_of_claims):
+            claim: PropertyClaim = PropertyClaim.objects.create(
+                name=f"P{index}", goal=self.goal
+            )
+            sub_claim: PropertyClaim = PropertyClaim.objects.create(
+                name=f"P{index}.1", property_claim=claim
+            )
+            strategy_claim: PropertyClaim = PropertyClaim.objects.create(
+                name=f"P{index}_S", strategy=strategy
+            )
+
+            evidence: Evidence = Evidence.objects.create(name=f"E{index}")
+            evidence.property_claim.add(sub_claim, strategy_claim)
+            shared_evidence.property_claim.add(claim)
+
+    def count_queries(self) -> int:
+        with CaptureQueriesContext(connection) as context:
+            load_json_tree([self.goal.pk], "goals")
+        return len(context.captured_queries)
+
+    def test_same_json_as_recursive_tree(self):
+        self.add_items(number_of_claims=3)
+
+        assert json.dumps(load_json_tree([self.goal.pk], "goals")) == json.dumps(
+            get_json_tree([self.goal.pk], "goals")
+        )
+
+        strategy_ids: list[int] = list(
+            Strategy.objects.values_list("pk", flat=True).order_by("pk")
+        )
+        assert json.dumps(load_json_tree(strategy_ids, "strategies")) == json.dumps(
+            get_json_tree(strategy_ids, "strategies")
+        )
+
+    def test_query_count_independent_of_case_size(self):
+        self.add_items(number_of_claims=1)
+        small_case_queries: int = self.count_queries()
+
+        self.add_items(number_of_claims=10)
+        assert self.count_queries() == small_case_queries
+
+    def test_query_count_independent_of_claim_depth(self):
+        self.add_items(number_of_claims=1)
+        shallow_case_queries: int = self.count_queries()
+
+        claim: PropertyClaim = PropertyClaim.objects.get(name="P0.1")
+        for _ in range(4):
+            claim = PropertyClaim.objects.create(
+                name=f"{claim.name}.1", property_claim=claim
+            )
+        assert self.count_queries() == shallow_case_queries
+        assert json.dumps(load_json_tree([self.goal.pk], "goals")) == json.dumps(
+            get_json_tree([self.goal.pk], "goals")
+        )
+
+
+class CaseImportTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+
+    @staticmethod
+    def make_item(**extra_fields: Any) -> dict:
+        return {
+            "name": "Ignored",
+            "short_description": "short",
+            "long_description": "long",
+        } | extra_fields
+
+    def make_case_data(self, number_of_claims: int) -> dict:
+        def make_claim(depth: int) -> dict:
+            return self.make_item(
+                property_claims=[make_claim(depth - 1)] if depth > 1 else [],
+                evidence=[self.make_item(URL="www.some-evidence.com")],
+            )
+
+        goal: dict = self.make_item(
+            keywords="N/A",
+            context=[self.make_item(), self.make_item()],
+            property_claims=[make_claim(3) for _ in range(number_of_claims)],
+            strategies=[self.make_item(property_claims=[make_claim(2)])],
+        )
+        return {
+            "name": "Imported case",
+            "description": "A case",
+            "lock_uuid": None,
+            "color_profile": "default",
+            "goals": [goal],
+        }
+
+    def post_case(self, case_data: dict) -> HttpResponse:
+        return self.client.post(
+            reverse("case_list"),
+            data=json.dumps(case_data),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def test_import_case_tree(self):
+        response_post: HttpResponse = self.post_case(self.make_case_data(2))
+
+        assert response_post.status_code == 201
+        assurance_case: AssuranceCase = AssuranceCase.objects.get(
+            pk=response_post.json()["id"]
+        )
+        assert response_post.json() == {
+            "name": "Imported case",
+            "id": assurance_case.pk,
+        }
+        assert assurance_case.owner == self.user
+        assert get_case_revision(assurance_case.pk) > 1
+
+        goal: TopLevelNormativeGoal = assurance_case.goals.get()
+        assert goal.name == "G1"
+        assert list(goal.context.values_list("name", flat=True)) == ["C1", "C2"]
+        assert [
+            (claim.name, claim.level, claim.assurance_case_id)
+            for claim in PropertyClaim.objects.order_by("pk")
+        ] == [
+            ("P1", 1, assurance_case.pk),
+            ("P2", 1, assurance_case.pk),
+            ("P3", 1, assurance_case.pk),
+            ("P1.1", 2, assurance_case.pk),
+            ("P2.1", 2, assurance_case.pk),
+            ("P3.1", 2, assurance_case.pk),
+            ("P1.1.1", 3, assurance_case.pk),
+            ("P2.1.1", 3, assurance_case.pk),
+        ]
+        assert list(
+            Evidence.objects.order_by("name").values_list(
+                "name", "property_claim__name", "assurance_case_id"
+            )
+        ) == [
+            ("E1", "P1.1.1", assurance_case.pk),
+            ("E2", "P1.1", assurance_case.pk),
+            ("E3", "P1", assurance_case.pk),
+            ("E4", "P2.1.1", assurance_case.pk),
+            ("E5", "P2.1", assurance_case.pk),
+            ("E6", "P2", assurance_case.pk),
+            ("E7", "P3.1", assurance_case.pk),
+            ("E8", "P3", assurance_case.pk),
+        ]
+
+        closure_links: set = set(
+            PropertyClaimClosure.objects.values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        )
+        rebuild_property_claim_closure()
+        assert closure_links == set(
+            PropertyClaimClosure.objects.values_list(
+                "ancestor_id", "descendant_id", "depth"
+            )
+        )
+
+    def test_query_count_independent_of_case_size(self):
+        with CaptureQueriesContext(connection) as small_case_context:
+            self.post_case(self.make_case_data(1))
+        with CaptureQueriesContext(connection) as large_case_context:
+            self.post_case(self.make_case_data(20))
+
+        assert len(large_case_context.captured_queries) == len(
+            small_case_context.captured_queries
+        )
+
+    def test_invalid_item_creates_nothing(self):
+        case_data: dict = self.make_case_data(2)
+        del case_data["goals"][0]["strategies"][0]["property_claims"][0][
+            "property_claims"
+        ][0]["evidence"][0]["URL"]
+
+        response_post: HttpResponse = self.post_case(case_data)
+
+        assert response_post.status_code == 400
+        assert response_post.json() == {"URL": ["This field is required."]}
+        assert not AssuranceCase.objects.exists()
+        assert not PropertyClaim.objects.exists()
+
+        case_data = self.make_case_data(1)
+        case_data["goals"][0]["context"][1]["name"] = "C" * 201
+        assert self.post_case(case_data).status_code == 400
+        assert not AssuranceCase.objects.exists()
+
+    def test_streamed_import_in_batches(self):
+        other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        case_data: dict = self.make_case_data(3)
+        # Exports list some case fields after the goals.
+        case_data = {
+            "goals": case_data.pop("goals"),
+            "owner": other_user.pk,
+        } | case_data
+
+        with patch.object(CaseTreeImporter, "FLUSH_SIZE", 2):
+            response_post: HttpResponse = self.post_case(case_data)
+
+        assert response_post.status_code == 201
+        assurance_case: AssuranceCase = AssuranceCase.objects.get(
+            pk=response_post.json()["id"]
+        )
+        assert assurance_case.owner == self.user
+        assert assurance_case.color_profile == "default"
+        assert sorted(PropertyClaim.objects.values_list("name", "level")) == [
+            ("P1", 1),
+            ("P1.1", 2),
+            ("P1.1.1", 3),
+            ("P2", 1),
+            ("P2.1", 2),
+            ("P2.1.1", 3),
+            ("P3", 1),
+            ("P3.1", 2),
+            ("P3.1.1", 3),
+            ("P4", 1),
+            ("P4.1", 2),
+        ]
+        assert Evidence.objects.filter(assurance_case=assurance_case).count() == 11
+
+        case_data["goals"][0]["strategies"][0]["keywords"] = "Ignored"
+        case_data["goals"][0]["strategies"][0]["name"] = "S" * 201
+        with patch.object(CaseTreeImporter, "FLUSH_SIZE", 2):
+            assert self.post_case(case_data).status_code == 400
+        assert AssuranceCase.objects.count() == 1
+
+    def test_malformed_and_oversized_uploads(self):
+        case_data: dict = self.make_case_data(1)
+        body: str = json.dumps(case_data)
+
+        for invalid_body in ("", body[:-1], body + "{}", body.replace(":", "=", 1)):
+            response_post: HttpResponse = self.client.post(
+                reverse("case_list"),
+                data=invalid_body,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+            assert response_post.status_code == 400
+            assert "Invalid JSON" in response_post.json()["error_message"]
+
+        goal: dict = case_data["goals"][0]
+        case_data["goals"][0] = goal | {"name": goal.pop("name")}
+        response_post = self.post_case(case_data)
+        assert response_post.status_code == 400
+        assert response_post.json() == {
+            "name": ["Must come before the lists of child items."]
+        }
+
+        with self.settings(CASE_UPLOAD_MAX_SIZE=len(body) - 1):
+            assert self.post_case(self.make_case_data(1)).status_code == 413
+
+        response_post = self.client.post(
+            reverse("case_list"),
+            data=body,
+            content_type="application/json",
+            CONTENT_LENGTH="many",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        assert response_post.status_code == 400
+        assert response_post.json() == {
+            "error_message": "Invalid Content-Length header."
+        }
+        assert not AssuranceCase.objects.exists()
+
+
+def remove_ids(case_data: Any) -> Any:
+    """Turns the JSON of case_detail into that of an export, as in examples/."""
+    if isinstance(case_data, dict):
+        return {
+            key: remove_ids(value)
+            for key, value in case_data.items()
+            if key not in ["id", "permissions", "sequence"]
+        }
+    if isinstance(case_data, list):
+        return [remove_ids(value) for value in case_data]
+    return case_data
+
+
+def import_case(case_data: dict) -> AssuranceCase:
+    """Imports a case from its JSON, as case_list does from the request body."""
+    importer = CaseTreeImporter()
+    events = JSONEventReader(io.BytesIO(json.dumps(case_data).encode()), 2**30)
+    with transaction.atomic():
+        assurance_case: AssuranceCase | None = importer.import_events(events)
+    assert assurance_case is not None, importer.errors
+    return assurance_case
+
+
+class CaseExportTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+
+        self.assurance_case = self.create_case("First case", self.user)
+        self.second_case = self.create_case("Second case", self.user)
+        self.other_case = self.create_case("Other case", self.other_user)
+
+    @staticmethod
+    def create_case(name: str, owner: EAPUser) -> AssuranceCase:
+        def make_item(**extra_fields: Any) -> dict:
+            return {
+                "name": "Ignored",
+                "short_description": "short",
+                "long_description": "long",
+            } | extra_fields
+
+        def make_claim(depth: int) -> dict:
+            return make_item(
+                property_claims=[make_claim(depth - 1)] if depth > 1 else [],
+                evidence=[make_item(URL="www.some-evidence.com")],
+            )
+
+        goal: dict = make_item(
+            keywords="N/A",
+            context=[make_item()],
+            property_claims=[make_claim(3), make_claim(1)],
+            strategies=[make_item(property_claims=[make_claim(2)])],
+        )
+        case_data: dict = {
+            "name": name,
+            "description": "A case",
+            "lock_uuid": None,
+            "color_profile": "default",
+            "owner": owner.pk,
+            "goals": [goal],
+        }
+        return import_case(case_data)
+
+    def get_case_detail(self, assurance_case: AssuranceCase) -> dict:
+        response = self.client.get(
+            reverse("case_detail", kwargs={"pk": assurance_case.pk}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        return response.json()
+
+    def get_export(self, url: str) -> HttpResponse:
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_case_export(self):
+        # Evidence of several claims is written under each of them.
+        evidence: Evidence = Evidence.objects.filter(
+            assurance_case=self.assurance_case
+        ).first()
+        evidence.property_claim.add(*self.assurance_case.property_claims.all())
+
+        with patch.object(CaseTreeExporter, "CHUNK_SIZE", 2):
+            response = self.get_export(
+                reverse("case_export", kwargs={"pk": self.assurance_case.pk})
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Disposition"] == (
+            f'attachment; filename="First_case-{self.assurance_case.pk}.json"'
+        )
+        exported_case: dict = json.loads(b"".join(response.streaming_content))
+        assert exported_case == remove_ids(self.get_case_detail(self.assurance_case))
+
+        # The export can be imported back as it is.
+        import_case(exported_case | {"owner": self.user.pk})
+
+        response = self.get_export(
+            reverse("case_export", kwargs={"pk": self.other_case.pk})
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_bulk_export(self):
+        response = self.get_export(reverse("case_bulk_export"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines: list[bytes] = b"".join(response.streaming_content).splitlines()
+        assert [json.loads(line) for line in lines] == [
+            remove_ids(self.get_case_detail(assurance_case))
+            for assurance_case in [self.assurance_case, self.second_case]
+        ]
+
+        response = self.get_export(reverse("case_bulk_export") + "?output=zip")
+        assert response.status_code == status.HTTP_200_OK
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as zip:
+            assert zip.namelist() == [
+                f"First_case-{self.assurance_case.pk}.json",
+                f"Second_case-{self.second_case.pk}.json",
+            ]
+            assert json.loads(zip.read(zip.namelist()[1])) == remove_ids(
+                self.get_case_detail(self.second_case)
+            )
+
+        response = self.get_export(reverse("case_bulk_export") + "?output=xml")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            output_path: str = f"{output_dir}/cases.zip"
+            stdout = io.StringIO()
+            call_command("export_cases", output_path, "--format", "zip", stdout=stdout)
+            assert "Exported 3 cases" in stdout.getvalue()
+            with zipfile.ZipFile(output_path) as zip:
+                assert len(zip.namelist()) == 3
+
+            output_path = f"{output_dir}/cases.ndjson"
+            call_command(
+                "export_cases",
+                output_path,
+                "--case-id",
+                str(self.other_case.pk),
+                stdout=stdout,
+            )
+            with Path(output_path).open("rb") as output:
+                exported_cases: list[dict] = [json.loads(line) for line in output]
+            assert [case_data["name"] for case_data in exported_cases] == ["Other case"]
+
+
+class CaseCloneTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.other_token, _ = Token.objects.get_or_create(user=self.other_user)
+
+        self.assurance_case = CaseExportTest.create_case("Template", self.user)
+        evidence: Evidence = Evidence.objects.filter(
+            assurance_case=self.assurance_case
+        ).first()
+        evidence.property_claim.add(*self.assurance_case.property_claims.all())
+        goal: TopLevelNormativeGoal = self.assurance_case.goals.get()
+        SandboxUtils.detach_context(goal.context.get().pk)
+        Comment.objects.create(
+            author=self.user, assurance_case=self.assurance_case, content="On case"
+        )
+        Comment.objects.create(author=self.other_user, goal=goal, content="On goal")
+        # Copies keep the dates of the original comments.
+        Comment.objects.filter(content="On case").update(
+            created_at=timezone.make_aware(datetime(2024, 1, 2))
+        )
+
+    def post_clone(self, data: Any, token: Token | None = None) -> HttpResponse:
+        return self.client.post(
+            reverse("case_clone", kwargs={"pk": self.assurance_case.pk}),
+            data=json.dumps(data),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    def get_case_json(self, url_name: str, assurance_case: AssuranceCase) -> Any:
+        response = self.client.get(
+            reverse(url_name, kwargs={"pk": assurance_case.pk}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        return response.json()
+
+    @classmethod
+    def get_content(cls, case_data: Any) -> Any:
+        """Leaves out ids, links to other items and dates, which a copy changes."""
+        if isinstance(case_data, dict):
+            return {
+                key: cls.get_content(value)
+                for key, value in case_data.items()
+                if isinstance(value, (list, dict))
+                or key in ["name", "short_description", "long_description", "URL"]
+            }
+        if isinstance(case_data, list):
+            return [
+                cls.get_content(value) for value in case_data if isinstance(value, dict)
+            ]
+        return case_data
+
+    def test_clone_case(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_clone({})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(queries) < 50
+        copy = AssuranceCase.objects.get(pk=response.json()["id"])
+        assert response.json() == {"name": "Template (copy)", "id": copy.pk}
+        assert copy.owner == self.user
+
+        original_tree: dict = self.get_case_json("case_detail", self.assurance_case)
+        copy_tree: dict = self.get_case_json("case_detail", copy)
+        assert self.get_content(copy_tree) == self.get_content(original_tree) | {
+            "name": "Template (copy)"
+        }
+        copy_sandbox: dict = self.get_case_json("case_sandbox", copy)
+        original_sandbox = self.get_case_json("case_sandbox", self.assurance_case)
+        assert len(copy_sandbox["contexts"]) == 1
+        assert self.get_content(copy_sandbox) == self.get_content(original_sandbox)
+
+        copy_claims: QuerySet = PropertyClaim.objects.filter(assurance_case=copy)
+        assert not copy_claims.filter(
+            pk__in=self.assurance_case.property_claims.all()
+        ).exists()
+        assert PropertyClaimClosure.objects.filter(
+            descendant__in=copy_claims
+        ).count() == (
+            PropertyClaimClosure.objects.filter(
+                descendant__assurance_case=self.assurance_case
+            ).count()
+        )
+        assert set(
+            Comment.objects.filter(
+                Q(assurance_case=copy) | Q(goal__assurance_case=copy)
+            ).values_list("content", "author", "created_at")
+        ) == set(
+            Comment.objects.filter(
+                Q(assurance_case=self.assurance_case)
+                | Q(goal__assurance_case=self.assurance_case)
+            ).values_list("content", "author", "created_at")
+        )
+
+    def test_clone_permissions(self):
+        response = self.post_clone({}, self.other_token)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        group = EAPGroup.objects.create(name="Cohort", owner=self.user)
+        group.member.add(self.other_user)
+        self.assurance_case.view_groups.add(group)
+        response = self.post_clone({"name": "My copy"}, self.other_token)
+        assert response.status_code == status.HTTP_201_CREATED
+        copy = AssuranceCase.objects.get(pk=response.json()["id"])
+        assert copy.name == "My copy"
+        assert copy.owner == self.other_user
+        assert not copy.view_groups.exists()
+
+        response = self.post_clone({"name": "x" * 201})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        for data in (["My copy"], "My copy"):
+            response = self.post_clone(data)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert AssuranceCase.objects.count() == 2
+
+
+class CaseBatchTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.other_token, _ = Token.objects.get_or_create(user=self.other_user)
+
+        self.assurance_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Batched", owner=self.user
+        )
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            assurance_case=self.assurance_case, name="G1", keywords="key"
+        )
+        self.context: Context = Context.objects.create(goal=self.goal, name="C1")
+
+    def post_batch(self, operations: Any, token: Token | None = None) -> HttpResponse:
+        return self.client.post(
+            reverse("case_batch", kwargs={"pk": self.assurance_case.pk}),
+            data=json.dumps({"operations": operations}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    @staticmethod
+    def make_item(**fields: Any) -> dict[str, Any]:
+        return {
+            "short_description": "Made in a batch",
+            "long_description": "One of several changes",
+            **fields,
+        }
+
+    def test_batch(self):
+        revision: int = get_case_revision(self.assurance_case.pk)
+        revision_table: str = AssuranceCaseRevision._meta.db_table
+        operations: list[dict[str, Any]] = [
+            {
+                "op": "create",
+                "type": "strategy",
+                "temp_id": "strategy",
+                "data": self.make_item(goal_id=self.goal.pk),
+            },
+            {
+                "op": "create",
+                "type": "property_claim",
+                "temp_id": "claim",
+                "data": self.make_item(strategy_id="strategy"),
+            },
+            {
+                "op": "create",
+                "type": "property_claim",
+                "temp_id": "sub_claim",
+                "data": self.make_item(property_claim_id="claim"),
+            },
+            {
+                "op": "create",
+                "type": "evidence",
+                "data": self.make_item(property_claim_id=["sub_claim"]),
+            },
+            {
+                "op": "update",
+                "type": "goal",
+                "id": self.goal.pk,
+                "data": {"short_description": "Updated in a batch"},
+            },
+            {"op": "detach", "type": "context", "id": self.context.pk},
+            {"op": "delete", "type": "context", "id": self.context.pk},
+        ]
+
+        with CaptureQueriesContext(connection) as context:
+            response: HttpResponse = self.post_batch(operations)
+
+        assert response.status_code == 200, response.content
+        results: list[dict[str, Any]] = response.json()["results"]
+        assert [result["op"] for result in results] == [
+            operation["op"] for operation in operations
+        ]
+        assert [result["data"]["name"] for result in results[:4]] == [
+            "S1",
+            "P1",
+            "P1.1",
+            "E1",
+        ]
+        assert results[1]["data"]["strategy_id"] == results[0]["id"]
+        assert results[2]["data"]["property_claim_id"] == results[1]["id"]
+        assert results[4]["data"]["short_description"] == "Updated in a batch"
+        assert results[5]["deleted"]
+        assert results[6]["deleted"]
+        assert not Context.objects.filter(pk=self.context.pk).exists()
+
+        assert get_case_revision(self.assurance_case.pk) == revision + 1
+        revision_updates: list[str] = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].lstrip().startswith("UPDATE")
+            and revision_table in query["sql"]
+        ]
+        assert len(revision_updates) == 1
+
+    def test_failed_batch_is_rolled_back(self):
+        revision: int = get_case_revision(self.assurance_case.pk)
+        response: HttpResponse = self.post_batch(
+            [
+                {
+                    "op": "create",
+                    "type": "property_claim",
+                    "data": self.make_item(goal_id=self.goal.pk),
+                },
+                {"op": "delete", "type": "context", "id": self.context.pk},
+                {"op": "delete", "type": "strategy", "id": self.context.pk},
+            ]
+        )
+
+        assert response.status_code == 400
+        assert response.json()["operation"] == 2
+        assert not PropertyClaim.objects.exists()
+        assert Context.objects.filter(pk=self.context.pk).exists()
+        assert get_case_revision(self.assurance_case.pk) == revision
+
+    def test_invalid_operations(self):
+        other_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Other", owner=self.user
+        )
+        other_goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            assurance_case=other_case, name="G1", keywords="key"
+        )
+
+        for operations in (
+            {"op": "create"},
+            [{"op": "rename", "type": "context", "id": self.context.pk}],
+            [{"op": "update", "type": "context", "id": "unknown", "data": {}}],
+            [{"op": "create", "type": "context", "data": self.make_item()}],
+            [
+                {
+                    "op": "create",
+                    "type": "context",
+                    "data": self.make_item(goal_id=other_goal.pk),
+                }
+            ],
+            [{"op": "create", "type": "strategy", "data": {"goal_id": self.goal.pk}}],
+        ):
+            response: HttpResponse = self.post_batch(operations)
+            assert response.status_code == 400, operations
+            assert "error_message" in response.json()
+
+        assert not Context.objects.filter(goal=other_goal).exists()
+
+    def test_batch_needs_edit_permission(self):
+        response: HttpResponse = self.post_batch(
+            [{"op": "delete", "type": "context", "id": self.context.pk}],
+            self.other_token,
+        )
+
+        assert response.status_code == 403
+        assert Context.objects.filter(pk=self.context.pk).exists()
+
+
+class SandboxSelectionTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.other_token, _ = Token.objects.get_or_create(user=self.other_user)
+
+        self.assurance_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Moved", owner=self.user
+        )
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            assurance_case=self.assurance_case, name="G1", keywords="key"
+        )
+        self.contexts: list[Context] = [
+            Context.objects.create(goal=self.goal, name=f"C{index + 1}")
+            for index in range(4)
+        ]
+        self.strategy: Strategy = Strategy.objects.create(goal=self.goal, name="S1")
+        self.strategy_claim: PropertyClaim = PropertyClaim.objects.create(
+            strategy=self.strategy, name="P2"
+        )
+        self.goal_claim: PropertyClaim = PropertyClaim.objects.create(
+            goal=self.goal, name="P1"
+        )
+        self.sub_claim: PropertyClaim = PropertyClaim.objects.create(
+            property_claim=self.goal_claim, name="P1.1"
+        )
+        self.evidence: Evidence = Evidence.objects.create(name="E1")
+        self.evidence.property_claim.add(self.goal_claim)
+
+    def move_items(
+        self, url_name: str, selection: Any, token: Token | None = None
+    ) -> HttpResponse:
+        return self.client.post(
+            reverse(url_name, kwargs={"pk": self.assurance_case.pk}),
+            data=json.dumps(selection),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    def test_detach_items(self):
+        revision: int = get_case_revision(self.assurance_case.pk)
+        response: HttpResponse = self.move_items(
+            "detach_sandbox_items",
+            {
+                "contexts": [{"id": self.contexts[0].pk}],
+                "property_claims": [
+                    {"id": self.sub_claim.pk, "property_claim_id": self.goal_claim.pk}
+                ],
+                "evidence": [
+                    {"id": self.evidence.pk, "property_claim_id": self.goal_claim.pk}
+                ],
+            },
+        )
+
+        assert response.status_code == 200, response.content
+        sandbox: dict[str, Any] = response.json()
+        assert [context["id"] for context in sandbox["contexts"]] == [
+            self.contexts[0].pk
+        ]
+        assert [claim["id"] for claim in sandbox["property_claims"]] == [
+            self.sub_claim.pk
+        ]
+        assert [evidence["id"] for evidence in sandbox["evidence"]] == [
+            self.evidence.pk
+        ]
+
+        self.sub_claim.refresh_from_db()
+        assert self.sub_claim.in_sandbox
+        assert self.sub_claim.property_claim is None
+        assert self.sub_claim.level == 1
+        assert not PropertyClaimClosure.objects.filter(
+            descendant=self.sub_claim, depth__gt=0
+        ).exists()
+        assert not self.evidence.property_claim.exists()
+        assert [
+            context.name
+            for context in Context.objects.filter(goal=self.goal).order_by("pk")
+        ] == [
+            "C1",
+            "C2",
+            "C3",
+        ]
+        assert get_case_revision(self.assurance_case.pk) == revision + 1
+
+    def test_detach_query_count_does_not_grow_with_selection(self):
+        def count_detach_queries(contexts: list[Context]) -> int:
+            with CaptureQueriesContext(connection) as context:
+                response: HttpResponse = self.move_items(
+                    "detach_sandbox_items",
+                    {"contexts": [{"id": context.pk} for context in contexts]},
+                )
+            assert response.status_code == 200
+            return len(context.captured_queries)
+
+        # Neither detachment renames the contexts left under the goal.
+        assert count_detach_queries(self.contexts[3:]) == count_detach_queries(
+            self.contexts[:3]
+        )
+
+    def test_attach_items(self):
+        self.move_items(
+            "detach_sandbox_items",
+            {
+                "contexts": [{"id": self.contexts[0].pk}],
+                "property_claims": [{"id": self.sub_claim.pk}],
+                "evidence": [{"id": self.evidence.pk}],
+            },
+        )
+        revision: int = get_case_revision(self.assurance_case.pk)
+
+        response: HttpResponse = self.move_items(
+            "attach_sandbox_items",
+            {
+                "contexts": [{"id": self.contexts[0].pk, "goal_id": self.goal.pk}],
+                "property_claims": [
+                    {
+                        "id": self.sub_claim.pk,
+                        "property_claim_id": self.strategy_claim.pk,
+                    }
+                ],
+                "evidence": [
+                    {"id": self.evidence.pk, "property_claim_id": self.goal_claim.pk},
+                    {"id": self.evidence.pk, "property_claim_id": self.sub_claim.pk},
+                ],
+            },
+        )
+
+        assert response.status_code == 200, response.content
+        sandbox: dict[str, Any] = response.json()
+        assert not sandbox["contexts"]
+        assert not sandbox["property_claims"]
+        assert not sandbox["evidence"]
+
+        self.contexts[0].refresh_from_db()
+        self.sub_claim.refresh_from_db()
+        self.evidence.refresh_from_db()
+        assert not self.contexts[0].in_sandbox
+        assert [
+            context.name
+            for context in Context.objects.filter(goal=self.goal).order_by("pk")
+        ] == ["C1", "C2", "C3", "C4"]
+        assert self.sub_claim.property_claim == self.strategy_claim
+        assert self.sub_claim.name == "P2.1"
+        assert self.sub_claim.level == 2  # noqa: PLR2004
+        assert PropertyClaimClosure.objects.filter(
+            ancestor=self.strategy_claim, descendant=self.sub_claim, depth=1
+        ).exists()
+        assert not self.evidence.in_sandbox
+        assert set(self.evidence.property_claim.all()) == {
+            self.goal_claim,
+            self.sub_claim,
+        }
+        assert get_case_revision(self.assurance_case.pk) == revision + 1
+
+    def test_invalid_selections(self):
+        other_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Other", owner=self.user
+        )
+        other_goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            assurance_case=other_case, name="G1", keywords="key"
+        )
+        other_context: Context = Context.objects.create(goal=other_goal, name="C1")
+        revision: int = get_case_revision(self.assurance_case.pk)
+
+        for url_name, selection, status_code in (
+            ("detach_sandbox_items", [{"id": self.contexts[0].pk}], 400),
+            ("detach_sandbox_items", {"goals": [{"id": self.goal.pk}]}, 400),
+            ("detach_sandbox_items", {"contexts": [{"id": "C1"}]}, 400),
+            ("detach_sandbox_items", {"contexts": [{"id": other_context.pk}]}, 404),
+            (
+                "detach_sandbox_items",
+                {
+                    "contexts": [{"id": self.contexts[0].pk}],
+                    "property_claims": [
+                        {"id": self.goal_claim.pk, "strategy_id": self.strategy.pk}
+                    ],
+                },
+                400,
+            ),
+            ("attach_sandbox_items", {"contexts": [{"id": self.contexts[0].pk}]}, 400),
+            (
+                "attach_sandbox_items",
+                {"contexts": [{"id": self.contexts[0].pk, "goal_id": other_goal.pk}]},
+                404,
+            ),
+            (
+                "attach_sandbox_items",
+                {
+                    "property_claims": [
+                        {
+                            "id": self.goal_claim.pk,
+                            "property_claim_id": self.sub_claim.pk,
+                        }
+                    ]
+                },
+                400,
+            ),
+        ):
+            response: HttpResponse = self.move_items(url_name, selection)
+            assert response.status_code == status_code, selection
+            assert "error_message" in response.json()
+
+        assert not Context.objects.filter(in_sandbox=True).exists()
+        assert get_case_revision(self.assurance_case.pk) == revision
+
+    def test_moving_items_needs_edit_permission(self):
+        response: HttpResponse = self.move_items(
+            "detach_sandbox_items",
+            {"contexts": [{"id": self.contexts[0].pk}]},
+            self.other_token,
+        )
+
+        assert response.status_code == 403
+        assert not Context.objects.filter(in_sandbox=True).exists()
+
+
+class CaseJobTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.other_token, _ = Token.objects.get_or_create(user=self.other_user)
+        self.case_data: dict = {
+            "name": "Imported case",
+            "description": "A case",
+            "lock_uuid": None,
+            "color_profile": "default",
+            "goals": [
+                {
+                    "name": "Ignored",
+                    "short_description": "short",
+                    "long_description": "long",
+                    "keywords": "N/A",
+                    "context": [
+                        {
+                            "name": "Ignored",
+                            "short_description": "short",
+                            "long_description": "long",
+                        }
+                    ],
+                    "property_claims": [],
+                    "strategies": [],
+                }
+            ],
+        }
+
+    def post_job(self, data: Any, token: Token | None = None) -> HttpResponse:
+        return self.client.post(
+            reverse("job_list"),
+            data=json.dumps(data),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    def post_import(self, body: str, **extra: Any) -> HttpResponse:
+        return self.client.post(
+            reverse("job_import"),
+            data=body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            **extra,
+        )
+
+    def get_job(self, job_id: int, token: Token | None = None) -> HttpResponse:
+        return self.client.get(
+            reverse("job_detail", kwargs={"pk": job_id}),
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    @staticmethod
+    def run_jobs() -> None:
+        call_command(
+            "run_case_jobs", "--once", "--processes", "0", stdout=io.StringIO()
+        )
+
+    def test_import_job(self):
+        response = self.post_import(json.dumps(self.case_data))
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id: int = response.json()["id"]
+        assert response.json()["status"] == CaseJob.Status.PENDING
+        assert not AssuranceCase.objects.exists()
+
+        self.run_jobs()
+
+        response_data: dict = self.get_job(job_id).json()
+        assert response_data["status"] == CaseJob.Status.SUCCEEDED
+        assert response_data["progress"] == 100
+        assurance_case = AssuranceCase.objects.get()
+        assert response_data["assurance_case"] == assurance_case.pk
+        assert response_data["result"] == {
+            "name": "Imported case",
+            "id": assurance_case.pk,
+        }
+        assert assurance_case.owner == self.user
+        assert assurance_case.goals.get().name == "G1"
+        assert not CaseJob.objects.get(pk=job_id).input_file
+
+    def test_failed_import_job(self):
+        response = self.post_import('{"name": "Broken case", "goals": [}')
+        job_id: int = response.json()["id"]
+        self.run_jobs()
+
+        response_data: dict = self.get_job(job_id).json()
+        assert response_data["status"] == CaseJob.Status.FAILED
+        assert response_data["result"]["error_message"].startswith("Invalid JSON")
+        assert not AssuranceCase.objects.exists()
+
+        with override_settings(CASE_UPLOAD_MAX_SIZE=10):
+            response = self.post_import(json.dumps(self.case_data))
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        response = self.post_import(json.dumps(self.case_data), CONTENT_LENGTH="-")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert CaseJob.objects.count() == 1
+
+    def test_export_job_with_progress(self):
+        self.post_import(json.dumps(self.case_data))
+        self.run_jobs()
+        assurance_case = AssuranceCase.objects.get()
+
+        channel_layer = get_channel_layer()
+        channel_name: str = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(
+            f"assurance_case_{assurance_case.pk}", channel_name
+        )
+
+        response = self.post_job({"kind": "export", "case_id": assurance_case.pk})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id: int = response.json()["id"]
+        with patch.object(CaseTreeExporter, "CHUNK_SIZE", 1):
+            self.run_jobs()
+
+        messages: list[dict] = [
+            async_to_sync(channel_layer.receive)(channel_name) for _ in range(3)
+        ]
+        assert all(message["type"] == "case_message" for message in messages)
+        assert [
+            (message["content"]["job"]["status"], message["content"]["job"]["progress"])
+            for message in messages
+        ] == [
+            (CaseJob.Status.RUNNING, 0),
+            (CaseJob.Status.RUNNING, 50),
+            (CaseJob.Status.SUCCEEDED, 100),
+        ]
+        assert {message["content"]["job"]["id"] for message in messages} == {job_id}
+
+        response = self.client.get(
+            reverse("job_result", kwargs={"pk": job_id}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        assert response.status_code == status.HTTP_200_OK
+        exported_case: dict = json.loads(b"".join(response.streaming_content))
+        case_response = self.client.get(
+            reverse("case_detail", kwargs={"pk": assurance_case.pk}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        assert exported_case == remove_ids(case_response.json())
+
+    def test_job_permissions(self):
+        assurance_case = AssuranceCase.objects.create(
+            name="Case", owner=self.user, lock_uuid=None
+        )
+
+        response = self.post_job({"kind": "import", "case_id": assurance_case.pk})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = self.post_job({"kind": "export", "case_id": 0})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        response = self.post_job(["export"])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = self.post_job(
+            {"kind": "update_identifiers", "case_id": assurance_case.pk},
+            self.other_token,
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        response = self.post_job(
+            {"kind": "update_identifiers", "case_id": assurance_case.pk}
+        )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id: int = response.json()["id"]
+        assert self.get_job(job_id, self.other_token).status_code == (
+            status.HTTP_403_FORBIDDEN
+        )
+        response = self.client.get(
+            reverse("job_list"), HTTP_AUTHORIZATION=f"Token {self.other_token.key}"
+        )
+        assert response.json() == []
+
+        response = self.client.get(
+            reverse("job_result", kwargs={"pk": job_id}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_jobs_are_claimed_once(self):
+        assurance_case = AssuranceCase.objects.create(
+            name="Case", owner=self.user, lock_uuid=None
+        )
+        first_job = CaseJob.objects.create(
+            kind=CaseJob.Kind.EXPORT, owner=self.user, assurance_case=assurance_case
+        )
+        second_job = CaseJob.objects.create(
+            kind=CaseJob.Kind.EXPORT, owner=self.user, assurance_case=assurance_case
+        )
+
+        assert claim_next_job("worker") == first_job.pk
+        assert claim_next_job("worker") == second_job.pk
+        assert claim_next_job("worker") is None
+        assert set(CaseJob.objects.values_list("status", "worker")) == {
+            (CaseJob.Status.RUNNING, "worker")
+        }
+
+    @override_settings(CASE_JOB_LEASE=60)
+    def test_jobs_of_dead_workers_expire(self):
+        assurance_case = AssuranceCase.objects.create(
+            name="Case", owner=self.user, lock_uuid=None
+        )
+        jobs: list[CaseJob] = [
+            CaseJob.objects.create(
+                kind=CaseJob.Kind.EXPORT, owner=self.user, assurance_case=assurance_case
+            )
+            for _ in range(2)
+        ]
+        for job in jobs:
+            assert claim_next_job("worker") == job.pk
+        CaseJob.objects.update(heartbeat_date=timezone.now() - timedelta(seconds=90))
+
+        # The worker of the first job died, and that of the second is still alive.
+        heartbeat = JobHeartbeat()
+        heartbeat.job_ids.add(jobs[1].pk)
+        heartbeat.beat()
+        self.run_jobs()
+
+        for job in jobs:
+            job.refresh_from_db()
+        assert jobs[0].status == CaseJob.Status.FAILED
+        assert jobs[0].result == {
+            "error_message": "The worker running the job stopped."
+        }
+        assert jobs[1].status == CaseJob.Status.RUNNING
+
+        # The first worker was only slow, and its outcome comes too late.
+        run_case_job(jobs[0].pk)
+        jobs[0].refresh_from_db()
+        assert jobs[0].status == CaseJob.Status.FAILED
+        assert not jobs[0].result_file
+
+    def test_jobs_survive_broken_pools(self):
+        assurance_case = AssuranceCase.objects.create(
+            name="Case", owner=self.user, lock_uuid=None
+        )
+        job = CaseJob.objects.create(
+            kind=CaseJob.Kind.EXPORT, owner=self.user, assurance_case=assurance_case
+        )
+        pools: list = []
+
+        class InlinePool:
+            """Runs jobs in the test process, and is broken when first created."""
+
+            def __init__(self, *_, **__):
+                self.broken: bool = not pools
+                pools.append(self)
+
+            def submit(self, function, *args) -> Future:
+                if self.broken:
+                    raise BrokenProcessPool
+                future: Future = Future()
+                future.set_result(function(*args))
+                return future
+
+            def shutdown(self, **_):
+                pass
+
+        with patch(
+            "eap_backend.management.commands.run_case_jobs.ProcessPoolExecutor",
+            InlinePool,
+        ):
+            call_command(
+                "run_case_jobs", "--once", "--processes", "1", stdout=io.StringIO()
+            )
+
+        assert len(pools) == 2
+        job.refresh_from_db()
+        assert job.status == CaseJob.Status.SUCCEEDED
+
+
+class JSONEventReaderTest(TestCase):
+    def read_events(self, document: str, chunk_size: int = 1) -> list:
+        return list(
+            JSONEventReader(
+                io.BytesIO(document.encode()), max_size=1000, chunk_size=chunk_size
+            )
+        )
+
+    def test_events(self):
+        assert self.read_events(
+            '{"a": [1, -2.5e1, "\\u00e9\\"", true, null], "b": {}}'
+        ) == [
+            ("start_map", None),
+            ("map_key", "a"),
+            ("start_array", None),
+            ("value", 1),
+            ("value", -25.0),
+            ("value", 'é"'),
+            ("value", True),
+            ("value", None),
+            ("end_array", None),
+            ("map_key", "b"),
+            ("start_map", None),
+            ("end_map", None),
+            ("end_map", None),
+        ]
+
+    def test_read_value(self):
+        document: str = json.dumps(
+            {"case": [{"name": "Ünïcödé", "items": [[], {}, 0, 1.5]}], "n": None},
+            ensure_ascii=False,
+        )
+        for chunk_size in (1, 3, 1000):
+            events = iter(
+                JSONEventReader(
+                    io.BytesIO(document.encode()), max_size=1000, chunk_size=chunk_size
+                )
+            )
+            event, value = next(events)
+            assert read_value(events, event, value) == json.loads(document)
+
+    def test_invalid_documents(self):
+        for document in ("", "{", "[1,]", '{"a" 1}', "01", "1.", "tru", '"a', "{}{}"):
+            with self.assertRaises(JSONStreamError):  # noqa: PT027
+                self.read_events(document)
+
+        with self.assertRaises(JSONStreamTooLargeError):  # noqa: PT027
+            list(
+                JSONEventReader(
+                    io.BytesIO(b"[" + b"1," * 1000 + b"1]"),
+                    max_size=100,
+                    chunk_size=10,
+                )
+            )
+
+
+class CaseTreeCacheTest(TestCase):
+    def setUp(self):
+        user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=user)
+
+        self.case: AssuranceCase = AssuranceCase.objects.create(
+            **CASE1_INFO, owner=user
+        )
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            **GOAL_INFO
+        )
+        self.property_claim: PropertyClaim = PropertyClaim.objects.create(
+            name="P1", goal=self.goal
+        )
+
+    def get_case(self) -> dict:
+        response_get: HttpResponse = self.client.get(
+            reverse("case_detail", kwargs={"pk": self.case.pk}),
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+        assert response_get.status_code == 200
+        return response_get.json()
+
+    def test_revision_increases_on_changes(self):
+        revision: int = get_case_revision(self.case.pk)
+
+        evidence: Evidence = Evidence.objects.create(name="E1")
+        evidence.property_claim.add(self.property_claim)
+        assert get_case_revision(self.case.pk) > revision
+
+        revision = get_case_revision(self.case.pk)
+        Comment.objects.create(
+            author=self.case.owner, assurance_case=self.case, content="A comment"
+        )
+        assert get_case_revision(self.case.pk) > revision
+
+        revision = get_case_revision(self.case.pk)
+        self.property_claim.delete()
+        assert get_case_revision(self.case.pk) > revision
+
+    def test_unchanged_case_is_served_from_cache(self):
+        first_response: dict = self.get_case()
+
+        with CaptureQueriesContext(connection) as context:
+            second_response: dict = self.get_case()
+
+        assert second_response == first_response
+        item_tables: list[str] = [
+            model._meta.db_table
+            for model in (TopLevelNormativeGoal, PropertyClaim, Evidence, Comment)
+        ]
+        for query in context.captured_queries:
+            assert not any(
+                f'"{table}"' in query["sql"] for table in item_tables
+            ), f"Unexpected query {query['sql']}"
+
+    def test_changes_are_visible_after_caching(self):
+        self.get_case()
+
+        self.property_claim.short_description = "Updated description"
+        self.property_claim.save()
+
+        response_data: dict = self.get_case()
+        claim_data: dict = response_data["goals"][0]["property_claims"][0]
+        assert claim_data["short_description"] == "Updated description"
+
+
+class CaseChangesTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        self.other_token, _ = Token.objects.get_or_create(user=self.other_user)
+
+        self.case: AssuranceCase = AssuranceCase.objects.create(
+            **CASE1_INFO, owner=self.user
+        )
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            **GOAL_INFO
+        )
+        self.context: Context = Context.objects.create(name="C1", goal=self.goal)
+
+    def get_changes(self, since: Any, token: Token | None = None) -> HttpResponse:
+        return self.client.get(
+            reverse("case_changes", kwargs={"pk": self.case.pk}),
+            {"since": since},
+            HTTP_AUTHORIZATION=f"Token {(token or self.token).key}",
+        )
+
+    def test_changes_since_revision(self):
+        revision: int = get_case_revision(self.case.pk)
+        claim: PropertyClaim = PropertyClaim.objects.create(name="P1", goal=self.goal)
+        self.context.short_description = "Changed"
+        self.context.save()
+        claim.short_description = "Changed too"
+        claim.save()
+        context_id: int = self.context.pk
+        self.context.delete()
+
+        response: HttpResponse = self.get_changes(revision)
+
+        assert response.status_code == 200
+        changes: dict[str, Any] = response.json()
+        assert changes["sequence"] == get_case_revision(self.case.pk)
+        assert not changes["reload"]
+        assert [
+            (change["type"], change["id"], change["action"])
+            for change in changes["changes"]
+        ] == [
+            ("property_claim", claim.pk, "create"),
+            ("context", context_id, "delete"),
+        ]
+        assert changes["changes"][0]["data"]["short_description"] == "Changed too"
+        assert changes["changes"][1]["deleted"]
+
+        up_to_date: HttpResponse = self.get_changes(changes["sequence"])
+        assert up_to_date.json()["changes"] == []
+        assert len(up_to_date.content) < 100  # noqa: PLR2004
+
+    def test_reload_after_compaction(self):
+        revision: int = get_case_revision(self.case.pk)
+        self.context.save()
+        self.context.save()
+        compact_case_changes(keep=1)
+
+        assert self.get_changes(revision).json() == {
+            "sequence": revision + 2,
+            "reload": True,
+        }
+        assert not self.get_changes(revision + 1).json()["reload"]
+        assert self.get_changes(revision + 3).json()["reload"]
+
+    def test_invalid_requests(self):
+        assert self.get_changes("latest").status_code == 400
+        assert self.get_changes(0, self.other_token).status_code == 403
+
+    def test_patches_sent_to_connected_editors(self):
+        channel_layer = get_channel_layer()
+        channel_name: str = async_to_sync(channel_layer.new_channel)()
+        case_group_name: str = f"assurance_case_{self.case.pk}"
+        async_to_sync(channel_layer.group_add)(case_group_name, channel_name)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.context.save()
+        assert len(callbacks) == 1
+
+        presence_store.join(
+            case_group_name,
+            channel_name,
+            {"id": self.other_user.pk, "username": self.other_user.username},
+        )
+        self.addCleanup(presence_store.leave, case_group_name, channel_name)
+        with self.captureOnCommitCallbacks(execute=True):
+            response: HttpResponse = self.client.put(
+                reverse("context_detail", kwargs={"pk": self.context.pk}),
+                {"short_description": "Changed", "goal_id": self.goal.pk},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Token {self.token.key}",
+            )
+        assert response.status_code == 200
+
+        message: dict[str, Any] = async_to_sync(channel_layer.receive)(channel_name)
+        assert message["type"] == "case_message"
+        case_patch: dict[str, Any] = message["content"]["patch"]
+        assert case_patch["sequence"] == get_case_revision(self.case.pk)
+        assert not case_patch["reload"]
+        assert [
+            (change["type"], change["id"], change["action"])
+            for change in case_patch["changes"]
+        ] == [("context", self.context.pk, "update")]
+        assert case_patch["changes"][0]["data"]["short_description"] == "Changed"
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=user)
+
+        self.case: AssuranceCase = AssuranceCase.objects.create(
+            **CASE1_INFO, owner=user
+        )
+        self.goal: TopLevelNormativeGoal = TopLevelNormativeGoal.objects.create(
+            **GOAL_INFO
+        )
+        self.property_claim: PropertyClaim = PropertyClaim.objects.create(
+            name="P1", goal=self.goal
+        )
+
+    def get(self, url: str, etag: str | None = None) -> HttpResponse:
+        headers: dict[str, str] = {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+        if etag is not None:
+            headers["HTTP_IF_NONE_MATCH"] = etag
+        return self.client.get(url, **headers)
+
+    def test_case_detail_not_modified(self):
+        url: str = reverse("case_detail", kwargs={"pk": self.case.pk})
+        response: HttpResponse = self.get(url)
+        assert response.status_code == 200
+        etag: str = response["ETag"]
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(url, etag)
+
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert response.content == b""
+        goal_table: str = TopLevelNormativeGoal._meta.db_table
+        assert not any(
+            f'"{goal_table}"' in query["sql"] for query in context.captured_queries
+        )
+
+    def test_case_detail_modified(self):
+        url: str = reverse("case_detail", kwargs={"pk": self.case.pk})
+        etag: str = self.get(url)["ETag"]
+
+        self.goal.short_description = "Updated description"
+        self.goal.save()
+
+        response: HttpResponse = self.get(url, etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert response.json()["goals"][0]["short_description"] == (
+            "Updated description"
+        )
+
+    def test_sandbox_not_modified(self):
+        url: str = reverse("case_sandbox", kwargs={"pk": self.case.pk})
+        etag: str = self.get(url)["ETag"]
+
+        assert self.get(url, etag).status_code == 304
+
+        PropertyClaim.objects.create(name="P2", assurance_case=self.case)
+        assert self.get(url, etag).status_code == 200
+
+    def test_item_detail_not_modified(self):
+        url: str = reverse(
+            "property_claim_detail", kwargs={"pk": self.property_claim.pk}
+        )
+        etag: str = self.get(url)["ETag"]
+
+        assert self.get(url, etag).status_code == 304
+
+        goal_url: str = reverse("goal_detail", kwargs={"pk": self.goal.pk})
+        assert self.get(goal_url)["ETag"] != etag
+
+        self.property_claim.name = "P1 renamed"
+        self.property_claim.save()
+        assert self.get(url, etag).status_code == 200
+
+
 class UserViewNoAuthTest(TestCase):
     def setUp(self):
         # Mock Entries to be modified and tested
@@ -1535,6 +3375,73 @@ class GroupViewNoAuthTest(TestCase):
         assert response_delete.status_code == 403
 
 
+class GroupListQueryTest(TestCase):
+    def setUp(self):
+        self.user: EAPUser = EAPUser.objects.create(**USER1_INFO)
+        self.token, _ = Token.objects.get_or_create(user=self.user)
+        other_user: EAPUser = EAPUser.objects.create(**USER2_INFO)
+
+        for group_index in range(3):
+            group: EAPGroup = EAPGroup.objects.create(
+                name=f"owned-{group_index}", owner=self.user
+            )
+            group.member.add(self.user, other_user)
+        for group_index in range(2):
+            EAPGroup.objects.create(name=f"other-{group_index}", owner=other_user)
+
+        self.shared_case: AssuranceCase = AssuranceCase.objects.create(
+            name="Shared", description="A case", owner=other_user
+        )
+        self.shared_group: EAPGroup = ShareAssuranceCaseUtils.get_edit_group(
+            self.shared_case
+        )
+        self.shared_group.member.add(self.user)
+
+    def get_groups(self, parameters: dict) -> HttpResponse:
+        return self.client.get(
+            reverse("group_list"),
+            parameters,
+            HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def test_group_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response_get: HttpResponse = self.get_groups({})
+
+        assert response_get.status_code == 200
+        response_data: dict = response_get.json()
+        assert len(response_data["owner"]) == 3
+        assert len(response_data["member"]) == 4
+        assert response_data["member"][-1]["editable_cases"] == [self.shared_case.pk]
+
+        group_queries: list[str] = [
+            query["sql"]
+            for query in context.captured_queries
+            if f'FROM "{EAPGroup._meta.db_table}"' in query["sql"]
+        ]
+        assert len(group_queries) == 2, group_queries
+        assert len(context.captured_queries) <= 10, context.captured_queries
+
+    def test_group_list_pagination(self):
+        response_data: dict = self.get_groups({"page_size": 2}).json()
+
+        assert response_data["owner"]["count"] == 3
+        assert len(response_data["owner"]["results"]) == 2
+        assert response_data["member"]["count"] == 4
+        assert response_data["member"]["next"] is not None
+
+        response_data = self.get_groups({"page_size": 2, "page": 2}).json()
+        assert [group["name"] for group in response_data["owner"]["results"]] == [
+            "owned-2"
+        ]
+        assert response_data["owner"]["next"] is None
+        assert response_data["member"]["results"][-1]["id"] == self.shared_group.pk
+
+        response_data = self.get_groups({"page_size": 3, "page": 2}).json()
+        assert response_data["owner"]["results"] == []
+        assert len(response_data["member"]["results"]) == 1
+
+
 class GroupViewWithAuthTest(TestCase):
     def setUp(self):
         # login user1
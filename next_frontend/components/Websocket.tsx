@@ -57,6 +57,16 @@ const WebSocketComponent = () => {
           console.log("Updated active users:", users);
         }
 
+        // Handle users joining or leaving the case
+        if (data.content.presence) {
+          const { action, connection } = data.content.presence;
+          const users = useStore.getState().activeUsers.filter(
+            (activeUser: any) => activeUser.user.id !== connection.user.id
+          );
+          setActiveUsers(action === 'join' ? [...users, connection] : users);
+          console.log("Updated active users:", action, connection);
+        }
+
         // Handle assurance case updates (only updating the goals)
         if (data.content.assuranceCase) {
           const updatedGoals = data.content.assuranceCase.goals;